@@ -1,9 +1,75 @@
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import DEFERRED
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 
 User = get_user_model()
 
+# Authenticated users are cached for this long as a small projection (see
+# USER_CACHE_FIELDS) — never the model itself, which carries the password
+# hash. accounts/signals.py drops the entry whenever the user or craftsman
+# changes; the TTL bounds staleness for writes that bypass the signals.
+AUTH_USER_CACHE_SECONDS = getattr(settings, "AUTH_USER_CACHE_SECONDS", 60)
+
+USER_CACHE_FIELDS      = ("id", "role", "is_active", "is_staff", "is_superuser")
+CRAFTSMAN_CACHE_FIELDS = ("id", "is_approved")
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def user_cache_enabled():
+    """
+    Only with a cache every worker shares (Redis): with the per-process
+    LocMemCache an invalidation would reach just the worker that made the
+    change, and the others would keep serving the old user until the TTL.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    return AUTH_USER_CACHE_SECONDS > 0 and not backend.endswith("LocMemCache")
+
+
+def invalidate_cached_user(*user_ids):
+    if user_cache_enabled():
+        cache.delete_many([user_cache_key(user_id) for user_id in user_ids if user_id])
+
+
+def _project(user):
+    craftsman = getattr(user, "craftsman", None)
+    return {
+        "user": {field: getattr(user, field) for field in USER_CACHE_FIELDS},
+        "craftsman": craftsman and {field: getattr(craftsman, field) for field in CRAFTSMAN_CACHE_FIELDS},
+    }
+
+
+def _partial(model, values):
+    """A model instance with only `values` loaded; other fields load on first access."""
+    fields = model._meta.concrete_fields
+    return model.from_db(
+        DEFAULT_DB_ALIAS,
+        [field.attname for field in fields],
+        [values.get(field.attname, DEFERRED) for field in fields],
+    )
+
+
+def _restore(user_model, entry):
+    """Rebuild the user (and their craftsman link) from a cached projection."""
+    user = _partial(user_model, entry["user"])
+    craftsman = None
+    if entry["craftsman"]:
+        related = user_model.craftsman.related
+        craftsman = _partial(related.related_model, {**entry["craftsman"], related.field.attname: user.pk})
+        related.field.set_cached_value(craftsman, user)
+    user_model.craftsman.related.set_cached_value(user, craftsman)
+    return user
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     """
@@ -22,6 +88,44 @@ class CookieJWTAuthentication(JWTAuthentication):
 
         return (user, validated_token)
 
+    def get_user(self, validated_token):
+        """
+        Same checks as JWTAuthentication.get_user, but after the first request
+        the user and their craftsman link are rebuilt from the cache with only
+        the USER_CACHE_FIELDS / CRAFTSMAN_CACHE_FIELDS loaded; reading any
+        other field fetches it from the database.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_cache_key(user_id)
+        use_cache = user_cache_enabled()
+        entry = cache.get(key) if use_cache else None
+        if entry is not None:
+            user = _restore(self.user_model, entry)
+        else:
+            try:
+                user = self.user_model.objects.select_related("craftsman").get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if use_cache:
+                cache.set(key, _project(user), AUTH_USER_CACHE_SECONDS)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
 
 class EmailBackend(ModelBackend):
     """
@@ -18,8 +18,21 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault('is_superuser', True)
         return self.create_user(email, password, **extra_fields)
 
+class LoadDeferredTogetherMixin:
+    """
+    Reading one deferred field loads every deferred field in one query,
+    instead of one query per field. CookieJWTAuthentication rebuilds users
+    and craftsmen from its cache with only a few fields loaded.
+    """
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
+
 # ✅ Then define your CustomUser model
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class CustomUser(LoadDeferredTogetherMixin, AbstractBaseUser, PermissionsMixin):
     ROLE_CHOICES = (
         ('client', 'Client'),
         ('craftsman', 'Craftsman'),
@@ -0,0 +1,21 @@
+# accounts/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models import Craftsman
+from .authentication import invalidate_cached_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=Craftsman)
+@receiver(post_delete, sender=Craftsman)
+def drop_cached_craftsman_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
@@ -2,6 +2,7 @@ import os
 import logging
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.db import transaction
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from backend import settings
@@ -9,8 +10,9 @@ from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-import requests as http_requests  # plain requests, not google's
 
+from api.mail import send_template
+from api.outbox import enqueue
 from .models import CustomUser
 from .serializers import (
     CraftsmanSignupSerializer,
@@ -28,8 +30,6 @@ User = get_user_model()
 # ── Read from Django settings (loaded by decouple), NOT os.environ ──────────
 GOOGLE_CLIENT_ID   = getattr(settings, "GOOGLE_CLIENT_ID",   None)
 FRONTEND_URL       = getattr(settings, "FRONTEND_URL",       "http://localhost:3000")
-BREVO_API_KEY      = getattr(settings, "BREVO_API_KEY",      "")
-BREVO_SENDER_EMAIL = getattr(settings, "BREVO_SENDER_EMAIL", "noreply@kaakazini.com")
 
 # Role → frontend dashboard path
 ROLE_DASHBOARD = {
@@ -40,80 +40,17 @@ ROLE_DASHBOARD = {
 
 
 # ─────────────────────────────────────────────
-# Brevo email (plain HTTP — no SDK needed)
+# Email (delivered through api.mail)
 # ─────────────────────────────────────────────
 
-def send_email(to_email: str, to_name: str, subject: str, html_content: str) -> bool:
-    """
-    Send a transactional email via the Brevo REST API.
-    Returns True on success, False on any failure.
-    """
-    if not BREVO_API_KEY:
-        logger.warning("BREVO_API_KEY is not set — skipping email to %s", to_email)
-        return False
-
-    payload = {
-        "sender":      {"name": BREVO_SENDER_EMAIL, "email": BREVO_SENDER_EMAIL},
-        "replyTo":     {"name": BREVO_SENDER_EMAIL, "email": "support@kaakazini.com"},
-        "to":          [{"email": to_email, "name": to_name or "User"}],
-        "subject":     subject,
-        "htmlContent": html_content,
-    }
-
-    try:
-        resp = http_requests.post(
-            "https://api.brevo.com/v3/smtp/email",
-            json=payload,
-            headers={
-                "api-key":      BREVO_API_KEY,
-                "Content-Type": "application/json",
-                "Accept":       "application/json",
-            },
-            timeout=10,
-        )
-        resp.raise_for_status()
-        logger.info("Brevo email sent to %s (status %s)", to_email, resp.status_code)
-        return True
-    except http_requests.exceptions.HTTPError as exc:
-        logger.error(
-            "Brevo HTTP error for %s: %s — body: %s",
-            to_email, exc, exc.response.text if exc.response else "—",
-        )
-    except Exception as exc:
-        logger.error("Brevo send failed for %s: %s", to_email, exc)
-    return False
-
-
-def send_welcome_email(email: str, full_name: str, role: str = "") -> bool:
+def send_welcome_email(email: str, full_name: str, role: str = "", locale=None) -> bool:
     name = full_name or "User"
-    role_label = role.capitalize() if role else "Member"
-    html = f"""
-    <div style="font-family:Arial,sans-serif;max-width:560px;margin:auto;">
-      <div style="background:#0d0d0d;padding:24px 32px;border-radius:12px 12px 0 0;">
-        <h2 style="color:#FFD700;margin:0;">Welcome to KaaKazini!</h2>
-      </div>
-      <div style="background:#f9fafb;padding:28px 32px;border:1px solid #e5e7eb;">
-        <p style="font-size:1rem;color:#111827;">Hi <strong>{name}</strong>,</p>
-        <p style="color:#374151;">
-          Your <strong>{role_label}</strong> account has been created successfully.
-          You can now log in and start using KaaKazini.
-        </p>
-        <div style="text-align:center;margin:32px 0;">
-          <a href="{FRONTEND_URL}/login"
-             style="background:#FFD700;color:#0d0d0d;padding:14px 32px;
-                    border-radius:10px;text-decoration:none;font-weight:700;
-                    font-size:1rem;display:inline-block;">
-            Log In &rarr;
-          </a>
-        </div>
-      </div>
-      <div style="background:#f3f4f6;padding:14px 32px;border-radius:0 0 12px 12px;
-                  font-size:.75rem;color:#9ca3af;text-align:center;">
-        KaaKazini &mdash; Kenya's verified craftsman marketplace
-      </div>
-    </div>
-    """
-    return send_email(email, name, "Welcome to KaaKazini!", html)
+    return send_template(
+        "welcome", email, to_name=name, locale=locale,
+        name=name,
+        role_label=role.capitalize() if role else "Member",
+        login_url=f"{FRONTEND_URL}/login",
+    )
 
 
 # ─────────────────────────────────────────────
@@ -161,8 +98,9 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [AllowAny]
 
     def perform_create(self, serializer):
-        user = serializer.save()
-        send_welcome_email(user.email, user.full_name, role="craftsman")
+        with transaction.atomic():
+            user = serializer.save()
+            enqueue("email.welcome", email=user.email, full_name=user.full_name, role="craftsman")
 
 
 class ClientSignupView(generics.CreateAPIView):
@@ -171,8 +109,9 @@ class ClientSignupView(generics.CreateAPIView):
     permission_classes = [AllowAny]
 
     def perform_create(self, serializer):
-        user = serializer.save()
-        send_welcome_email(user.email, user.full_name, role="client")
+        with transaction.atomic():
+            user = serializer.save()
+            enqueue("email.welcome", email=user.email, full_name=user.full_name, role="client")
 
 
 # ─────────────────────────────────────────────
@@ -250,10 +189,13 @@ class GoogleLoginView(APIView):
             email     = idinfo["email"]
             full_name = idinfo.get("name", "")
 
-            user, created = CustomUser.objects.get_or_create(
-                email=email,
-                defaults={"full_name": full_name, "role": role},
-            )
+            with transaction.atomic():
+                user, created = CustomUser.objects.get_or_create(
+                    email=email,
+                    defaults={"full_name": full_name, "role": role},
+                )
+                if created:
+                    enqueue("email.welcome", email=email, full_name=full_name, role=role)
 
             if not created and user.role != role:
                 return Response(
@@ -262,9 +204,6 @@ class GoogleLoginView(APIView):
                     status=403,
                 )
 
-            if created:
-                send_welcome_email(email, full_name, role=role)
-
             response = Response({
                 "detail":  "Google login successful",
                 "user":    _user_payload(user),
@@ -344,30 +283,10 @@ class ForgotPasswordAPIView(APIView):
             uid       = urlsafe_base64_encode(force_bytes(user.pk))
             reset_url = f"{FRONTEND_URL}/reset-password/{uid}/{token}/"
 
-            html = f"""
-            <div style="font-family:Arial,sans-serif;max-width:560px;margin:auto;">
-              <div style="background:#0d0d0d;padding:24px 32px;border-radius:12px 12px 0 0;">
-                <h2 style="color:#FFD700;margin:0;">Reset your password</h2>
-              </div>
-              <div style="background:#f9fafb;padding:28px 32px;border:1px solid #e5e7eb;">
-                <p style="color:#374151;">Hi <strong>{user.full_name or 'there'}</strong>,</p>
-                <p style="color:#374151;">Click the button below to reset your password.
-                   This link expires in 1 hour.</p>
-                <div style="text-align:center;margin:32px 0;">
-                  <a href="{reset_url}"
-                     style="background:#FFD700;color:#0d0d0d;padding:14px 32px;
-                            border-radius:10px;text-decoration:none;font-weight:700;
-                            font-size:1rem;display:inline-block;">
-                    Reset Password &rarr;
-                  </a>
-                </div>
-                <p style="font-size:.85rem;color:#9ca3af;">
-                  If you didn't request this, you can safely ignore this email.
-                </p>
-              </div>
-            </div>
-            """
-            send_email(user.email, user.full_name or "", "Reset your KaaKazini password", html)
+            send_template(
+                "password_reset", user.email, to_name=user.full_name or "",
+                name=user.full_name or "there", reset_url=reset_url,
+            )
 
         except CustomUser.DoesNotExist:
             pass  # Never reveal whether the email exists
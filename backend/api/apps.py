@@ -5,3 +5,8 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import email_templates
+
+        email_templates.warm()
@@ -0,0 +1,46 @@
+# api/background.py
+"""
+In-process background executor for work that must stay off the request path
+(external HTTP calls, file processing). Tasks are handed to a small thread
+pool once the surrounding transaction commits, so they always see the rows
+that scheduled them.
+
+Set BACKGROUND_TASKS_ASYNC = False (tests, management commands) to run tasks
+inline at commit time instead.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "BACKGROUND_TASK_WORKERS", 4),
+    thread_name_prefix="kaakazini-bg",
+)
+
+
+def _run_in_worker(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception(f"[Background] Task {func.__name__} failed")
+    finally:
+        connections.close_all()
+
+
+def run_after_commit(func, *args, **kwargs):
+    """Schedule func(*args, **kwargs) to run once the current transaction commits."""
+    def _submit():
+        if not getattr(settings, "BACKGROUND_TASKS_ASYNC", True):
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception(f"[Background] Task {func.__name__} failed")
+            return
+        _executor.submit(_run_in_worker, func, args, kwargs)
+
+    transaction.on_commit(_submit)
@@ -1,4 +1,6 @@
 import logging
+
+from accounts.authentication import invalidate_cached_user
 from .intasend_service import create_craftsman_wallet
 
 logger = logging.getLogger(__name__)
@@ -31,6 +33,7 @@ def ensure_craftsman_wallet(craftsman) -> None:
     if result["success"]:
         from .models import Craftsman
         Craftsman.objects.filter(pk=craftsman.pk).update(wallet_id=result["wallet_id"])
+        invalidate_cached_user(craftsman.user_id)
         logger.info(
             f"[Approval] Wallet #{result['wallet_id']} saved for craftsman #{craftsman.id}"
         )
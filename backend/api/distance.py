@@ -0,0 +1,203 @@
+# api/distance.py
+"""
+Google Distance Matrix lookups for JobRequest.distance_km.
+
+Nothing in here runs on the request path: JobRequest.save() only schedules
+update_job_distance() when the address or location actually changed.
+
+Results are kept in DistanceCacheEntry keyed on the normalised pair, so jobs
+between the same neighbourhoods reuse one lookup until the TTL expires.
+"""
+import logging
+import re
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .background import run_after_commit
+from .models import DistanceCacheEntry, JobRequest
+
+logger = logging.getLogger(__name__)
+
+DISTANCE_MATRIX_URL = getattr(
+    settings, "GOOGLE_DISTANCE_MATRIX_URL",
+    "https://maps.googleapis.com/maps/api/distancematrix/json",
+)
+DISTANCE_TIMEOUT = getattr(settings, "GOOGLE_DISTANCE_TIMEOUT", 5)
+DISTANCE_CACHE_TTL = timedelta(days=getattr(settings, "DISTANCE_CACHE_TTL_DAYS", 30))
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def distance_cache_stats() -> dict:
+    """Hit / miss counters for this process since start-up."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def normalise_place(place: str) -> str:
+    """'  Westlands ,Nairobi ' → 'westlands, nairobi'"""
+    place = " ".join(str(place or "").lower().split())
+    return re.sub(r"\s*,\s*", ", ", place).strip(" ,.")[:255]
+
+
+def _metres_to_km(distance_m) -> Decimal:
+    return Decimal(distance_m / 1000).quantize(Decimal("0.01"))
+
+
+def fetch_distance_km(origin: str, destination: str):
+    """Driving distance in km between two free-text places, or None."""
+    if not origin or not destination:
+        return None
+    try:
+        resp = requests.get(
+            DISTANCE_MATRIX_URL,
+            params={
+                "origins":      origin,
+                "destinations": destination,
+                "key":          getattr(settings, "GOOGLE_MAPS_API_KEY", ""),
+            },
+            timeout=DISTANCE_TIMEOUT,
+        )
+        element = resp.json()["rows"][0]["elements"][0]
+        return _metres_to_km(element["distance"]["value"])
+    except Exception as exc:
+        logger.warning(f"[Distance] Lookup failed '{origin}' → '{destination}': {exc}")
+        return None
+
+
+# ─────────────────────────────────────────────
+# Multi-origin / multi-destination requests
+# ─────────────────────────────────────────────
+
+# Distance Matrix limits per request: 25 origins, 25 destinations and
+# 100 elements (origins × destinations).
+MATRIX_MAX_SIDE     = 25
+MATRIX_MAX_ELEMENTS = 100
+
+
+def fetch_distance_matrix(origins, destinations, session=None) -> dict:
+    """
+    One Distance Matrix request for every origin × destination combination.
+    Returns {(origin, destination): km} for the elements Google resolved;
+    an empty dict if the request itself failed.
+    """
+    origins, destinations = list(origins), list(destinations)
+    try:
+        resp = (session or requests).get(
+            DISTANCE_MATRIX_URL,
+            params={
+                "origins":      "|".join(origins),
+                "destinations": "|".join(destinations),
+                "key":          getattr(settings, "GOOGLE_MAPS_API_KEY", ""),
+            },
+            timeout=DISTANCE_TIMEOUT,
+        )
+        rows = resp.json()["rows"]
+    except Exception as exc:
+        logger.warning(f"[Distance] Matrix lookup failed ({len(origins)}×{len(destinations)}): {exc}")
+        return {}
+
+    results = {}
+    for origin, row in zip(origins, rows):
+        for destination, element in zip(destinations, row.get("elements", [])):
+            if element.get("status", "OK") == "OK" and "distance" in element:
+                results[(origin, destination)] = _metres_to_km(element["distance"]["value"])
+    return results
+
+
+def plan_matrix_batches(pairs, max_side=MATRIX_MAX_SIDE, max_elements=MATRIX_MAX_ELEMENTS):
+    """
+    Pack (origin, destination) pairs into requests that stay inside the API
+    limits. Pairs sharing a destination are packed together first, since most
+    jobs in a batch head to the same handful of neighbourhoods.
+    Yields (origins, destinations) tuples of sorted lists.
+    """
+    origins, destinations = set(), set()
+    for origin, destination in sorted(set(pairs), key=lambda p: (p[1], p[0])):
+        grown_o = origins | {origin}
+        grown_d = destinations | {destination}
+        if (len(grown_o) > max_side or len(grown_d) > max_side
+                or len(grown_o) * len(grown_d) > max_elements):
+            yield sorted(origins), sorted(destinations)
+            grown_o, grown_d = {origin}, {destination}
+        origins, destinations = grown_o, grown_d
+    if origins:
+        yield sorted(origins), sorted(destinations)
+
+
+def fresh_cached_distances(pairs) -> dict:
+    """{(origin, destination): km} for the normalised pairs already cached and fresh."""
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    entries = DistanceCacheEntry.objects.filter(
+        origin__in={o for o, _ in pairs},
+        destination__in={d for _, d in pairs},
+        fetched_at__gte=timezone.now() - DISTANCE_CACHE_TTL,
+    ).values_list("origin", "destination", "distance_km")
+    return {(o, d): km for o, d, km in entries if (o, d) in pairs}
+
+
+def cached_distance_km(origin: str, destination: str):
+    """
+    Distance for a pair, served from DistanceCacheEntry while fresh and from
+    the Distance Matrix API otherwise. Failed lookups are not cached.
+    """
+    origin, destination = normalise_place(origin), normalise_place(destination)
+    if not origin or not destination:
+        return None
+
+    fresh = DistanceCacheEntry.objects.filter(
+        origin=origin, destination=destination,
+        fetched_at__gte=timezone.now() - DISTANCE_CACHE_TTL,
+    )
+    entry = fresh.values("pk", "distance_km").first()
+    if entry:
+        _count("hits")
+        DistanceCacheEntry.objects.filter(pk=entry["pk"]).update(hit_count=F("hit_count") + 1)
+        return entry["distance_km"]
+
+    _count("misses")
+    distance_km = fetch_distance_km(origin, destination)
+    if distance_km is not None:
+        store_distance(origin, destination, distance_km)
+    return distance_km
+
+
+def store_distance(origin: str, destination: str, distance_km) -> None:
+    DistanceCacheEntry.objects.update_or_create(
+        origin=normalise_place(origin), destination=normalise_place(destination),
+        defaults={"distance_km": distance_km, "fetched_at": timezone.now()},
+    )
+
+
+def update_job_distance(job_id: int) -> None:
+    """Look up and store distance_km for one job. Runs in the background."""
+    row = JobRequest.objects.filter(pk=job_id).values("address", "location").first()
+    if not row:
+        return
+    distance_km = cached_distance_km(row["address"], row["location"])
+    if distance_km is None:
+        return
+    # Only write if the job still points at the same places we measured.
+    updated = JobRequest.objects.filter(
+        pk=job_id, address=row["address"], location=row["location"],
+    ).update(distance_km=distance_km)
+    if updated:
+        logger.info(f"[Distance] Job #{job_id} → {distance_km} km")
+
+
+def schedule_distance_update(job_id: int) -> None:
+    run_after_commit(update_job_distance, job_id)
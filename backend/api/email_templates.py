@@ -0,0 +1,110 @@
+# api/email_templates.py
+"""
+Registry of transactional email templates (api/templates/emails/).
+
+Each registered mail has an HTML part (<name>.html, extending base.html), a
+plain-text part (<name>.txt) and a subject. Locale variants live next to the
+default as <name>.<locale>.html / .txt (e.g. welcome.sw.html) and fall back
+to the default when missing.
+
+Templates are rendered by a dedicated engine behind Django's cached loader:
+every variant is compiled once by warm() at startup, after which a render
+is just a context substitution.
+
+  render("team_invite", {"name": ...}, locale="sw") → (subject, html, text)
+"""
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.template import Context, Engine, TemplateDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates" / "emails"
+
+# name → {locale: subject template}; "" is the default locale.
+EMAIL_TEMPLATES = {
+    "welcome": {
+        "":   "Welcome to KaaKazini!",
+        "sw": "Karibu KaaKazini!",
+    },
+    "password_reset": {
+        "":   "Reset your KaaKazini password",
+    },
+    "team_invite": {
+        "":   "You're invited to join {{ craftsman_name }}'s team on KaaKazini",
+        "sw": "Umealikwa kujiunga na timu ya {{ craftsman_name }} kwenye KaaKazini",
+    },
+    "member_approved": {
+        "":   "You've been approved to join {{ craftsman_name }}'s team",
+    },
+    "craftsman_approved": {
+        "":   "Your Craftsman Profile Has Been Approved",
+    },
+}
+
+engine = Engine(
+    dirs=[str(TEMPLATE_DIR)],
+    loaders=[("django.template.loaders.cached.Loader", ["django.template.loaders.filesystem.Loader"])],
+    debug=False,
+)
+
+# Subjects are plain text; compile them without autoescaping.
+_subject_engine = Engine(debug=False, autoescape=False)
+_subjects = {
+    (name, locale): _subject_engine.from_string(subject)
+    for name, variants in EMAIL_TEMPLATES.items()
+    for locale, subject in variants.items()
+}
+
+# (name, locale) → (subject, html, text) compiled templates.
+_resolved = {}
+
+
+def _locale_chain(locale):
+    locale = (locale or getattr(settings, "EMAIL_DEFAULT_LOCALE", "")).lower().replace("_", "-")
+    chain = []
+    if locale:
+        chain.append(locale)
+        if "-" in locale:
+            chain.append(locale.split("-", 1)[0])
+    chain.append("")
+    return chain
+
+
+def _templates(name, locale):
+    key = (name, locale or "")
+    if key in _resolved:
+        return _resolved[key]
+    if name not in EMAIL_TEMPLATES:
+        raise KeyError(f"Unknown email template '{name}'")
+
+    chain = _locale_chain(locale)
+    subject = next(_subjects[(name, loc)] for loc in chain if (name, loc) in _subjects)
+    parts = []
+    for ext in ("html", "txt"):
+        candidates = [f"{name}.{loc}.{ext}" if loc else f"{name}.{ext}" for loc in chain]
+        parts.append(engine.select_template(candidates))
+    _resolved[key] = (subject, *parts)
+    return _resolved[key]
+
+
+def render(name, context, locale=None):
+    """Render a registered mail. Returns (subject, html, text)."""
+    subject, html, text = _templates(name, locale)
+    ctx = Context(context)
+    return subject.render(ctx).strip(), html.render(ctx), text.render(ctx).strip()
+
+
+def warm():
+    """Compile every registered template and locale variant."""
+    count = 0
+    for name, variants in EMAIL_TEMPLATES.items():
+        for locale in variants:
+            try:
+                _templates(name, locale)
+                count += 1
+            except TemplateDoesNotExist as exc:
+                logger.error(f"[Email] Missing template for '{name}' ({locale or 'default'}): {exc}")
+    return count
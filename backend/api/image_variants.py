@@ -0,0 +1,177 @@
+# api/image_variants.py
+"""
+Resized copies of uploaded images, so list pages can fetch a 480 px WebP
+instead of a multi-megabyte phone photo.
+
+For every image in VARIANT_FIELDS, each width in VARIANT_WIDTHS narrower
+than the original is stored next to it in every format in VARIANT_FORMATS
+(photo.jpg → photo_480w.webp, photo_480w.jpg, ...). The result is recorded
+on the row's variants JSON field:
+
+  {"source": "craftsmen/gallery/photo.jpg", "width": 4032,
+   "webp": {"128": "...", "480": "...", "1200": "..."},
+   "jpeg": {"128": "...", "480": "...", "1200": "..."}}
+
+"source" is the file the variants were made from; when the image is
+replaced they no longer match, the serializers stop offering them and they
+are regenerated. schedule_variants() queues generation on the outbox
+(api/outbox.py, kind "image.variants") in the transaction that saved the
+row, so the drain_outbox worker picks it up and retries it if the worker
+dies mid-way; api/signals.py calls it on save. `manage.py
+generate_image_variants` backfills existing images.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from accounts.authentication import invalidate_cached_user
+
+from .outbox import enqueue_many
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (1200, 480, 128)
+
+# format → (Pillow format, file extension, encoder options)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg",  {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# model label → (image field, variants field)
+VARIANT_FIELDS = {
+    "api.Craftsman":    ("profile", "profile_variants"),
+    "api.GalleryImage": ("image",   "image_variants"),
+    "api.Service":      ("image",   "image_variants"),
+    "api.Product":      ("image",   "image_variants"),
+}
+
+
+def _rotated(image):
+    """True when the EXIF orientation swaps width and height."""
+    return image.getexif().get(0x0112) in (5, 6, 7, 8)
+
+
+def _flatten(image):
+    """RGB copy for JPEG; transparent areas become white instead of black."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def build_variants(storage, name):
+    """Write the resized copies of `name` to storage. Returns the variants map."""
+    with storage.open(name, "rb") as fh:
+        image = Image.open(fh)
+        original_width = image.size[1] if _rotated(image) else image.size[0]
+        # Let the JPEG decoder downscale while decoding; the largest variant
+        # never needs more than VARIANT_WIDTHS[0] pixels on either side.
+        image.draft("RGB", (VARIANT_WIDTHS[0], VARIANT_WIDTHS[0]))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    variants = {"source": name, "width": original_width}
+    for fmt in VARIANT_FORMATS:
+        variants[fmt] = {}
+
+    root = os.path.splitext(name)[0]
+    current = image
+    for width in VARIANT_WIDTHS:
+        if width >= current.width:
+            continue
+        # Widths are descending: each step shrinks the previous one.
+        current = current.resize((width, max(1, round(current.height * width / current.width))), Image.LANCZOS)
+        for fmt, (pil_format, ext, options) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            frame = current if pil_format == "WEBP" else _flatten(current)
+            frame.save(buffer, pil_format, **options)
+            variants[fmt][str(width)] = storage.save(f"{root}_{width}w.{ext}", ContentFile(buffer.getvalue()))
+    return variants
+
+
+def variant_names(variants):
+    return [name for fmt in VARIANT_FORMATS for name in (variants or {}).get(fmt, {}).values()]
+
+
+def _delete(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception(f"[Variants] Could not delete {name}")
+
+
+def try_build_variants(label, pk, name):
+    """build_variants() for one row; a file that cannot be resized is recorded
+    with no sizes, so it is not retried until regenerated with force."""
+    if not name:
+        return {}
+    model = apps.get_model(label)
+    storage = model._meta.get_field(VARIANT_FIELDS[label][0]).storage
+    try:
+        return build_variants(storage, name)
+    except Exception as exc:
+        logger.warning(f"[Variants] {label} #{pk}: cannot resize {name}: {exc}")
+        return {"source": name, "error": str(exc)[:200]}
+
+
+def save_variants(label, pk, name, old, variants):
+    """
+    Record freshly built variants, provided the row still holds the image
+    they were made from, and delete the files they replace. Returns the
+    variants, or None (and removes them again) if the row moved on.
+    """
+    model = apps.get_model(label)
+    file_field, variants_field = VARIANT_FIELDS[label]
+    storage = model._meta.get_field(file_field).storage
+    updated = model.objects.filter(pk=pk, **{file_field: name}).update(**{variants_field: variants})
+    if not updated:
+        _delete(storage, variant_names(variants))
+        return None
+    _delete(storage, set(variant_names(old)) - set(variant_names(variants)))
+    if label == "api.Craftsman":
+        invalidate_cached_user(*model.objects.filter(pk=pk).values_list("user_id", flat=True))
+    logger.info(f"[Variants] {label} #{pk}: {len(variant_names(variants))} variants of {name or '—'}")
+    return variants
+
+
+def generate_variants(label, pk, force=False):
+    """
+    Bring one row's variants up to date with its image. Returns the variants
+    map, or None when the row is gone or the image changed mid-way.
+    """
+    model = apps.get_model(label)
+    file_field, variants_field = VARIANT_FIELDS[label]
+    row = model.objects.filter(pk=pk).values(file_field, variants_field).first()
+    if row is None:
+        return None
+    name, old = row[file_field], row[variants_field] or {}
+    if not force and old.get("source", "") == (name or ""):
+        return old
+    return save_variants(label, pk, name, old, try_build_variants(label, pk, name))
+
+
+def needs_variants(instance):
+    label = instance._meta.label
+    if label not in VARIANT_FIELDS:
+        return False
+    file_field, variants_field = VARIANT_FIELDS[label]
+    name = getattr(instance, file_field).name or ""
+    return (getattr(instance, variants_field) or {}).get("source", "") != name
+
+
+def schedule_variants(*instances):
+    """Queue variant generation for these rows; call inside the transaction that saves them."""
+    payloads = [
+        {"label": instance._meta.label, "pk": instance.pk}
+        for instance in instances if needs_variants(instance)
+    ]
+    if payloads:
+        enqueue_many("image.variants", payloads)
@@ -1,5 +1,16 @@
 import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+
 import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +28,311 @@ HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
 PLATFORM_WALLET_FALLBACK = 2
 
 
+TERMINAL_STATUSES = ("COMPLETE", "FAIL")
+
+STATUS_READ_TIMEOUT = 15
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 0. GATEWAY CLIENT
+#
+#    One keep-alive session shared by every call in the process, so STK pushes
+#    and polls reuse pooled TCP/TLS connections to the gateway. GETs are
+#    retried with backoff on connection errors and 502/503/504 (not on read
+#    timeouts); POSTs are never retried (a repeated checkout would prompt
+#    the customer twice).
+# ─────────────────────────────────────────────────────────────────────────────
+
+class GatewayUnavailable(requests.exceptions.RequestException):
+    """Raised instead of calling out while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    closed    → calls go through; `failure_threshold` consecutive failures
+                (timeouts, connection errors, 5xx) trip it open.
+    open      → calls fail fast with GatewayUnavailable for `reset_timeout`
+                seconds.
+    half_open → one probe call is let through; success closes the circuit,
+                failure opens it again.
+
+    State is per worker process. Each worker publishes its state changes to
+    the shared cache under circuit:<name>, after releasing its own lock, so
+    published() can show the whole fleet; a worker not listed is closed.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    PUBLISH_LOCK_WAIT = 0.5   # seconds; publishing is best effort
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name              = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout     = reset_timeout
+        self._lock     = threading.Lock()
+        self._state    = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._generation = 0
+
+    def allow_request(self) -> bool:
+        published = None
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                published = self._transition(self.HALF_OPEN)
+            allowed = not self._probe_in_flight
+            self._probe_in_flight = True
+        if published:
+            self._publish(*published)
+        return allowed
+
+    def record_success(self) -> None:
+        published = None
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != self.CLOSED:
+                published = self._transition(self.CLOSED)
+        if published:
+            self._publish(*published)
+
+    def record_failure(self) -> None:
+        published = None
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                published = self._transition(self.OPEN)
+        if published:
+            self._publish(*published)
+
+    def _transition(self, state) -> tuple:
+        """Switch state (caller holds self._lock). Returns what to _publish()
+        once the lock is released — the cache is never touched under it."""
+        log = logger.warning if state == self.OPEN else logger.info
+        log(f"[Circuit] {self.name}: {self._state} → {state} (consecutive failures: {self._failures})")
+        self._state = state
+        self._generation += 1
+        return self._generation, self._snapshot()
+
+    def _publish(self, generation, snapshot) -> None:
+        """
+        Record a state change in the shared circuit:<name> map; never raises.
+        Runs outside self._lock, so publishes may land out of order: an entry
+        is only replaced by a later generation.
+        """
+        key, worker = f"circuit:{self.name}", f"{socket.gethostname()}:{os.getpid()}"
+        lock_key, token = f"{key}:lock", uuid.uuid4().hex
+        try:
+            deadline = time.monotonic() + self.PUBLISH_LOCK_WAIT
+            while not cache.add(lock_key, token, 5):
+                if time.monotonic() >= deadline:
+                    logger.warning(f"[Circuit] {self.name}: state not published (map locked)")
+                    return
+                time.sleep(0.01)
+            try:
+                now = time.time()
+                workers = {w: s for w, s in (cache.get(key) or {}).items() if s["expires_at"] > now}
+                if workers.get(worker, {}).get("generation", 0) < generation:
+                    workers[worker] = {**snapshot, "worker": worker, "generation": generation,
+                                       "expires_at": now + self.reset_timeout}
+                    cache.set(key, workers, None)
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+        except Exception as exc:
+            logger.warning(f"[Circuit] {self.name}: state not published: {exc}")
+
+    def _snapshot(self) -> dict:
+        retry_in = 0.0
+        if self._state == self.OPEN:
+            retry_in = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+        return {
+            "name":                 self.name,
+            "state":                self._state,
+            "consecutive_failures": self._failures,
+            "retry_in_seconds":     round(retry_in, 1),
+        }
+
+    def state(self) -> dict:
+        with self._lock:
+            return self._snapshot()
+
+    def published(self) -> list:
+        """Open / half-open circuits across all workers, as published to the cache.
+        An open entry lapses when its worker would let a probe through anyway."""
+        now = time.time()
+        workers = []
+        for entry in (cache.get(f"circuit:{self.name}") or {}).values():
+            expires_at = entry["expires_at"]
+            if expires_at <= now or entry["state"] == self.CLOSED:
+                continue
+            entry = {k: v for k, v in entry.items() if k not in ("expires_at", "generation")}
+            if entry["state"] == self.OPEN:
+                entry["retry_in_seconds"] = round(expires_at - now, 1)
+            workers.append(entry)
+        return sorted(workers, key=lambda entry: entry["worker"])
+
+
+class GatewayClient:
+    def __init__(self, pool_size=10, connect_timeout=3.05, retries=2, backoff=0.3, breaker=None):
+        self.pool_size       = pool_size
+        self.connect_timeout = connect_timeout
+        self.retries         = retries
+        self.backoff         = backoff
+        self.breaker         = breaker or CircuitBreaker("payment-gateway")
+        self._session = None
+        self._lock    = threading.Lock()
+        self._metrics = {}
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        # Read timeouts are not retried: the gateway may still be working on
+        # the request, and each retry would hold the worker for another full
+        # read timeout. Retry-After is ignored so a 503 cannot stretch the wait.
+        retry = Retry(
+            total=self.retries,
+            read=False,
+            backoff_factor=self.backoff,
+            respect_retry_after_header=False,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def request(self, method: str, url: str, endpoint: str, read_timeout: float, **kwargs):
+        if not self.breaker.allow_request():
+            raise GatewayUnavailable(f"Payment gateway circuit open — {endpoint} not attempted")
+        started = time.monotonic()
+        failed = True
+        try:
+            resp = self.session.request(
+                method, url, timeout=(self.connect_timeout, read_timeout), **kwargs
+            )
+            failed = resp.status_code >= 500
+            return resp
+        finally:
+            self._record(endpoint, (time.monotonic() - started) * 1000, failed)
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+    def worst_case_seconds(self, read_timeout: float) -> float:
+        """
+        Longest one GET can take: every attempt (the first plus `retries`)
+        waiting out its connect and read timeouts, plus the backoff sleeps.
+        """
+        backoff = sum(
+            min(self.backoff * 2 ** n, Retry.DEFAULT_BACKOFF_MAX) for n in range(self.retries)
+        )
+        return (self.retries + 1) * (self.connect_timeout + read_timeout) + backoff
+
+    def get(self, url, endpoint, read_timeout, **kwargs):
+        return self.request("GET", url, endpoint, read_timeout, **kwargs)
+
+    def post(self, url, endpoint, read_timeout, **kwargs):
+        return self.request("POST", url, endpoint, read_timeout, **kwargs)
+
+    def _record(self, endpoint: str, elapsed_ms: float, failed: bool) -> None:
+        with self._lock:
+            m = self._metrics.setdefault(
+                endpoint, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            m["calls"]    += 1
+            m["errors"]   += int(failed)
+            m["total_ms"] += elapsed_ms
+            m["max_ms"]    = max(m["max_ms"], elapsed_ms)
+
+    def metrics(self) -> dict:
+        """Per-endpoint call count, error count and latency (ms) since start-up."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "calls":  m["calls"],
+                    "errors": m["errors"],
+                    "avg_ms": round(m["total_ms"] / m["calls"], 1) if m["calls"] else 0.0,
+                    "max_ms": round(m["max_ms"], 1),
+                }
+                for endpoint, m in self._metrics.items()
+            }
+
+
+gateway = GatewayClient(
+    pool_size=getattr(settings, "PAYMENT_GATEWAY_POOL_SIZE", 10),
+    connect_timeout=getattr(settings, "PAYMENT_GATEWAY_CONNECT_TIMEOUT", 3.05),
+    retries=getattr(settings, "PAYMENT_GATEWAY_RETRIES", 2),
+    breaker=CircuitBreaker(
+        "payment-gateway",
+        failure_threshold=getattr(settings, "PAYMENT_GATEWAY_FAILURE_THRESHOLD", 5),
+        reset_timeout=getattr(settings, "PAYMENT_GATEWAY_RESET_SECONDS", 30),
+    ),
+)
+
+GATEWAY_UNAVAILABLE_ERROR = "Payment gateway is temporarily unavailable. Please try again shortly."
+
+
+def _unavailable() -> dict:
+    return {"success": False, "error": GATEWAY_UNAVAILABLE_ERROR, "circuit_open": True}
+
+
+def gateway_metrics() -> dict:
+    return gateway.metrics()
+
+
+def gateway_health() -> dict:
+    return {
+        "circuit":   gateway.breaker.state(),
+        "workers":   gateway.breaker.published(),
+        "endpoints": gateway.metrics(),
+    }
+
+
+def normalise_status(raw_status) -> str:
+    """Gateway status → COMPLETE | FAIL | PENDING"""
+    status = str(raw_status or "PENDING").upper().strip()
+    if status in ("FAILED", "FAIL", "CANCELLED", "CANCELED"):
+        return "FAIL"
+    if status in ("COMPLETE", "COMPLETED"):
+        return "COMPLETE"
+    return "PENDING"
+
+
+def extract_transaction_id(data: dict) -> str:
+    """The gateway is inconsistent about where and how it names the id."""
+    d = data.get("data") or {}
+    transaction_id = (
+        d.get("id")
+        or d.get("transaction_id")
+        or d.get("transactionId")
+        or d.get("invoice_id")
+        or data.get("id")
+        or data.get("transaction_id")
+        or data.get("transactionId")
+        or ""
+    )
+    return str(transaction_id) if transaction_id else ""
+
+
 def _phone(number: str) -> str:
     """0712345678 / +254712345678 → 254712345678"""
     p = str(number).replace("+", "").replace(" ", "").strip()
@@ -37,7 +353,7 @@ def create_craftsman_wallet(craftsman_name: str, craftsman_id: int) -> dict:
     }
     logger.info(f"[Wallet] Creating for craftsman #{craftsman_id} '{craftsman_name}'")
     try:
-        resp = requests.post(WALLET_URL, json=payload, headers=HEADERS, timeout=20)
+        resp = gateway.post(WALLET_URL, "wallet", read_timeout=20, json=payload)
         logger.info(f"[Wallet] {resp.status_code}: {resp.text[:300]}")
         try:
             data = resp.json()
@@ -55,6 +371,8 @@ def create_craftsman_wallet(craftsman_name: str, craftsman_id: int) -> dict:
         err = data.get("message") or data.get("detail") or data.get("error") or str(data)
         return {"success": False, "error": str(err)}
 
+    except GatewayUnavailable:
+        return _unavailable()
     except requests.exceptions.Timeout:
         return {"success": False, "error": "Gateway timed out creating wallet."}
     except requests.exceptions.ConnectionError:
@@ -94,7 +412,7 @@ def initiate_stk_push(
 
     logger.info(f"[STK] Job #{job_id} | {phone} | KES {amount} | wallet #{wallet_id}")
     try:
-        resp = requests.post(CHECKOUT_URL, json=payload, headers=HEADERS, timeout=30)
+        resp = gateway.post(CHECKOUT_URL, "checkout", read_timeout=30, json=payload)
         logger.info(f"[STK] {resp.status_code}: {resp.text[:400]}")
 
         try:
@@ -103,18 +421,7 @@ def initiate_stk_push(
             return {"success": False, "error": f"Non-JSON ({resp.status_code}): {resp.text[:200]}"}
 
         if resp.status_code in (200, 201, 202):
-            d = data.get("data") or {}
-            transaction_id = (
-                d.get("id")
-                or d.get("transaction_id")
-                or d.get("transactionId")
-                or d.get("invoice_id")
-                or data.get("id")
-                or data.get("transaction_id")
-                or data.get("transactionId")
-                or ""
-            )
-            transaction_id = str(transaction_id) if transaction_id else ""
+            transaction_id = extract_transaction_id(data)
             logger.info(f"[STK] OK Job #{job_id} | tx={transaction_id}")
             return {"success": True, "transaction_id": transaction_id, "raw": data}
 
@@ -122,6 +429,8 @@ def initiate_stk_push(
         logger.warning(f"[STK] Failed {resp.status_code}: {err}")
         return {"success": False, "error": str(err), "raw": data}
 
+    except GatewayUnavailable:
+        return _unavailable()
     except requests.exceptions.Timeout:
         return {"success": False, "error": "Gateway timed out. Try again."}
     except requests.exceptions.ConnectionError:
@@ -139,7 +448,7 @@ def check_payment_status(transaction_id: str) -> dict:
     url = f"{TRANSACTION_URL}/{transaction_id}"
     logger.debug(f"[Poll] GET {url}")
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
+        resp = gateway.get(url, "transaction", read_timeout=STATUS_READ_TIMEOUT)
         logger.info(f"[Poll] tx={transaction_id} → {resp.status_code}: {resp.text[:300]}")
 
         try:
@@ -156,24 +465,111 @@ def check_payment_status(transaction_id: str) -> dict:
                 or data.get("state")
                 or "PENDING"
             )
-            status = str(raw_status).upper().strip()
-
             # Normalise — gateway returns "COMPLETED" and "FAILED"
-            if status in ("FAILED", "FAIL", "CANCELLED", "CANCELED"):
-                status = "FAIL"
-            elif status in ("COMPLETE", "COMPLETED"):
-                status = "COMPLETE"
-            else:
-                status = "PENDING"
+            status = normalise_status(raw_status)
 
             logger.info(f"[Poll] tx={transaction_id} raw='{raw_status}' → '{status}'")
             return {"success": True, "status": status, "raw": data}
 
         return {"success": False, "error": f"HTTP {resp.status_code}: {str(data)[:200]}"}
 
+    except GatewayUnavailable:
+        return _unavailable()
     except requests.exceptions.Timeout:
         logger.warning(f"[Poll] Timeout tx={transaction_id} — will retry")
         return {"success": False, "error": "Timeout polling gateway"}
     except Exception as exc:
         logger.error(f"[Poll] Error tx={transaction_id}: {exc}")
-        return {"success": False, "error": str(exc)}
\ No newline at end of file
+        return {"success": False, "error": str(exc)}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 4. CACHED POLL
+#
+#    Many tabs / retries polling one transaction collapse into at most one
+#    gateway call per PAYMENT_STATUS_CACHE_SECONDS across all workers. The
+#    caller that wins cache.add() on the transaction's lock key makes the call;
+#    the lock outlives the slowest possible call, so no second worker starts
+#    the same lookup. Everyone else re-reads the cache for at most
+#    PAYMENT_STATUS_WAIT_SECONDS, then gets an "in_flight" result and serves
+#    the state already stored on the job. Within a process, threads queue on
+#    a local lock first so only one of them contends for the shared one.
+#    COMPLETE / FAIL never change again, so they are cached permanently.
+# ─────────────────────────────────────────────────────────────────────────────
+
+STATUS_CACHE_SECONDS = getattr(settings, "PAYMENT_STATUS_CACHE_SECONDS", 5)
+STATUS_WAIT_SECONDS  = getattr(settings, "PAYMENT_STATUS_WAIT_SECONDS", 3)
+STATUS_LOCK_POLL     = 0.1
+
+_inflight_guard = threading.Lock()
+_inflight = {}
+
+
+def _status_cache_key(transaction_id: str) -> str:
+    return f"intasend:tx-status:{transaction_id}"
+
+
+def _status_lock_seconds() -> int:
+    """Lock TTL: the gateway client's worst case for one status GET, plus slack."""
+    return math.ceil(gateway.worst_case_seconds(STATUS_READ_TIMEOUT)) + 5
+
+
+def _in_flight(transaction_id: str) -> dict:
+    logger.info(f"[Poll] tx={transaction_id} lookup in flight elsewhere — serving stored state")
+    return {"success": False, "in_flight": True, "error": "Status lookup already in progress"}
+
+
+def _fetch_status_once(transaction_id: str, key: str, deadline: float) -> dict:
+    """Poll the gateway, unless another worker already is — then wait for its result until `deadline`."""
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    while not cache.add(lock_key, token, _status_lock_seconds()):
+        if time.monotonic() >= deadline:
+            return _in_flight(transaction_id)
+        time.sleep(STATUS_LOCK_POLL)
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    try:
+        # The previous lock holder may have filled the cache just before releasing.
+        result = cache.get(key)
+        if result is not None:
+            return result
+        result = check_payment_status(transaction_id)
+        final = result["success"] and result["status"] in TERMINAL_STATUSES
+        cache.set(key, result, None if final else STATUS_CACHE_SECONDS)
+        return result
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def check_payment_status_cached(transaction_id: str) -> dict:
+    """
+    Gateway status for a transaction, through the shared cache. Returns
+    {"success": False, "in_flight": True, ...} when another caller's lookup
+    is still running after PAYMENT_STATUS_WAIT_SECONDS.
+    """
+    key = _status_cache_key(transaction_id)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    deadline = time.monotonic() + STATUS_WAIT_SECONDS
+    with _inflight_guard:
+        call_lock = _inflight.setdefault(transaction_id, threading.Lock())
+
+    if not call_lock.acquire(timeout=STATUS_WAIT_SECONDS):
+        return cache.get(key) or _in_flight(transaction_id)
+    try:
+        # Whoever held the lock before us may have filled the cache.
+        result = cache.get(key)
+        if result is not None:
+            return result
+        return _fetch_status_once(transaction_id, key, deadline)
+    finally:
+        call_lock.release()
+        with _inflight_guard:
+            if _inflight.get(transaction_id) is call_lock and not call_lock.locked():
+                del _inflight[transaction_id]
@@ -0,0 +1,182 @@
+# api/mail.py
+"""
+The one way the platform sends email.
+
+  send_mail(to_email, subject, html, to_name="", text="")  → bool
+  send_template(template, to_email, to_name="", locale=None, **context) → bool
+  send_mass_mail([message, ...])                            → number accepted
+
+A message is a dict with to_email, to_name, subject, html and optional text.
+MAIL_BACKEND picks the delivery backend:
+
+  api.mail.BrevoBackend   Brevo transactional API over one pooled keep-alive
+                          session; send_mass_mail goes out as batch requests
+                          (messageVersions, up to 1000 recipients each).
+  api.mail.FileBackend    appends each message as a JSON line to MAIL_FILE_PATH.
+  api.mail.LocmemBackend  keeps messages in LocmemBackend.sent (tests, load tests).
+
+send_template() / template_message() build the message from a registered
+template in api/email_templates.py.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from . import email_templates
+
+logger = logging.getLogger(__name__)
+
+BREVO_SEND_URL = "https://api.brevo.com/v3/smtp/email"
+BREVO_BATCH_LIMIT = 1000
+REPLY_TO = {"name": "KaaKazini", "email": "support@kaakazini.com"}
+
+
+# ─────────────────────────────────────────────
+# Backends
+# ─────────────────────────────────────────────
+
+def _sender():
+    return {
+        "name":  getattr(settings, "BREVO_SENDER_NAME", "KaaKazini"),
+        "email": getattr(settings, "BREVO_SENDER_EMAIL", "noreply@kaakazini.com"),
+    }
+
+
+def _recipient(message):
+    return {"email": message["to_email"], "name": message.get("to_name") or "User"}
+
+
+class BrevoBackend:
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=getattr(settings, "MAIL_POOL_SIZE", 10),
+        )
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+        self.timeout = (3.05, getattr(settings, "MAIL_TIMEOUT", 10))
+
+    def _post(self, payload, label) -> bool:
+        api_key = getattr(settings, "BREVO_API_KEY", "")
+        if not api_key:
+            logger.warning(f"[Mail] BREVO_API_KEY not set — skipping {label}")
+            return False
+        try:
+            resp = self.session.post(
+                BREVO_SEND_URL, json=payload, headers={"api-key": api_key}, timeout=self.timeout,
+            )
+            resp.raise_for_status()
+        except requests.RequestException as exc:
+            body = exc.response.text if getattr(exc, "response", None) is not None else "—"
+            logger.error(f"[Mail] Brevo send failed for {label}: {exc} — body: {body}")
+            return False
+        logger.info(f"[Mail] Brevo accepted {label}")
+        return True
+
+    def send_messages(self, messages) -> int:
+        if len(messages) == 1:
+            message = messages[0]
+            payload = {
+                "sender":      _sender(),
+                "replyTo":     REPLY_TO,
+                "to":          [_recipient(message)],
+                "subject":     message["subject"],
+                "htmlContent": message["html"],
+            }
+            if message.get("text"):
+                payload["textContent"] = message["text"]
+            return int(self._post(payload, message["to_email"]))
+
+        sent = 0
+        for start in range(0, len(messages), BREVO_BATCH_LIMIT):
+            batch = messages[start:start + BREVO_BATCH_LIMIT]
+            versions = []
+            for message in batch:
+                version = {
+                    "to":          [_recipient(message)],
+                    "subject":     message["subject"],
+                    "htmlContent": message["html"],
+                }
+                if message.get("text"):
+                    version["textContent"] = message["text"]
+                versions.append(version)
+            payload = {
+                "sender":          _sender(),
+                "replyTo":         REPLY_TO,
+                "subject":         batch[0]["subject"],
+                "htmlContent":     batch[0]["html"],
+                "messageVersions": versions,
+            }
+            if self._post(payload, f"batch of {len(batch)}"):
+                sent += len(batch)
+        return sent
+
+
+class FileBackend:
+    def __init__(self):
+        self.path = getattr(
+            settings, "MAIL_FILE_PATH", os.path.join(tempfile.gettempdir(), "kaakazini-mail.jsonl"),
+        )
+        self._lock = threading.Lock()
+
+    def send_messages(self, messages) -> int:
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            for message in messages:
+                fh.write(json.dumps(message) + "\n")
+        return len(messages)
+
+
+class LocmemBackend:
+    sent = []
+    _lock = threading.Lock()
+
+    def send_messages(self, messages) -> int:
+        with self._lock:
+            type(self).sent.extend(messages)
+        return len(messages)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    path = getattr(settings, "MAIL_BACKEND", "api.mail.BrevoBackend")
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
+
+
+# ─────────────────────────────────────────────
+# Sending
+# ─────────────────────────────────────────────
+
+def send_mail(to_email: str, subject: str, html: str, to_name: str = "", text: str = "") -> bool:
+    message = {"to_email": to_email, "to_name": to_name, "subject": subject, "html": html, "text": text}
+    return get_backend().send_messages([message]) == 1
+
+
+def send_mass_mail(messages) -> int:
+    messages = list(messages)
+    if not messages:
+        return 0
+    return get_backend().send_messages(messages)
+
+
+def template_message(template: str, to_email: str, to_name: str = "", locale=None, **context) -> dict:
+    subject, html, text = email_templates.render(template, context, locale=locale)
+    return {"to_email": to_email, "to_name": to_name, "subject": subject, "html": html, "text": text}
+
+
+def send_template(template: str, to_email: str, to_name: str = "", locale=None, **context) -> bool:
+    message = template_message(template, to_email, to_name, locale=locale, **context)
+    return get_backend().send_messages([message]) == 1
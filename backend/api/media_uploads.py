@@ -0,0 +1,92 @@
+# api/media_uploads.py
+"""
+Concurrent uploads for requests that carry several files (portfolio photos,
+job proof images).
+
+  store_files(instances, "image", request.FILES.getlist(...))
+
+pushes files[i] into instances[i].image through the field's storage
+(MediaStorage → Spaces) on a small thread pool, so ten photos cost roughly
+one PUT of latency instead of ten. The instances come back unsaved with
+their file names set, in input order, ready for one bulk_create.
+
+If any upload fails, the files that did reach storage are deleted again and
+the first error is re-raised — the caller never gets to create rows for a
+partial batch. discard_files() removes a stored batch whose rows could not
+be written.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_WORKERS = getattr(settings, "MEDIA_UPLOAD_WORKERS", 6)
+
+
+def _target_names(field, instances, files):
+    """Storage names per file; repeats within the batch (every iOS photo is
+    "image.jpg") get distinct names up front so parallel saves cannot collide."""
+    names, seen = [], set()
+    for instance, file in zip(instances, files):
+        name = field.generate_filename(instance, file.name)
+        while name in seen:
+            root, ext = os.path.splitext(name)
+            name = field.storage.get_alternative_name(root, ext)
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def store_files(instances, field_name, files):
+    """Upload files[i] into instances[i].<field_name> concurrently. Returns instances."""
+    instances, files = list(instances), list(files)
+    if not files:
+        return instances
+    if len(instances) != len(files):
+        raise ValueError("store_files needs one instance per file")
+
+    field = instances[0]._meta.get_field(field_name)
+    storage = field.storage
+    names = _target_names(field, instances, files)
+
+    def upload(name, file):
+        return storage.save(name, file, max_length=field.max_length)
+
+    workers = max(1, min(UPLOAD_WORKERS, len(files)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kaakazini-upload") as pool:
+        futures = [pool.submit(upload, name, file) for name, file in zip(names, files)]
+        wait(futures)
+
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        stored = [f.result() for f in futures if f.exception() is None]
+        logger.error(
+            f"[Upload] {len(errors)} of {len(files)} uploads failed — "
+            f"removing {len(stored)} stored files: {errors[0]}"
+        )
+        _delete(storage, stored)
+        raise errors[0]
+
+    for instance, future in zip(instances, futures):
+        setattr(instance, field_name, future.result())
+    logger.info(f"[Upload] Stored {len(files)} files ({workers} parallel)")
+    return instances
+
+
+def discard_files(instances, field_name):
+    """Delete the stored files of instances whose rows were never created."""
+    instances = list(instances)
+    if instances:
+        storage = instances[0]._meta.get_field(field_name).storage
+        _delete(storage, [getattr(i, field_name).name for i in instances if getattr(i, field_name)])
+
+
+def _delete(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception(f"[Upload] Could not delete orphaned file {name}")
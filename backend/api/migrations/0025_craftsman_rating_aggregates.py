@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:40
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Craftsman = apps.get_model('api', 'Craftsman')
+    Review = apps.get_model('api', 'Review')
+    rows = Review.objects.values('craftsman_id').annotate(count=Count('id'), total=Sum('rating'))
+    for row in rows:
+        count, total = row['count'], row['total'] or 0
+        Craftsman.objects.filter(pk=row['craftsman_id']).update(
+            review_count=count,
+            rating_sum=total,
+            rating_avg=(Decimal(total) / Decimal(count)).quantize(Decimal('0.01')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_jobrequest_intasend_invoice_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='craftsman',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='craftsman',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='craftsman',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='craftsman',
+            index=models.Index(fields=['-rating_avg', '-review_count'], name='craftsman_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_distancecacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobrequest',
+            index=models.Index(fields=['client', '-created_at', '-id'], name='job_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobrequest',
+            index=models.Index(fields=['craftsman', '-created_at', '-id'], name='job_craftsman_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobrequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='job_status_created_idx'),
+        ),
+    ]
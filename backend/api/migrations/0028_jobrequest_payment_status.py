@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_jobrequest_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobrequest',
+            name='payment_failure_reason',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='jobrequest',
+            name='payment_status',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='jobrequest',
+            name='payment_status_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='jobrequest',
+            name='intasend_invoice_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+    ]
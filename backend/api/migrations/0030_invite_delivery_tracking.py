@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teaminvite',
+            name='delivery_channel',
+            field=models.CharField(blank=True, default='', help_text='Channel of the latest delivery attempt', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='teaminvite',
+            name='delivery_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('sent', 'Sent'), ('fallback_queued', 'Queued on fallback channel'), ('failed', 'Failed')], default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='InviteDeliveryAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('whatsapp', 'WhatsApp'), ('link', 'Link')], max_length=20)),
+                ('succeeded', models.BooleanField(default=False)),
+                ('detail', models.CharField(blank=True, default='', max_length=255)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_attempts', to='api.teaminvite')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+    ]
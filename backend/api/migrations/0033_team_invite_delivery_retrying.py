@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_review_rating_range'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='teaminvite',
+            name='delivery_status',
+            field=models.CharField(blank=True, choices=[('queued', 'Queued'), ('sent', 'Sent'), ('fallback_queued', 'Queued on fallback channel'), ('retrying', 'Failed, retry scheduled'), ('failed', 'Failed')], default='', max_length=20),
+        ),
+    ]
@@ -1,12 +1,12 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth import get_user_model
-from accounts.models import CustomUser
+from accounts.models import CustomUser, LoadDeferredTogetherMixin
 from decimal import Decimal
 from datetime import timedelta
-import requests
 
+from django.utils import timezone
 from django.utils.text import slugify
-from django.conf import settings
 import uuid
 
 
@@ -43,7 +43,7 @@ EXPERIENCE_LEVEL_CHOICES = [
 ]
 
 
-class Craftsman(models.Model):
+class Craftsman(LoadDeferredTogetherMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('approved', 'Approved'),
@@ -52,6 +52,8 @@ class Craftsman(models.Model):
 
     user         = models.OneToOneField(User, on_delete=models.CASCADE)
     profile      = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Resized WebP / JPEG copies of `profile` (api/image_variants.py)
+    profile_variants = models.JSONField(default=dict, blank=True)
     full_name    = models.CharField(max_length=255, blank=True, null=True)
     profession   = models.CharField(max_length=100, blank=True, null=True)
     company_name = models.CharField(max_length=255, blank=True, null=True)
@@ -94,8 +96,22 @@ class Craftsman(models.Model):
     )
     # ─────────────────────────────────────────────────────────────────────────
 
+    # ── Rating aggregates ─────────────────────────────────────────────────────
+    # Denormalised from Review so listings can sort / filter by rating without
+    # touching the reviews table. Kept in step by api/signals.py; rebuild with
+    # `manage.py rebuild_rating_aggregates`.
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum   = models.IntegerField(default=0)
+    rating_avg   = models.DecimalField(max_digits=3, decimal_places=2, default=Decimal('0.00'))
+    # ─────────────────────────────────────────────────────────────────────────
+
     slug = models.SlugField(unique=True, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating_avg', '-review_count'], name='craftsman_rating_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug and self.user.full_name:
             self.slug = slugify(self.user.full_name)
@@ -121,6 +137,7 @@ class Service(models.Model):
         max_length=20, choices=RATE_UNIT_CHOICES, default='fixed', blank=True, null=True
     )
     image      = models.ImageField(upload_to='services/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     is_approved = models.BooleanField(default=False)
     custom_service_name = models.CharField(max_length=255, blank=True, null=True)
 
@@ -145,6 +162,7 @@ class Product(models.Model):
     price       = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(default="No description provided")
     image       = models.ImageField(upload_to='products/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     status      = models.CharField(max_length=20, default='pending')
     is_approved = models.BooleanField(default=False)
 
@@ -154,6 +172,7 @@ class GalleryImage(models.Model):
         Craftsman, related_name='gallery_images', on_delete=models.CASCADE
     )
     image = models.ImageField(upload_to='craftsmen/gallery/')
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"GalleryImage #{self.pk} for {self.craftsman}"
@@ -163,7 +182,7 @@ class Review(models.Model):
     craftsman = models.ForeignKey(Craftsman, related_name='reviews', on_delete=models.CASCADE)
     reviewer  = models.CharField(max_length=255)
     location  = models.CharField(max_length=255, blank=True, null=True)
-    rating    = models.IntegerField()
+    rating    = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment   = models.TextField()
 
     def __str__(self):
@@ -225,37 +244,60 @@ class JobRequest(models.Model):
     quote_details   = models.JSONField(blank=True, null=True)
     quote_file      = models.FileField(upload_to='quotes/', null=True, blank=True)
     quote_approved_by_client = models.BooleanField(null=True, blank=True)
-    intasend_invoice_id = models.CharField(max_length=100, blank=True, default="")
+    intasend_invoice_id = models.CharField(max_length=100, blank=True, default="", db_index=True)
+
+    # Last gateway state for intasend_invoice_id, written by the gateway
+    # callback or a poll (see api/payment_state.py): PENDING | COMPLETE | FAIL.
+    payment_status         = models.CharField(max_length=20, blank=True, default="")
+    payment_failure_reason = models.CharField(max_length=255, blank=True, default="")
+    payment_status_at      = models.DateTimeField(null=True, blank=True)
 
     status     = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
     review     = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    GOOGLE_MAPS_API_KEY      = getattr(settings, 'GOOGLE_MAPS_API_KEY', '')
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', '-created_at', '-id'],    name='job_client_created_idx'),
+            models.Index(fields=['craftsman', '-created_at', '-id'], name='job_craftsman_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'],    name='job_status_created_idx'),
+        ]
+
     DEFAULT_JOB_DURATION_HOURS = 2
     COMPANY_FEE_PERCENT      = Decimal('10.0')
+    DISTANCE_INPUT_FIELDS    = ('address', 'location')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_distance_inputs = instance._distance_inputs()
+        return instance
+
+    def _distance_inputs(self):
+        return tuple(self.__dict__.get(f) for f in self.DISTANCE_INPUT_FIELDS)
+
+    def distance_inputs_changed(self):
+        return getattr(self, '_loaded_distance_inputs', None) != self._distance_inputs()
 
     def calculate_distance(self):
-        if not self.location or not self.address:
-            return None
-        try:
-            url = (
-                f"https://maps.googleapis.com/maps/api/distancematrix/json"
-                f"?origins={self.address}&destinations={self.location}&key={self.GOOGLE_MAPS_API_KEY}"
-            )
-            response = requests.get(url).json()
-            distance_m = response['rows'][0]['elements'][0]['distance']['value']
-            return Decimal(distance_m / 1000).quantize(Decimal('0.01'))
-        except Exception:
-            return None
+        """Cached, possibly blocking Distance Matrix lookup. Never call this from a request."""
+        from .distance import cached_distance_km
+        return cached_distance_km(self.address, self.location)
 
     def save(self, *args, **kwargs):
         if not self.expected_end and self.schedule:
             self.expected_end = self.schedule + timedelta(hours=self.DEFAULT_JOB_DURATION_HOURS)
 
-        new_distance = self.calculate_distance()
-        if new_distance:
-            self.distance_km = new_distance
+        # Distance is looked up in the background, and only when the places
+        # changed — status transitions never reach the Maps API.
+        update_fields = kwargs.get('update_fields')
+        refresh_distance = self.distance_inputs_changed() and (
+            update_fields is None or set(update_fields) & set(self.DISTANCE_INPUT_FIELDS)
+        )
+        if refresh_distance:
+            self.distance_km = None
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'distance_km'}
 
         if self.start_time and self.end_time:
             diff_hours = (self.end_time - self.start_time).total_seconds() / 3600
@@ -273,6 +315,12 @@ class JobRequest(models.Model):
 
         super().save(*args, **kwargs)
 
+        if refresh_distance:
+            self._loaded_distance_inputs = self._distance_inputs()
+            if self.location and self.address:
+                from .distance import schedule_distance_update
+                schedule_distance_update(self.pk)
+
     def __str__(self):
         label = dict(PRIMARY_SERVICE_CHOICES).get(self.service, self.service)
         if self.service == 'other' and self.custom_service:
@@ -280,6 +328,25 @@ class JobRequest(models.Model):
         return f"{label} for {self.name} ({self.status})"
 
 
+class DistanceCacheEntry(models.Model):
+    """
+    Cached Distance Matrix result for a normalised (origin, destination) pair.
+    See api/distance.py — entries older than DISTANCE_CACHE_TTL_DAYS are
+    refetched.
+    """
+    origin      = models.CharField(max_length=255)
+    destination = models.CharField(max_length=255)
+    distance_km = models.DecimalField(max_digits=7, decimal_places=2)
+    hit_count   = models.PositiveIntegerField(default=0)
+    fetched_at  = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [('origin', 'destination')]
+
+    def __str__(self):
+        return f"{self.origin} → {self.destination}: {self.distance_km} km"
+
+
 class JobProofImage(models.Model):
     job         = models.ForeignKey(JobRequest, related_name='proof_images', on_delete=models.CASCADE)
     image       = models.ImageField(upload_to='job_proofs/')
@@ -330,6 +397,25 @@ class TeamInvite(models.Model):
     status     = models.CharField(max_length=30, choices=STATUS_CHOICES, default='pending_invite')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Notification delivery, kept up to date by api/team_notifications.py.
+    DELIVERY_QUEUED          = 'queued'
+    DELIVERY_SENT            = 'sent'
+    DELIVERY_FALLBACK_QUEUED = 'fallback_queued'
+    DELIVERY_RETRYING        = 'retrying'
+    DELIVERY_FAILED          = 'failed'
+
+    DELIVERY_STATUS_CHOICES = [
+        (DELIVERY_QUEUED,          'Queued'),
+        (DELIVERY_SENT,            'Sent'),
+        (DELIVERY_FALLBACK_QUEUED, 'Queued on fallback channel'),
+        (DELIVERY_RETRYING,        'Failed, retry scheduled'),
+        (DELIVERY_FAILED,          'Failed'),
+    ]
+
+    delivery_status  = models.CharField(max_length=20, choices=DELIVERY_STATUS_CHOICES, blank=True, default='')
+    delivery_channel = models.CharField(max_length=20, blank=True, default='',
+                                        help_text='Channel of the latest delivery attempt')
+
     class Meta:
         ordering = ['-created_at']
 
@@ -337,6 +423,23 @@ class TeamInvite(models.Model):
         return f"Invite → {self.contact} ({self.role}) by {self.craftsman}"
 
 
+class InviteDeliveryAttempt(models.Model):
+    """One try at delivering a TeamInvite notification over one channel."""
+    invite      = models.ForeignKey(TeamInvite, on_delete=models.CASCADE, related_name='delivery_attempts')
+    channel     = models.CharField(max_length=20, choices=INVITE_METHOD_CHOICES)
+    succeeded   = models.BooleanField(default=False)
+    detail      = models.CharField(max_length=255, blank=True, default='')
+    duration_ms = models.PositiveIntegerField(default=0)
+    created_at  = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        outcome = 'ok' if self.succeeded else 'failed'
+        return f"Invite #{self.invite_id} via {self.channel}: {outcome}"
+
+
 class CraftsmanMember(models.Model):
     STATUS_CHOICES = [
         ('pending_approval', 'Awaiting Approval'),
@@ -365,4 +468,40 @@ class CraftsmanMember(models.Model):
         unique_together = [('craftsman', 'user')]
 
     def __str__(self):
-        return f"{self.full_name} ({self.role}) — {self.craftsman}"
\ No newline at end of file
+        return f"{self.full_name} ({self.role}) — {self.craftsman}"
+
+class OutboxMessage(models.Model):
+    """
+    A notification (email / SMS / WhatsApp) written in the same transaction
+    as the change that caused it and delivered later by `manage.py
+    drain_outbox`. See api/outbox.py.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT    = 'sent'
+    STATUS_DEAD    = 'dead'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT,    'Sent'),
+        (STATUS_DEAD,    'Dead-lettered'),
+    ]
+
+    kind            = models.CharField(max_length=64)
+    payload         = models.JSONField(default=dict, blank=True)
+    status          = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts        = models.PositiveSmallIntegerField(default=0)
+    # Earliest time the next delivery attempt may start. While a worker holds
+    # the message this is pushed out by the lease, so a crashed worker's
+    # messages are picked up again once the lease runs out.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error      = models.TextField(blank=True, default='')
+    created_at      = models.DateTimeField(auto_now_add=True)
+    sent_at         = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status}, {self.attempts} attempts)"
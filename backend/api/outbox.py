@@ -0,0 +1,166 @@
+# api/outbox.py
+"""
+Transactional outbox for email / SMS / WhatsApp notifications and other
+work that must survive a restart (image variants).
+
+Views call enqueue() inside the transaction that creates the user, invite,
+approval, ...; the message row commits (or rolls back) together with it, so
+nothing is sent for a change that never happened and nothing is lost if the
+provider is down. `manage.py drain_outbox` delivers due messages
+concurrently, retrying failures with exponential backoff and dead-lettering
+them after OUTBOX_MAX_ATTEMPTS.
+
+A handler is called with the message payload as keyword arguments. Raising
+or returning False counts as a failed attempt; anything else is delivered.
+A kind listed in OUTBOX_DEAD_LETTER_HANDLERS also has a hook, called with the
+same payload, once its message is dead-lettered.
+"""
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_HANDLERS = {
+    "email.welcome":            "accounts.views.send_welcome_email",
+    "email.craftsman_approved": "api.utils.send_craftsman_approval_email",
+    "team.invite":              "api.team_notifications.deliver_invite_notification",
+    "team.invite_emails":       "api.team_notifications.deliver_invite_emails",
+    "team.member_approved":     "api.views.send_member_approved_email",
+    "image.variants":           "api.image_variants.generate_variants",
+}
+
+OUTBOX_DEAD_LETTER_HANDLERS = {
+    "team.invite":        "api.team_notifications.invite_notification_dead",
+    "team.invite_emails": "api.team_notifications.invite_emails_dead",
+}
+
+MAX_ATTEMPTS  = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8)
+BACKOFF_BASE  = getattr(settings, "OUTBOX_BACKOFF_SECONDS", 30)
+BACKOFF_CAP   = getattr(settings, "OUTBOX_BACKOFF_CAP_SECONDS", 3600)
+LEASE_SECONDS = getattr(settings, "OUTBOX_LEASE_SECONDS", 300)
+
+
+def enqueue(kind: str, **payload) -> OutboxMessage:
+    """Queue a notification; call inside the transaction that triggers it."""
+    if kind not in OUTBOX_HANDLERS:
+        raise ValueError(f"Unknown outbox message kind '{kind}'")
+    return OutboxMessage.objects.create(kind=kind, payload=payload)
+
+
+def enqueue_many(kind: str, payloads) -> list:
+    """Queue one message per payload with a single INSERT."""
+    if kind not in OUTBOX_HANDLERS:
+        raise ValueError(f"Unknown outbox message kind '{kind}'")
+    return OutboxMessage.objects.bulk_create(
+        [OutboxMessage(kind=kind, payload=payload) for payload in payloads]
+    )
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds to wait before attempt number attempts + 1 (full jitter)."""
+    ceiling = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_CAP)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def claim_due(batch_size: int) -> list:
+    """
+    Lease up to batch_size due messages to this worker. Rows locked by
+    another worker are skipped, and leased rows are hidden from everyone
+    else until LEASE_SECONDS pass.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+        )
+    return messages
+
+
+def deliver(message) -> str:
+    """Run the message's handler. Returns an error string, or "" on success."""
+    try:
+        handler = import_string(OUTBOX_HANDLERS[message.kind])
+        if handler(**message.payload) is False:
+            return "Handler reported failure"
+    except Exception as exc:
+        logger.exception(f"[Outbox] {message.kind} #{message.pk} raised")
+        return f"{type(exc).__name__}: {exc}"
+    return ""
+
+
+def _deliver_in_worker(message) -> str:
+    close_old_connections()
+    try:
+        return deliver(message)
+    finally:
+        connections.close_all()
+
+
+def record_result(message, error: str) -> str:
+    """Mark message sent, schedule its retry, or dead-letter it. Returns the new status."""
+    now = timezone.now()
+    attempts = message.attempts + 1
+    if not error:
+        fields = {"status": OutboxMessage.STATUS_SENT, "sent_at": now, "last_error": ""}
+    elif attempts >= MAX_ATTEMPTS:
+        fields = {"status": OutboxMessage.STATUS_DEAD, "last_error": error}
+        logger.error(f"[Outbox] {message.kind} #{message.pk} dead-lettered after {attempts} attempts: {error}")
+    else:
+        fields = {
+            "next_attempt_at": now + timedelta(seconds=backoff_delay(attempts)),
+            "last_error":      error,
+        }
+        logger.warning(f"[Outbox] {message.kind} #{message.pk} attempt {attempts} failed: {error}")
+    OutboxMessage.objects.filter(pk=message.pk).update(attempts=attempts, **fields)
+    if fields.get("status") == OutboxMessage.STATUS_DEAD:
+        _dead_lettered(message)
+    return fields.get("status", OutboxMessage.STATUS_PENDING)
+
+
+def _dead_lettered(message):
+    hook = OUTBOX_DEAD_LETTER_HANDLERS.get(message.kind)
+    if hook is None:
+        return
+    try:
+        import_string(hook)(**message.payload)
+    except Exception:
+        logger.exception(f"[Outbox] dead-letter hook for {message.kind} #{message.pk} raised")
+
+
+def drain(batch_size: int = 50, workers: int = 4) -> dict:
+    """
+    Deliver one batch of due messages. Handlers run on up to `workers`
+    threads; results are recorded on the calling thread.
+    Returns counts per outcome: sent / retry / dead.
+    """
+    counts = {"sent": 0, "retry": 0, "dead": 0}
+    messages = claim_due(batch_size)
+    if not messages:
+        return counts
+
+    if workers <= 1:
+        errors = [deliver(m) for m in messages]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kaakazini-outbox") as pool:
+            errors = list(pool.map(_deliver_in_worker, messages))
+
+    for message, error in zip(messages, errors):
+        outcome = record_result(message, error)
+        key = "retry" if outcome == OutboxMessage.STATUS_PENDING else outcome
+        counts[key] += 1
+    return counts
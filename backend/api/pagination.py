@@ -0,0 +1,155 @@
+# api/pagination.py
+"""
+Opt-in pagination for list endpoints.
+
+The frontend still expects plain arrays from the list endpoints, so paging
+only kicks in when the caller asks for it:
+
+  ?page=N[&page_size=M]            → page-number mode (count / next / previous)
+  ?paginate=cursor[&page_size=M]   → cursor mode, first page
+  ?cursor=<opaque>                 → cursor mode, following pages
+
+Without any of these the view returns the full list exactly as before.
+"""
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class DirectoryPageNumberPagination(PageNumberPagination):
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class DirectoryCursorPagination(CursorPagination):
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        # Follow the ordering the view already applied (e.g. ?ordering=rating)
+        # so the cursor walks the same sequence the client asked for.
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return super().get_ordering(request, queryset, view)
+
+
+class OptionalPagination:
+    """
+    Chooses page-number or cursor pagination per request, or none at all.
+    Subclasses swap in their own page / cursor classes.
+    """
+    page_class   = DirectoryPageNumberPagination
+    cursor_class = DirectoryCursorPagination
+
+    def __init__(self):
+        self._paginator = None
+
+    def _select(self, request):
+        params = request.query_params
+        if 'cursor' in params or params.get('paginate') == 'cursor':
+            return self.cursor_class()
+        if 'page' in params or params.get('paginate') == 'page':
+            return self.page_class()
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._paginator = self._select(request)
+        if self._paginator is None:
+            return None
+        return self._paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self._paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_class().get_schema_operation_parameters(view)
+
+
+class CraftsmanDirectoryPagination(OptionalPagination):
+    pass
+
+
+class JobRequestCursorPagination(BasePagination):
+    """
+    Forward-only keyset pagination over (created_at, id), newest first.
+
+    The cursor carries the last row's (created_at, id); the next page is a
+    single indexed range scan on (…, created_at, id) — see the
+    job_*_created_idx indexes on JobRequest — so page 500 costs the same as
+    page 1.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self._page_size(request)
+
+        position = self._decode(request.query_params.get(self.cursor_query_param))
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        rows = list(queryset.order_by('-created_at', '-id')[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next':     self.get_next_link(),
+            'previous': None,
+            'results':  data,
+        })
+
+    def get_next_link(self):
+        if not (self.has_next and self.last):
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self._encode(self.last))
+
+    def _page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def _encode(row):
+        raw = f"{row.created_at.isoformat()}|{row.id}"
+        return urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def _decode(cursor):
+        if not cursor:
+            return None
+        try:
+            created_at, pk = urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+            parsed = parse_datetime(created_at)
+            if parsed is None:
+                raise ValueError(created_at)
+            return parsed, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error):
+            raise NotFound('Invalid cursor')
+
+
+class JobRequestPagination(OptionalPagination):
+    page_class   = DirectoryPageNumberPagination
+    cursor_class = JobRequestCursorPagination
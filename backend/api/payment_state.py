@@ -0,0 +1,96 @@
+# api/payment_state.py
+"""
+The single place that moves a JobRequest through gateway payment states.
+Used by the gateway callback, PollPaymentStatusView, the reconcile_payments
+command and anything else that learns a transaction's outcome. Every transition is a conditional UPDATE, so
+applying the same status twice (callback retries, a poll racing a callback)
+is a no-op.
+"""
+import logging
+
+from django.utils import timezone
+
+from .models import JobRequest
+
+logger = logging.getLogger(__name__)
+
+
+def mark_payment_pending(job, transaction_id: str) -> None:
+    """A new STK push went out for this job."""
+    now = timezone.now()
+    JobRequest.objects.filter(pk=job.pk).update(
+        intasend_invoice_id=transaction_id,
+        status=JobRequest.STATUS_APPROVED,
+        payment_status="PENDING",
+        payment_failure_reason="",
+        payment_status_at=now,
+    )
+    job.intasend_invoice_id    = transaction_id
+    job.status                 = JobRequest.STATUS_APPROVED
+    job.payment_status         = "PENDING"
+    job.payment_failure_reason = ""
+    job.payment_status_at      = now
+
+
+def apply_transaction_status(job, transaction_id: str, tx_status: str, failure_reason: str = "") -> bool:
+    """
+    Record tx_status (COMPLETE | FAIL | PENDING) for job's transaction and
+    apply the matching job transition:
+
+      COMPLETE → job Paid
+      FAIL     → job back to Quote Approved, transaction cleared
+      PENDING  → status unchanged, only the check time is recorded
+
+    Updates for a transaction the job is no longer waiting on are ignored.
+    Returns True if the job changed state.
+    """
+    now = timezone.now()
+    current = JobRequest.objects.filter(pk=job.pk, intasend_invoice_id=transaction_id)
+
+    if tx_status == "COMPLETE":
+        changed = current.exclude(status=JobRequest.STATUS_PAID).update(
+            status=JobRequest.STATUS_PAID,
+            payment_status="COMPLETE",
+            payment_failure_reason="",
+            payment_status_at=now,
+        )
+        if changed:
+            logger.info(f"[Payment] Job #{job.pk} → marked PAID ✓ (tx={transaction_id})")
+    elif tx_status == "FAIL":
+        failure_reason = (failure_reason or "Payment was not completed.")[:255]
+        changed = current.exclude(status=JobRequest.STATUS_PAID).update(
+            status=JobRequest.STATUS_QUOTE_APPROVED,
+            intasend_invoice_id="",
+            payment_status="FAIL",
+            payment_failure_reason=failure_reason,
+            payment_status_at=now,
+        )
+        if changed:
+            logger.info(
+                f"[Payment] Job #{job.pk} payment FAILED — "
+                f"reason: {failure_reason} — reset to Quote Approved"
+            )
+    else:
+        current.exclude(payment_status__in=("COMPLETE", "FAIL")).update(
+            payment_status="PENDING", payment_status_at=now,
+        )
+        changed = 0
+
+    job.refresh_from_db(fields=[
+        "status", "intasend_invoice_id",
+        "payment_status", "payment_failure_reason", "payment_status_at",
+    ])
+    return bool(changed)
+
+
+def apply_gateway_result(job, transaction_id: str, result: dict) -> bool:
+    """
+    Apply a check_payment_status() result to job. Lookups that did not reach
+    the gateway (timeouts, open circuit) change nothing.
+    """
+    if not result.get("success"):
+        return False
+    failure_reason = ""
+    if result["status"] == "FAIL":
+        failure_reason = (result.get("raw", {}).get("data") or {}).get("failureReason", "")
+    return apply_transaction_status(job, transaction_id, result["status"], failure_reason)
@@ -5,17 +5,30 @@ URL wiring (urls.py):
   path("job-requests/<int:pk>/pay/",            ClientPayJobView.as_view()),
   path("job-requests/<int:pk>/pay-status/",      PollPaymentStatusView.as_view()),
   path("job-requests/<int:pk>/confirm-payment/", ConfirmPaymentReceivedView.as_view()),
+  path("payments/gateway-callback/",             GatewayCallbackView.as_view()),
+  path("admin/payments/gateway-health/",         GatewayHealthView.as_view()),
 """
 
+import hashlib
+import hmac
+import json
 import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import JobRequest
 from .serializers import JobRequestSerializer
-from .intasend_service import initiate_stk_push, check_payment_status, PLATFORM_WALLET_FALLBACK
+from .intasend_service import (
+    initiate_stk_push, check_payment_status_cached, PLATFORM_WALLET_FALLBACK,
+    TERMINAL_STATUSES, extract_transaction_id, gateway_health, normalise_status,
+)
+from .payment_state import apply_gateway_result, apply_transaction_status, mark_payment_pending
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +106,13 @@ class ClientPayJobView(APIView):
             narrative=f"KaaKazini – {job.service or 'Service'}",
         )
 
+        if result.get("circuit_open"):
+            logger.warning(f"[Payment] Gateway circuit open — STK skipped for Job #{job.id}")
+            return Response(
+                {"detail": result["error"], "circuit_open": True},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
         if not result["success"]:
             logger.warning(f"[Payment] STK failed Job #{job.id}: {result.get('error')}")
             return Response(
@@ -111,10 +131,7 @@ class ClientPayJobView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        job.intasend_invoice_id = transaction_id
-        job.status = JobRequest.STATUS_APPROVED
-        job.save(update_fields=["intasend_invoice_id", "status"])
-        job.refresh_from_db()
+        mark_payment_pending(job, transaction_id)
 
         logger.info(
             f"[Payment] STK sent ✓ Job #{job.id} | tx={job.intasend_invoice_id} | KES {amount}"
@@ -135,8 +152,27 @@ class ClientPayJobView(APIView):
 #     Response always contains:
 #       payment_status: "COMPLETE" | "FAIL" | "PENDING"
 #       failure_reason: human-readable string from gateway (only on FAIL)
+#
+#     The answer comes from the state the gateway callback stored on the job.
+#     Only when a transaction has sat in PENDING for longer than
+#     PAYMENT_STATUS_REFRESH_SECONDS (e.g. a lost callback) do we ask the
+#     gateway ourselves.
 # ─────────────────────────────────────────────────────────────────────────────
 
+PAYMENT_STATUS_REFRESH = timedelta(seconds=getattr(settings, "PAYMENT_STATUS_REFRESH_SECONDS", 15))
+
+
+def _stored_status_response(job, success=True):
+    return Response({
+        "job_id":         job.pk,
+        "transaction_id": job.intasend_invoice_id,
+        "payment_status": job.payment_status or "PENDING",
+        "failure_reason": job.payment_failure_reason if job.payment_status == "FAIL" else "",
+        "job_status":     job.status,
+        "success":        success,
+    })
+
+
 class PollPaymentStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -146,43 +182,89 @@ class PollPaymentStatusView(APIView):
             return Response({"detail": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
 
         if not job.intasend_invoice_id:
+            # A failed transaction clears the id; report the stored outcome.
+            if job.payment_status in TERMINAL_STATUSES:
+                return _stored_status_response(job)
             return Response(
                 {"detail": "No pending transaction for this job."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        result = check_payment_status(job.intasend_invoice_id)
-        failure_reason = ""
-
-        if result["success"]:
-            tx_status = result["status"]   # COMPLETE | FAIL | PENDING
-
-            if tx_status == "COMPLETE" and (job.status or "").lower() != "paid":
-                job.status = JobRequest.STATUS_PAID
-                job.save(update_fields=["status"])
-                logger.info(f"[Poll] Job #{job.id} → marked PAID ✓")
-
-            elif tx_status == "FAIL":
-                failure_reason = (
-                    result.get("raw", {}).get("data", {}).get("failureReason", "")
-                    or "Payment was not completed."
-                )
-                job.status = JobRequest.STATUS_QUOTE_APPROVED
-                job.intasend_invoice_id = ""
-                job.save(update_fields=["status", "intasend_invoice_id"])
-                logger.info(
-                    f"[Poll] Job #{job.id} payment FAILED — "
-                    f"reason: {failure_reason} — reset to Quote Approved"
-                )
+        if job.payment_status in TERMINAL_STATUSES:
+            return _stored_status_response(job)
+
+        checked_at = job.payment_status_at
+        if checked_at and timezone.now() - checked_at < PAYMENT_STATUS_REFRESH:
+            return _stored_status_response(job)
+
+        transaction_id = job.intasend_invoice_id
+        result = check_payment_status_cached(transaction_id)
+        if result.get("in_flight"):
+            # Another request is asking the gateway right now.
+            return _stored_status_response(job)
+        if not result["success"]:
+            return _stored_status_response(job, success=False)
+
+        apply_gateway_result(job, transaction_id, result)
+        return _stored_status_response(job)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 2b. GATEWAY CALLBACK  —  POST /payments/gateway-callback/
+#
+#     The gateway pushes transaction status here. The raw body must be signed
+#     with HMAC-SHA256 using PAYMENT_WEBHOOK_SECRET, hex digest in the
+#     X-Gateway-Signature header. Re-delivered callbacks are harmless.
+# ─────────────────────────────────────────────────────────────────────────────
+
+SIGNATURE_HEADER = "HTTP_X_GATEWAY_SIGNATURE"
 
-        return Response({
-            "job_id":         pk,
-            "transaction_id": job.intasend_invoice_id,
-            "payment_status": result.get("status", "PENDING"),
-            "failure_reason": failure_reason,
-            "job_status":     job.status,
-            "success":        result["success"],
-        })
+
+def sign_callback_body(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class GatewayCallbackView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        secret = getattr(settings, "PAYMENT_WEBHOOK_SECRET", "")
+        if not secret:
+            logger.error("[Callback] PAYMENT_WEBHOOK_SECRET not set — rejecting gateway callback")
+            return Response({"detail": "Callbacks not configured."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        body = request.body
+        signature = request.META.get(SIGNATURE_HEADER, "")
+        if not hmac.compare_digest(sign_callback_body(body, secret), signature):
+            logger.warning("[Callback] Rejected callback with bad signature")
+            return Response({"detail": "Invalid signature."}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            return Response({"detail": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+        transaction_id = extract_transaction_id(data)
+        if not transaction_id:
+            return Response({"detail": "Missing transaction id."}, status=status.HTTP_400_BAD_REQUEST)
+
+        d = data.get("data") or {}
+        tx_status = normalise_status(d.get("status") or d.get("state") or data.get("status") or data.get("state"))
+
+        job = JobRequest.objects.filter(intasend_invoice_id=transaction_id).first()
+        if not job:
+            # Already resolved (a failed tx clears the id) or not ours — ack so
+            # the gateway stops retrying.
+            logger.info(f"[Callback] tx={transaction_id} matches no pending job — ignored")
+            return Response({"detail": "ignored"}, status=status.HTTP_200_OK)
+
+        changed = apply_transaction_status(
+            job, transaction_id, tx_status,
+            d.get("failureReason") or data.get("failureReason") or "",
+        )
+        logger.info(f"[Callback] tx={transaction_id} → {tx_status} (job #{job.pk}, changed={changed})")
+        return Response({"detail": "ok", "job_status": job.status}, status=status.HTTP_200_OK)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -198,11 +280,8 @@ class ConfirmPaymentReceivedView(APIView):
             return Response({"detail": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
 
         user = request.user
-        is_craftsman = (
-            hasattr(user, "craftsman")
-            and user.craftsman is not None
-            and job.craftsman == user.craftsman
-        )
+        craftsman = request_craftsman(request)
+        is_craftsman = craftsman is not None and job.craftsman_id == craftsman.id
         if not is_craftsman and not user.is_staff:
             return Response(
                 {"detail": "Only the assigned craftsman can confirm cash payment."},
@@ -216,4 +295,20 @@ class ConfirmPaymentReceivedView(APIView):
         return Response(
             {"detail": "Payment confirmed. Job closed.", "job": JobRequestSerializer(job).data},
             status=status.HTTP_200_OK,
-        )
\ No newline at end of file
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 4.  GATEWAY HEALTH  —  GET /admin/payments/gateway-health/
+# ─────────────────────────────────────────────────────────────────────────────
+
+class GatewayHealthView(APIView):
+    """
+    Circuit-breaker state and per-endpoint latency/error counters for the
+    worker answering, plus every worker whose circuit is open or half-open
+    ("workers", read from the shared cache).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(gateway_health(), status=status.HTTP_200_OK)
@@ -1,6 +1,37 @@
 # permissions.py
 from rest_framework import permissions
 
+from .models import Craftsman
+
+_UNRESOLVED = object()
+
+
+def request_craftsman(request):
+    """
+    The caller's Craftsman profile, or None — resolved at most once per request.
+
+    CookieJWTAuthentication already attaches the profile to the user (from
+    its cache, with only id and is_approved loaded until another field is
+    read); other authenticators cost one query, and the result is cached on both the
+    request and request.user so later user.craftsman reads are free too.
+    """
+    craftsman = getattr(request, "_craftsman", _UNRESOLVED)
+    if craftsman is not _UNRESOLVED:
+        return craftsman
+
+    user = request.user
+    craftsman = None
+    if user.is_authenticated:
+        accessor = type(user).craftsman
+        if accessor.is_cached(user):
+            craftsman = getattr(user, "craftsman", None)
+        else:
+            craftsman = Craftsman.objects.select_related("user").filter(user=user).first()
+            accessor.related.set_cached_value(user, craftsman)
+    request._craftsman = craftsman
+    return craftsman
+
+
 class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.user == request.user
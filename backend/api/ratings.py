@@ -0,0 +1,72 @@
+# api/ratings.py
+"""
+Keeps Craftsman.review_count / rating_sum / rating_avg in step with Review.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from accounts.authentication import invalidate_cached_user
+
+from .models import Craftsman, Review
+
+
+def rating_average(rating_sum, review_count):
+    if not review_count:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / Decimal(review_count)).quantize(Decimal('0.01'))
+
+
+def refresh_rating_aggregates(craftsman_id):
+    """
+    Recompute one craftsman's aggregates from their reviews. The craftsman row
+    is locked for the duration so concurrent review writes serialise.
+    """
+    if not craftsman_id:
+        return
+    with transaction.atomic():
+        locked = list(Craftsman.objects.select_for_update().filter(pk=craftsman_id).values_list('user_id', flat=True))
+        if not locked:
+            return
+        totals = Review.objects.filter(craftsman_id=craftsman_id).aggregate(
+            count=Count('id'), total=Sum('rating'),
+        )
+        count = totals['count'] or 0
+        total = totals['total'] or 0
+        Craftsman.objects.filter(pk=craftsman_id).update(
+            review_count=count,
+            rating_sum=total,
+            rating_avg=rating_average(total, count),
+        )
+    invalidate_cached_user(*locked)
+
+
+def rebuild_rating_aggregates(batch_size=500):
+    """
+    Recompute every craftsman's aggregates with one grouped query over
+    reviews and batched bulk_update writes. Returns the number of rows changed.
+    """
+    totals = {
+        row['craftsman_id']: (row['count'], row['total'] or 0)
+        for row in Review.objects.values('craftsman_id').annotate(count=Count('id'), total=Sum('rating'))
+    }
+
+    changed = []
+    craftsmen = Craftsman.objects.only('id', 'user_id', 'review_count', 'rating_sum', 'rating_avg')
+    for craftsman in craftsmen.iterator(chunk_size=batch_size):
+        count, total = totals.get(craftsman.id, (0, 0))
+        average = rating_average(total, count)
+        if (craftsman.review_count, craftsman.rating_sum, craftsman.rating_avg) == (count, total, average):
+            continue
+        craftsman.review_count = count
+        craftsman.rating_sum   = total
+        craftsman.rating_avg   = average
+        changed.append(craftsman)
+
+    with transaction.atomic():
+        Craftsman.objects.bulk_update(
+            changed, ['review_count', 'rating_sum', 'rating_avg'], batch_size=batch_size,
+        )
+    invalidate_cached_user(*(craftsman.user_id for craftsman in changed))
+    return len(changed)
@@ -14,9 +14,14 @@ from .models import (
     JobRequest,
     JobProofImage,
     TeamInvite, 
-    CraftsmanMember 
+    InviteDeliveryAttempt,
+    CraftsmanMember,
+    INVITE_METHOD_CHOICES,
+    TEAM_ROLE_CHOICES,
 )
 
+from .image_variants import VARIANT_FORMATS
+
 User = get_user_model()
 
 
@@ -32,34 +37,63 @@ def build_file_url(file_field):
     if not file_field:
         return None
     try:
-        url = file_field.url
-        if url.startswith('http://') or url.startswith('https://'):
-            return url
-        backend = getattr(settings, 'BACKEND_URL', 'http://127.0.0.1:8000')
-        return f"{backend}{url}"
+        return _absolute_url(file_field.url)
     except Exception:
         return None
 
 
+def _absolute_url(url):
+    if url.startswith('http://') or url.startswith('https://'):
+        return url
+    backend = getattr(settings, 'BACKEND_URL', 'http://127.0.0.1:8000')
+    return f"{backend}{url}"
+
+
+def build_srcset(file_field, variants):
+    """
+    srcset strings for the resized copies of an image (api/image_variants.py):
+      {"webp": "https://…_128w.webp 128w, https://…_480w.webp 480w", "jpeg": "…"}
+    Empty until the variants exist for the file currently stored.
+    """
+    if not file_field or not variants or variants.get('source') != file_field.name:
+        return {}
+    srcset = {}
+    try:
+        for fmt in VARIANT_FORMATS:
+            sizes = sorted((int(width), name) for width, name in (variants.get(fmt) or {}).items())
+            if sizes:
+                srcset[fmt] = ', '.join(
+                    f"{_absolute_url(file_field.storage.url(name))} {width}w" for width, name in sizes
+                )
+    except Exception:
+        return {}
+    return srcset
+
+
 # ─────────────────────────────────────────────
 # Gallery Image Serializer
 # ─────────────────────────────────────────────
 class GalleryImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = GalleryImage
-        fields = ['id', 'image_url']
+        fields = ['id', 'image_url', 'image_srcset']
 
     def get_image_url(self, obj):
         return build_file_url(obj.image)
 
+    def get_image_srcset(self, obj):
+        return build_srcset(obj.image, obj.image_variants)
+
 
 # ─────────────────────────────────────────────
 # Review Serializer
 # ─────────────────────────────────────────────
 class ReviewSerializer(serializers.ModelSerializer):
     reviewer = serializers.CharField(required=False, allow_blank=True)
+    rating   = serializers.IntegerField(min_value=1, max_value=5)
 
     class Meta:
         model = Review
@@ -78,6 +112,7 @@ class ReviewSerializer(serializers.ModelSerializer):
 # ─────────────────────────────────────────────
 class ServiceSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     # `name` is a virtual write field the frontend sends; we resolve it to
     # service_name / custom_name on save (see CraftsmanDetailView)
     name = serializers.SerializerMethodField()
@@ -88,11 +123,14 @@ class ServiceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Service
-        fields = ['id', 'name', 'service_name', 'custom_name', 'rate', 'unit', 'image_url']
+        fields = ['id', 'name', 'service_name', 'custom_name', 'rate', 'unit', 'image_url', 'image_srcset']
 
     def get_image_url(self, obj):
         return build_file_url(obj.image)
 
+    def get_image_srcset(self, obj):
+        return build_srcset(obj.image, obj.image_variants)
+
     def get_name(self, obj):
         """Return the best human-readable name to the frontend."""
         return obj.get_display_name()
@@ -119,6 +157,7 @@ class CraftsmanSerializer(serializers.ModelSerializer):
     services = ServiceSerializer(many=True, read_only=True)
     service_videos = ServiceVideoSerializer(many=True, read_only=True)
     profile_url = serializers.SerializerMethodField()
+    profile_srcset = serializers.SerializerMethodField()
     service_image_url = serializers.SerializerMethodField()
     proof_document_url = serializers.SerializerMethodField()
 
@@ -140,7 +179,7 @@ class CraftsmanSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'full_name', 'slug',
             'profile', 'service_image',
-            'profile_url', 'service_image_url', 'proof_document_url',
+            'profile_url', 'profile_srcset', 'service_image_url', 'proof_document_url',
             'description', 'status', 'profession', 'company_name',
             'member_since', 'location', 'skills', 'video',
             'gallery_images', 'is_approved', 'is_active',
@@ -149,11 +188,16 @@ class CraftsmanSerializer(serializers.ModelSerializer):
             # new fields
             'experience_level',
             'account_type',
+            'review_count', 'rating_avg',
         ]
+        read_only_fields = ['review_count', 'rating_avg']
 
     def get_profile_url(self, obj):
         return build_file_url(obj.profile)
 
+    def get_profile_srcset(self, obj):
+        return build_srcset(obj.profile, obj.profile_variants)
+
     def get_service_image_url(self, obj):
         return build_file_url(obj.service_image)
 
@@ -169,19 +213,54 @@ class CraftsmanSerializer(serializers.ModelSerializer):
         return [s.strip() for s in obj.skills.split(',') if s.strip()]
 
 
+# ─────────────────────────────────────────────
+# Craftsman Card Serializer
+# Compact row for directory / admin listings (?view=card). Touches only the
+# craftsman row and its user, never the nested lists.
+# ─────────────────────────────────────────────
+class CraftsmanCardSerializer(serializers.ModelSerializer):
+    full_name = serializers.CharField(source='user.full_name', read_only=True)
+    profile_url = serializers.SerializerMethodField()
+    profile_srcset = serializers.SerializerMethodField()
+    rating = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Craftsman
+        fields = [
+            'id', 'full_name', 'slug', 'profile_url', 'profile_srcset',
+            'profession', 'location', 'primary_service', 'rating',
+        ]
+
+    def get_profile_url(self, obj):
+        return build_file_url(obj.profile)
+
+    def get_profile_srcset(self, obj):
+        return build_srcset(obj.profile, obj.profile_variants)
+
+    def get_rating(self, obj):
+        return {
+            'average': float(obj.rating_avg) if obj.review_count else None,
+            'count': obj.review_count,
+        }
+
+
 # ─────────────────────────────────────────────
 # Product Serializer
 # ─────────────────────────────────────────────
 class ProductSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'price', 'description', 'image_url', 'status', 'is_approved']
+        fields = ['id', 'name', 'price', 'description', 'image_url', 'image_srcset', 'status', 'is_approved']
 
     def get_image_url(self, obj):
         return build_file_url(obj.image)
 
+    def get_image_srcset(self, obj):
+        return build_srcset(obj.image, obj.image_variants)
+
 
 # ─────────────────────────────────────────────
 # Contact Message Serializer
@@ -253,10 +332,46 @@ class JobRequestSerializer(serializers.ModelSerializer):
 class TeamInviteSerializer(serializers.ModelSerializer):
     class Meta:
         model  = TeamInvite
-        fields = ['id', 'name', 'contact', 'method', 'role', 'status', 'created_at']
-        read_only_fields = ['id', 'status', 'created_at']
+        fields = ['id', 'name', 'contact', 'method', 'role', 'status', 'created_at',
+                  'delivery_status', 'delivery_channel']
+        read_only_fields = ['id', 'status', 'created_at', 'delivery_status', 'delivery_channel']
+
+
+class InviteDeliveryAttemptSerializer(serializers.ModelSerializer):
+    class Meta:
+        model  = InviteDeliveryAttempt
+        fields = ['channel', 'succeeded', 'detail', 'duration_ms', 'created_at']
+
+
+class TeamInviteDeliverySerializer(serializers.ModelSerializer):
+    attempts = InviteDeliveryAttemptSerializer(source='delivery_attempts', many=True, read_only=True)
+
+    class Meta:
+        model  = TeamInvite
+        fields = ['id', 'method', 'contact', 'delivery_status', 'delivery_channel', 'attempts']
  
  
+class TeamInviteBulkItemSerializer(serializers.Serializer):
+    """One entry of POST /craftsman/invites/bulk/."""
+    method  = serializers.ChoiceField(choices=INVITE_METHOD_CHOICES, default='email')
+    contact = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    name    = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    role    = serializers.ChoiceField(choices=TEAM_ROLE_CHOICES, default='helper')
+
+    def validate(self, data):
+        contact = data['contact'].strip()
+        if data['method'] != 'link' and not contact:
+            raise serializers.ValidationError({'contact': 'Contact (email or phone) is required.'})
+        if data['method'] == 'email':
+            try:
+                contact = serializers.EmailField().run_validation(contact).lower()
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError({'contact': exc.detail})
+        data['contact'] = contact
+        data['name'] = data['name'].strip()
+        return data
+
+
 class CraftsmanMemberSerializer(serializers.ModelSerializer):
     joined_at = serializers.DateTimeField(format='%d %b %Y', read_only=True)
  
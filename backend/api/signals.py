@@ -1,14 +1,19 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils.text import slugify
-from .models import Craftsman
+from .models import Craftsman, GalleryImage, Product, Review, Service
+from .image_variants import schedule_variants
+from .ratings import refresh_rating_aggregates
 
 @receiver(pre_save, sender=Craftsman)
 def generate_craftsman_slug(sender, instance, **kwargs):
     if not instance.slug and instance.user:
         full_name = getattr(instance.user, "full_name", None)
         if not full_name:
-            full_name = f"{instance.user.first_name} {instance.user.last_name}".strip() or instance.user.username
+            full_name = (
+                f"{getattr(instance.user, 'first_name', '')} {getattr(instance.user, 'last_name', '')}".strip()
+                or instance.user.email.split("@")[0]
+            )
         
         base_slug = slugify(full_name)
         slug = base_slug
@@ -19,3 +24,17 @@ def generate_craftsman_slug(sender, instance, **kwargs):
             counter += 1
 
         instance.slug = slug
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_craftsman_rating(sender, instance, **kwargs):
+    refresh_rating_aggregates(instance.craftsman_id)
+
+
+@receiver(post_save, sender=Craftsman)
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, **kwargs):
+    schedule_variants(instance)
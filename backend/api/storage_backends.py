@@ -1,8 +1,68 @@
 # api/storage_backends.py
+from botocore.exceptions import ClientError
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+# put_object parameters a presigned PUT carries, and the header the client
+# has to send for each (they are part of the signature).
+PRESIGNED_HEADERS = {
+    'ContentType':   'Content-Type',
+    'ContentLength': 'Content-Length',
+    'ACL':           'x-amz-acl',
+    'CacheControl':  'Cache-Control',
+}
 
 
 class MediaStorage(S3Boto3Storage):
-    location       = 'media'         
-    default_acl    = 'public-read'   
-    file_overwrite = False           
\ No newline at end of file
+    location       = 'media'
+    default_acl    = 'public-read'
+    file_overwrite = False
+
+    def presigned_put(self, name, content_type, size, expires_in=900):
+        """
+        A URL the client can PUT exactly `size` bytes of `content_type` to,
+        plus the headers it must send with them (both are signed, so any
+        other length or type is refused by Spaces). The object lands at
+        `name`, exactly where save(name, ...) would have put it.
+        """
+        params = {
+            **self.get_object_parameters(name),
+            'Bucket':        self.bucket_name,
+            'Key':           self._normalize_name(clean_name(name)),
+            'ContentType':   content_type,
+            'ContentLength': size,
+        }
+        if self.default_acl:
+            params['ACL'] = self.default_acl
+        url = self.connection.meta.client.generate_presigned_url(
+            'put_object', Params=params, ExpiresIn=expires_in, HttpMethod='PUT',
+        )
+        headers = {header: str(params[key]) for key, header in PRESIGNED_HEADERS.items() if key in params}
+        return {'method': 'PUT', 'url': url, 'headers': headers}
+
+    def stat(self, name):
+        """Size and content type of a stored object, or None if it does not exist."""
+        try:
+            head = self.connection.meta.client.head_object(
+                Bucket=self.bucket_name, Key=self._normalize_name(clean_name(name)),
+            )
+        except ClientError as err:
+            if err.response['ResponseMetadata']['HTTPStatusCode'] == 404:
+                return None
+            raise
+        return {'size': head['ContentLength'], 'content_type': head.get('ContentType', '')}
+
+    def move(self, name, new_name):
+        """Server-side copy of `name` to `new_name`, keeping its metadata, then delete `name`."""
+        client = self.connection.meta.client
+        params = {
+            'Bucket':            self.bucket_name,
+            'Key':               self._normalize_name(clean_name(new_name)),
+            'CopySource':        {'Bucket': self.bucket_name, 'Key': self._normalize_name(clean_name(name))},
+            'MetadataDirective': 'COPY',
+        }
+        if self.default_acl:
+            params['ACL'] = self.default_acl
+        client.copy_object(**params)
+        self.delete(name)
+        return new_name
@@ -1,13 +1,18 @@
 import logging
+import time
+
 import requests
 from django.conf import settings
+
+from .mail import send_mass_mail, template_message
  
 logger = logging.getLogger(__name__)
  
 FRONTEND_URL  = getattr(settings, "FRONTEND_URL",        "https://kaakazini.com")
-SENDER_EMAIL  = getattr(settings, "BREVO_SENDER_EMAIL",  "noreply@kaakazini.com")
-SENDER_NAME   = getattr(settings, "BREVO_SENDER_NAME",   "KaaKazini")
 CELCOM_SENDER = getattr(settings, "CELCOM_SENDER_ID",    "KaaKazini")
+CELCOM_TIMEOUT = (3.05, getattr(settings, "CELCOM_TIMEOUT", 10))
+CELCOM_SMS_URL      = "https://quicksms.celcomafrica.com/api/send_sms"
+CELCOM_WHATSAPP_URL = "https://quicksms.celcomafrica.com/api/whatsapp"
  
  
 def _invite_link(token):
@@ -15,232 +20,212 @@ def _invite_link(token):
  
  
 # ─────────────────────────────────────────────
-# Brevo — transactional email
+# Email (delivered through api.mail)
 # ─────────────────────────────────────────────
  
-def send_invite_email(invite):
-    """
-    Send a team invite via Brevo transactional email API.
-    invite: TeamInvite instance (contact = email address)
-    """
-    api_key = getattr(settings, "BREVO_API_KEY", "")
-    if not api_key:
-        logger.warning("[Brevo] BREVO_API_KEY not set — skipping email invite.")
-        return False
- 
-    to_email = invite.contact
-    to_name  = invite.name or "there"
-    role     = invite.role.capitalize()
+def invite_email_message(invite, locale=None):
+    """Rendered mail (see api.mail) for an email invite."""
     craftsman_name = (
         invite.craftsman.full_name
         or invite.craftsman.user.full_name
         or "A craftsman"
     )
-    link = _invite_link(invite.token)
- 
-    html_content = f"""
-    <div style="font-family:Arial,sans-serif;max-width:560px;margin:auto;">
-      <div style="background:#0d0d0d;padding:24px 32px;border-radius:12px 12px 0 0;">
-        <h2 style="color:#FFD700;margin:0;font-size:1.4rem;">
-          &#128295; You've been invited to join a team on KaaKazini
-        </h2>
-      </div>
-      <div style="background:#f9fafb;padding:28px 32px;border:1px solid #e5e7eb;">
-        <p style="font-size:1rem;color:#111827;">Hi <strong>{to_name}</strong>,</p>
-        <p style="color:#374151;">
-          <strong>{craftsman_name}</strong> would like you to join their team on
-          <strong>KaaKazini</strong> as a <strong>{role}</strong>.
-        </p>
-        <p style="color:#374151;">
-          Click the button below to accept the invite. Once you do,
-          <strong>{craftsman_name}</strong> will approve your request and you'll
-          be added to the team.
-        </p>
-        <div style="text-align:center;margin:32px 0;">
-          <a href="{link}"
-             style="background:#FFD700;color:#0d0d0d;padding:14px 32px;
-                    border-radius:10px;text-decoration:none;font-weight:700;
-                    font-size:1rem;display:inline-block;">
-            Accept Invite &rarr;
-          </a>
-        </div>
-        <p style="font-size:.8rem;color:#9ca3af;word-break:break-all;">
-          Or copy this link: {link}
-        </p>
-      </div>
-      <div style="background:#f3f4f6;padding:14px 32px;border-radius:0 0 12px 12px;
-                  font-size:.75rem;color:#9ca3af;text-align:center;">
-        KaaKazini &mdash; Kenya's verified craftsman marketplace
-      </div>
-    </div>
-    """
+    return template_message(
+        "team_invite", invite.contact, to_name=invite.name or "there", locale=locale,
+        name=invite.name or "there",
+        craftsman_name=craftsman_name,
+        role=invite.role.capitalize(),
+        link=_invite_link(invite.token),
+    )
  
-    payload = {
-        "sender":   {"name": SENDER_NAME, "email": SENDER_EMAIL},
-        "to":       [{"email": to_email, "name": to_name}],
-        "subject":  f"You're invited to join {craftsman_name}'s team on KaaKazini",
-        "htmlContent": html_content,
-    }
  
-    try:
-        resp = requests.post(
-            "https://api.brevo.com/v3/smtp/email",
-            json=payload,
-            headers={
-                "api-key":      api_key,
-                "Content-Type": "application/json",
-            },
-            timeout=10,
-        )
-        resp.raise_for_status()
-        logger.info(f"[Brevo] Invite email sent to {to_email} (invite #{invite.id})")
-        return True
-    except requests.RequestException as exc:
-        logger.error(f"[Brevo] Failed to send invite email to {to_email}: {exc}")
-        return False
+def send_invite_email(invite, locale=None):
+    """
+    Send a team invite by email.
+    invite: TeamInvite instance (contact = email address)
+    """
+    sent = send_mass_mail([invite_email_message(invite, locale=locale)]) == 1
+    if sent:
+        logger.info(f"[Mail] Invite email sent to {invite.contact} (invite #{invite.id})")
+    return sent
  
  
 # ─────────────────────────────────────────────
-# Celcom Africa — SMS
+# Celcom Africa — SMS / WhatsApp
 # ─────────────────────────────────────────────
  
-def send_invite_sms(invite):
-    """
-    Send a team invite via Celcom Africa SMS API.
-    invite: TeamInvite instance (contact = phone number, e.g. 2547XXXXXXXX)
-    Celcom docs: https://developers.celcomafrica.com/
-    """
+def _celcom_send(url, invite, message, label):
+    """POST one message to Celcom. Returns (ok, detail)."""
     api_key = getattr(settings, "CELCOM_API_KEY", "")
     if not api_key:
-        logger.warning("[Celcom] CELCOM_API_KEY not set — skipping SMS invite.")
-        return False
- 
-    phone = invite.contact
-    role  = invite.role.capitalize()
-    craftsman_name = (
-        invite.craftsman.full_name
-        or invite.craftsman.user.full_name
-        or "A craftsman"
-    )
-    link = _invite_link(invite.token)
- 
-    message = (
-        f"Hi {invite.name or 'there'}! {craftsman_name} wants you to join "
-        f"their KaaKazini team as {role}. Accept here: {link}"
-    )
+        logger.warning(f"[Celcom] CELCOM_API_KEY not set — skipping {label} invite.")
+        return False, "CELCOM_API_KEY not set"
  
     payload = {
         "api_key":   api_key,
         "sender_id": CELCOM_SENDER,
         "message":   message,
-        "phone":     phone,
+        "phone":     invite.contact,
     }
- 
     try:
-        resp = requests.post(
-            "https://quicksms.celcomafrica.com/api/send_sms",
-            json=payload,
-            timeout=10,
-        )
+        resp = requests.post(url, json=payload, timeout=CELCOM_TIMEOUT)
         resp.raise_for_status()
         data = resp.json()
+    except (requests.RequestException, ValueError) as exc:
+        logger.error(f"[Celcom] {label} request error for {invite.contact}: {exc}")
+        return False, str(exc)[:255]
  
-        # Celcom returns {"success": true/false, ...}
-        if data.get("success") or data.get("status") == "success":
-            logger.info(f"[Celcom] SMS sent to {phone} (invite #{invite.id})")
-            return True
-        else:
-            logger.error(f"[Celcom] SMS failed for {phone}: {data}")
-            return False
+    # Celcom returns {"success": true/false, ...}
+    if data.get("success") or data.get("status") == "success":
+        logger.info(f"[Celcom] {label} sent to {invite.contact} (invite #{invite.id})")
+        return True, ""
+    logger.error(f"[Celcom] {label} failed for {invite.contact}: {data}")
+    return False, str(data)[:255]
  
-    except requests.RequestException as exc:
-        logger.error(f"[Celcom] Request error sending SMS to {phone}: {exc}")
-        return False
  
+def _craftsman_name(invite):
+    return invite.craftsman.full_name or invite.craftsman.user.full_name or "A craftsman"
  
-# ─────────────────────────────────────────────
-# WhatsApp via Celcom
-# ─────────────────────────────────────────────
  
-def send_invite_whatsapp(invite):
-    """
-    Send a WhatsApp message via Celcom Africa WhatsApp Business API.
-    Falls back to SMS if WhatsApp endpoint fails.
-    """
-    api_key = getattr(settings, "CELCOM_API_KEY", "")
-    if not api_key:
-        logger.warning("[Celcom] CELCOM_API_KEY not set — skipping WhatsApp invite.")
-        return False
- 
-    phone = invite.contact
-    role  = invite.role.capitalize()
-    craftsman_name = (
-        invite.craftsman.full_name
-        or invite.craftsman.user.full_name
-        or "A craftsman"
+def _sms_text(invite):
+    return (
+        f"Hi {invite.name or 'there'}! {_craftsman_name(invite)} wants you to join "
+        f"their KaaKazini team as {invite.role.capitalize()}. Accept here: {_invite_link(invite.token)}"
     )
-    link = _invite_link(invite.token)
  
-    message = (
+ 
+def _whatsapp_text(invite):
+    return (
         f"Hi {invite.name or 'there'}! \n\n"
-        f"*{craftsman_name}* would like you to join their team on *KaaKazini* "
-        f"as a *{role}*.\n\n"
-        f"Click the link to accept — they'll approve you right away:\n{link}"
+        f"*{_craftsman_name(invite)}* would like you to join their team on *KaaKazini* "
+        f"as a *{invite.role.capitalize()}*.\n\n"
+        f"Click the link to accept — they'll approve you right away:\n{_invite_link(invite.token)}"
     )
  
-    payload = {
-        "api_key":   api_key,
-        "sender_id": CELCOM_SENDER,
-        "message":   message,
-        "phone":     phone,
-    }
  
-    try:
-        resp = requests.post(
-            "https://quicksms.celcomafrica.com/api/whatsapp",
-            json=payload,
-            timeout=10,
-        )
-        resp.raise_for_status()
-        data = resp.json()
+# ─────────────────────────────────────────────
+# Delivery pipeline — outbox handlers (api/outbox.py)
+# ─────────────────────────────────────────────
+#
+#   invite created ──► "team.invite" (channel = invite.method)
+#        whatsapp fails ──► "team.invite" (channel = "sms") queued, not run inline
+#        sms / email fails ──► handler returns False → outbox retries with backoff
+#        retries exhausted ──► outbox dead-letters it → invite_notification_dead
+#
+# Every try is stored as an InviteDeliveryAttempt and the invite's
+# delivery_status / delivery_channel reflect the latest outcome. An invite
+# is only "failed" once the outbox gives up; until then it is "retrying".
  
-        if data.get("success") or data.get("status") == "success":
-            logger.info(f"[Celcom] WhatsApp sent to {phone} (invite #{invite.id})")
-            return True
-        else:
-            logger.warning(f"[Celcom] WhatsApp failed for {phone}, falling back to SMS: {data}")
-            return send_invite_sms(invite)
+def _send_email_channel(invite):
+    return (True, "") if send_invite_email(invite) else (False, "Mail backend rejected the message")
  
-    except requests.RequestException as exc:
-        logger.warning(f"[Celcom] WhatsApp request error for {phone}, falling back to SMS: {exc}")
-        return send_invite_sms(invite)
  
+def _send_sms_channel(invite):
+    return _celcom_send(CELCOM_SMS_URL, invite, _sms_text(invite), "SMS")
  
-# ─────────────────────────────────────────────
-# Dispatcher — called from views.py
-# ─────────────────────────────────────────────
  
-def dispatch_invite_notification(invite):
-    """
-    Route the notification to the correct channel based on invite.method.
-    Returns True if notification was sent successfully, False otherwise.
-    """
-    method = invite.method
+def _send_whatsapp_channel(invite):
+    return _celcom_send(CELCOM_WHATSAPP_URL, invite, _whatsapp_text(invite), "WhatsApp")
+ 
+ 
+CHANNEL_SENDERS = {
+    "email":    _send_email_channel,
+    "sms":      _send_sms_channel,
+    "whatsapp": _send_whatsapp_channel,
+}
+FALLBACK_CHANNEL = {"whatsapp": "sms"}
  
-    if method == "email":
-        return send_invite_email(invite)
  
-    elif method == "sms":
-        return send_invite_sms(invite)
+def deliver_invite_notification(invite_id, channel=None):
+    """Outbox handler for "team.invite" — one attempt on one channel."""
+    from django.db import transaction
+    from .models import InviteDeliveryAttempt, TeamInvite
+    from .outbox import enqueue
  
-    elif method == "whatsapp":
-        return send_invite_whatsapp(invite)
+    invite = (
+        TeamInvite.objects.select_related("craftsman__user")
+        .filter(pk=invite_id).exclude(status="revoked").first()
+    )
+    if invite is None:
+        logger.info(f"[Invite] #{invite_id} revoked or deleted — notification dropped")
+        return True
+ 
+    channel = channel or invite.method
+    sender = CHANNEL_SENDERS.get(channel)
+    if sender is None:
+        if channel != "link":
+            logger.warning(f"[Invite] Unknown method '{channel}' for invite #{invite.id}")
+        return channel == "link"
+ 
+    started = time.monotonic()
+    ok, detail = sender(invite)
+    InviteDeliveryAttempt.objects.create(
+        invite=invite, channel=channel, succeeded=ok, detail=detail,
+        duration_ms=int((time.monotonic() - started) * 1000),
+    )
+ 
+    current = TeamInvite.objects.filter(pk=invite.pk)
+    if ok:
+        current.update(delivery_status=TeamInvite.DELIVERY_SENT, delivery_channel=channel)
+        return True
  
-    elif method == "link":
-        # Link method — no notification sent, user copies/shares manually
+    fallback = FALLBACK_CHANNEL.get(channel)
+    if fallback:
+        with transaction.atomic():
+            enqueue("team.invite", invite_id=invite.pk, channel=fallback)
+            current.update(delivery_status=TeamInvite.DELIVERY_FALLBACK_QUEUED, delivery_channel=channel)
+        logger.info(f"[Invite] #{invite.pk} {channel} failed — {fallback} queued")
         return True
  
-    else:
-        logger.warning(f"[Invite] Unknown method '{method}' for invite #{invite.id}")
-        return False
- 
\ No newline at end of file
+    current.update(delivery_status=TeamInvite.DELIVERY_RETRYING, delivery_channel=channel)
+    return False
+
+
+def invite_notification_dead(invite_id, channel=None):
+    """Outbox dead-letter hook for "team.invite": no more retries are coming."""
+    from .models import TeamInvite
+
+    TeamInvite.objects.filter(pk=invite_id).update(delivery_status=TeamInvite.DELIVERY_FAILED)
+ 
+ 
+def deliver_invite_emails(invite_ids, locale=None):
+    """
+    Outbox handler for "team.invite_emails": every email invite from one
+    bulk request goes out as a single batch send.
+    """
+    from .models import InviteDeliveryAttempt, TeamInvite
+ 
+    invites = list(
+        TeamInvite.objects.select_related("craftsman__user")
+        .filter(pk__in=invite_ids, method="email").exclude(status="revoked")
+    )
+    if not invites:
+        return True
+    messages = [invite_email_message(invite, locale=locale) for invite in invites]
+    started = time.monotonic()
+    sent = send_mass_mail(messages)
+    ok = sent == len(messages)
+    duration_ms = int((time.monotonic() - started) * 1000)
+    logger.info(f"[Mail] Bulk invite batch: {sent}/{len(messages)} accepted")
+ 
+    InviteDeliveryAttempt.objects.bulk_create([
+        InviteDeliveryAttempt(
+            invite=invite, channel="email", succeeded=ok, duration_ms=duration_ms,
+            detail="" if ok else "Mail backend rejected the batch",
+        )
+        for invite in invites
+    ])
+    TeamInvite.objects.filter(pk__in=[i.pk for i in invites]).update(
+        delivery_status=TeamInvite.DELIVERY_SENT if ok else TeamInvite.DELIVERY_RETRYING,
+        delivery_channel="email",
+    )
+    return ok
+
+
+def invite_emails_dead(invite_ids, locale=None):
+    """Outbox dead-letter hook for "team.invite_emails"."""
+    from .models import TeamInvite
+
+    TeamInvite.objects.filter(pk__in=invite_ids, method="email").exclude(
+        delivery_status=TeamInvite.DELIVERY_SENT,
+    ).update(delivery_status=TeamInvite.DELIVERY_FAILED)
@@ -1,3 +1,1673 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlparse
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.authentication import CookieJWTAuthentication, user_cache_key
+from accounts.models import CustomUser
+from . import email_templates
+from .distance import (
+    cached_distance_km, distance_cache_stats, normalise_place, plan_matrix_batches,
+)
+from .mail import BrevoBackend, LocmemBackend
+from .media_uploads import store_files
+from .models import (
+    Craftsman, DistanceCacheEntry, GalleryImage, JobProofImage, JobRequest, OutboxMessage,
+    Product, Review, Service, ServiceVideo, TeamInvite,
+)
+from .outbox import drain, enqueue
+from .intasend_service import (
+    STATUS_READ_TIMEOUT, CircuitBreaker, GatewayClient, _status_lock_seconds,
+    check_payment_status, check_payment_status_cached,
+)
+from .payment_views import sign_callback_body
+from .serializers import ProductSerializer
+from .views import _save_services
+from .team_notifications import (
+    CELCOM_SMS_URL, CELCOM_WHATSAPP_URL, deliver_invite_notification,
+)
+
+
+def make_user(email, **extra):
+    extra.setdefault('full_name', email.split('@')[0].title())
+    return CustomUser.objects.create_user(email=email, password='pass12345', **extra)
+
+
+def make_craftsman(n, approved=True, **extra):
+    user = make_user(f'craftsman{n}@example.com', role='craftsman')
+    return Craftsman.objects.create(
+        user=user, profession='Plumber', location='Nairobi',
+        is_approved=approved, status='approved' if approved else 'pending', **extra
+    )
+
+
+def make_job(client, **extra):
+    fields = dict(
+        name='Job', phone='0712345678', service='Plumbing', schedule=timezone.now(),
+        address='Westlands, Nairobi', location='Kilimani, Nairobi',
+    )
+    fields.update(extra)
+    return JobRequest.objects.create(client=client, **fields)
+
+
+def matrix_response(*rows):
+    """Fake Distance Matrix JSON; each row is a list of metres per destination."""
+    resp = mock.Mock()
+    resp.json.return_value = {
+        'status': 'OK',
+        'rows': [
+            {'elements': [{'status': 'OK', 'distance': {'value': m}} for m in row]}
+            for row in rows
+        ],
+    }
+    return resp
+
+
+def make_full_profile(n):
+    craftsman = make_craftsman(n)
+    Service.objects.create(craftsman=craftsman, service_name='Plumbing', rate=500, unit='hour')
+    GalleryImage.objects.create(craftsman=craftsman, image='craftsmen/gallery/work.jpg')
+    ServiceVideo.objects.create(craftsman=craftsman, video='craftsmen/service_videos/demo.mp4')
+    Review.objects.create(craftsman=craftsman, reviewer='Client', rating=5, comment='Great')
+    return craftsman
+
+
+class PublicCraftsmanDirectoryTests(TestCase):
+    url = '/api/public-craftsman/'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _count_queries(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, params or {})
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries), resp
+
+    def test_query_count_is_flat_as_directory_grows(self):
+        for n in range(3):
+            make_full_profile(n)
+        small, _ = self._count_queries()
+        for n in range(3, 15):
+            make_full_profile(n)
+        large, resp = self._count_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(len(resp.data), 15)
+
+    def test_page_and_cursor_modes_keep_query_count_flat(self):
+        for n in range(4):
+            make_full_profile(n)
+        small_page, _ = self._count_queries({'page': 1, 'page_size': 10})
+        small_cursor, _ = self._count_queries({'paginate': 'cursor', 'page_size': 10})
+        for n in range(4, 20):
+            make_full_profile(n)
+        large_page, page = self._count_queries({'page': 1, 'page_size': 10})
+        large_cursor, cursor = self._count_queries({'paginate': 'cursor', 'page_size': 10})
+
+        self.assertEqual(small_page, large_page)
+        self.assertEqual(small_cursor, large_cursor)
+        self.assertEqual(page.data['count'], 20)
+        self.assertEqual(len(page.data['results']), 10)
+        self.assertEqual(len(cursor.data['results']), 10)
+        self.assertIsNotNone(cursor.data['next'])
+
+    def test_cursor_pages_do_not_overlap(self):
+        for n in range(5):
+            make_craftsman(n)
+        first = self.client.get(self.url, {'paginate': 'cursor', 'page_size': 3}).data
+        second = self.client.get(first['next']).data
+        ids = [c['id'] for c in first['results']] + [c['id'] for c in second['results']]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_unapproved_craftsmen_are_hidden(self):
+        make_craftsman(1)
+        make_craftsman(2, approved=False)
+        resp = self.client.get(self.url)
+        self.assertEqual(len(resp.data), 1)
+
+
+class CraftsmanCardViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_card_view_returns_compact_rows_with_rating_summary(self):
+        craftsman = make_full_profile(1)
+        Review.objects.create(craftsman=craftsman, reviewer='Other', rating=4, comment='Good')
+
+        resp = self.client.get('/api/public-craftsman/', {'view': 'card'})
+
+        self.assertEqual(resp.status_code, 200)
+        row = resp.data[0]
+        self.assertEqual(set(row), {
+            'id', 'full_name', 'slug', 'profile_url', 'profile_srcset',
+            'profession', 'location', 'primary_service', 'rating',
+        })
+        self.assertEqual(row['rating'], {'average': 4.5, 'count': 2})
+
+    def test_card_view_is_a_single_query(self):
+        for n in range(6):
+            make_full_profile(n)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/public-craftsman/', {'view': 'card'})
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_admin_list_supports_card_view(self):
+        make_craftsman(1, approved=False)
+        admin = make_user('admin@example.com', is_staff=True, role='admin')
+        self.client.force_authenticate(admin)
+
+        resp = self.client.get('/api/admin/craftsman/', {'view': 'card', 'is_approved': 'false'})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 1)
+        self.assertEqual(resp.data[0]['rating'], {'average': None, 'count': 0})
+
+
+class RatingAggregateTests(TestCase):
+
+    def test_aggregates_follow_review_create_and_delete(self):
+        craftsman = make_craftsman(1)
+        first = Review.objects.create(craftsman=craftsman, reviewer='A', rating=5, comment='x')
+        Review.objects.create(craftsman=craftsman, reviewer='B', rating=2, comment='y')
+        craftsman.refresh_from_db()
+        self.assertEqual((craftsman.review_count, craftsman.rating_sum), (2, 7))
+        self.assertEqual(craftsman.rating_avg, Decimal('3.50'))
+
+        first.delete()
+        craftsman.refresh_from_db()
+        self.assertEqual((craftsman.review_count, craftsman.rating_sum), (1, 2))
+        self.assertEqual(craftsman.rating_avg, Decimal('2.00'))
+
+    def test_ratings_outside_one_to_five_are_rejected(self):
+        craftsman = make_craftsman(1)
+        client = APIClient()
+        client.force_authenticate(make_user('client@example.com'))
+        for rating in (0, 6, 10):
+            resp = client.post('/api/reviews/', {'craftsman': craftsman.id, 'rating': rating, 'comment': 'x'})
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn('rating', resp.data)
+        resp = client.post('/api/reviews/', {'craftsman': craftsman.id, 'rating': 4, 'comment': 'x'})
+        self.assertEqual(resp.status_code, 201)
+        craftsman.refresh_from_db()
+        self.assertEqual((craftsman.review_count, craftsman.rating_avg), (1, Decimal('4.00')))
+
+    def test_review_is_not_kept_when_the_aggregate_refresh_fails(self):
+        craftsman = make_craftsman(1)
+        client = APIClient()
+        client.force_authenticate(make_user('client@example.com'))
+        with mock.patch('api.signals.refresh_rating_aggregates', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                client.post('/api/reviews/', {'craftsman': craftsman.id, 'rating': 4, 'comment': 'x'})
+        self.assertFalse(Review.objects.exists())
+
+    def test_rebuild_command_repairs_drifted_rows(self):
+        craftsman = make_craftsman(1)
+        Review.objects.create(craftsman=craftsman, reviewer='A', rating=4, comment='x')
+        Craftsman.objects.filter(pk=craftsman.pk).update(review_count=0, rating_sum=0, rating_avg=0)
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+
+        craftsman.refresh_from_db()
+        self.assertEqual((craftsman.review_count, craftsman.rating_avg), (1, Decimal('4.00')))
+
+    def test_directory_sorts_and_filters_by_rating(self):
+        low, high, unrated = make_craftsman(1), make_craftsman(2), make_craftsman(3)
+        Review.objects.create(craftsman=low, reviewer='A', rating=2, comment='x')
+        Review.objects.create(craftsman=high, reviewer='A', rating=5, comment='x')
+
+        resp = self.client.get('/api/public-craftsman/', {'view': 'card', 'ordering': 'rating'})
+        self.assertEqual([r['id'] for r in resp.data], [high.id, low.id, unrated.id])
+
+        resp = self.client.get('/api/public-craftsman/', {'view': 'card', 'min_rating': '4'})
+        self.assertEqual([r['id'] for r in resp.data], [high.id])
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class JobDistanceTests(TestCase):
+
+    def setUp(self):
+        self.client_user = make_user('client@example.com')
+
+    @mock.patch('api.distance.requests.get', return_value=matrix_response([4200]))
+    def test_distance_is_computed_after_commit(self, get):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = make_job(self.client_user)
+        job.refresh_from_db()
+        self.assertEqual(job.distance_km, Decimal('4.20'))
+        self.assertEqual(get.call_count, 1)
+
+    @mock.patch('api.distance.requests.get', return_value=matrix_response([4200]))
+    def test_status_transitions_do_not_call_maps(self, get):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = make_job(self.client_user)
+        job = JobRequest.objects.get(pk=job.pk)
+        get.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.status = JobRequest.STATUS_ACCEPTED
+            job.save()
+            job.status = JobRequest.STATUS_PAID
+            job.save(update_fields=['status'])
+
+        get.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.distance_km, Decimal('4.20'))
+
+    @mock.patch('api.distance.requests.get', return_value=matrix_response([9100]))
+    def test_address_change_recomputes_distance(self, get):
+        job = make_job(self.client_user)
+        job = JobRequest.objects.get(pk=job.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.address = 'Karen, Nairobi'
+            job.save()
+
+        job.refresh_from_db()
+        self.assertEqual(job.distance_km, Decimal('9.10'))
+        self.assertEqual(get.call_args.kwargs['params']['origins'], 'karen, nairobi')
+
+
+class DistanceCacheTests(TestCase):
+
+    def test_normalise_place(self):
+        self.assertEqual(normalise_place('  Westlands ,Nairobi. '), 'westlands, nairobi')
+
+    @mock.patch('api.distance.requests.get', return_value=matrix_response([3000]))
+    def test_repeated_pairs_hit_the_cache(self, get):
+        before = distance_cache_stats()
+        self.assertEqual(cached_distance_km('Westlands, Nairobi', 'Kilimani'), Decimal('3.00'))
+        self.assertEqual(cached_distance_km('westlands ,  NAIROBI', 'kilimani'), Decimal('3.00'))
+        after = distance_cache_stats()
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(DistanceCacheEntry.objects.get().hit_count, 1)
+
+    @mock.patch('api.distance.requests.get', return_value=matrix_response([5000]))
+    def test_expired_entries_are_refetched(self, get):
+        DistanceCacheEntry.objects.create(
+            origin='westlands', destination='kilimani', distance_km=Decimal('1.00'),
+            fetched_at=timezone.now() - timedelta(days=365),
+        )
+        self.assertEqual(cached_distance_km('Westlands', 'Kilimani'), Decimal('5.00'))
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(DistanceCacheEntry.objects.get().distance_km, Decimal('5.00'))
+
+    @mock.patch('api.distance.requests.get', side_effect=requests.Timeout)
+    def test_failed_lookups_are_not_cached(self, get):
+        self.assertIsNone(cached_distance_km('Westlands', 'Kilimani'))
+        self.assertFalse(DistanceCacheEntry.objects.exists())
+
+
+class StubDistanceMatrix(BaseHTTPRequestHandler):
+    """Local stand-in for the Distance Matrix API: distance = 1 km per character."""
+    requests_seen = []
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        origins = params['origins'][0].split('|')
+        destinations = params['destinations'][0].split('|')
+        self.requests_seen.append((origins, destinations))
+        body = json.dumps({'status': 'OK', 'rows': [
+            {'elements': [
+                {'status': 'OK', 'distance': {'value': 1000 * (len(o) + len(d))}}
+                for d in destinations
+            ]}
+            for o in origins
+        ]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RecomputeJobDistancesTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubDistanceMatrix)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}/maps/api/distancematrix/json'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubDistanceMatrix.requests_seen = []
+        self.client_user = make_user('client@example.com')
+
+    def test_batches_respect_api_limits(self):
+        pairs = [(f'origin {i}', f'dest {i % 7}') for i in range(300)]
+        batches = list(plan_matrix_batches(pairs))
+        covered = set()
+        for origins, destinations in batches:
+            self.assertLessEqual(len(origins), 25)
+            self.assertLessEqual(len(destinations), 25)
+            self.assertLessEqual(len(origins) * len(destinations), 100)
+            covered |= {(o, d) for o in origins for d in destinations}
+        self.assertTrue(set(pairs) <= covered)
+
+    def test_recompute_uses_few_batched_requests(self):
+        for i in range(40):
+            make_job(self.client_user, address=f'Estate {i}', location=f'Area {i % 4}')
+
+        with mock.patch('api.distance.DISTANCE_MATRIX_URL', self.url):
+            call_command('recompute_job_distances', rate=0, stdout=StringIO())
+
+        self.assertFalse(JobRequest.objects.filter(distance_km__isnull=True).exists())
+        job = JobRequest.objects.get(address='Estate 12')
+        self.assertEqual(job.distance_km, Decimal(len('estate 12') + len('area 0')))
+        self.assertLess(len(StubDistanceMatrix.requests_seen), 40)
+
+    def test_rerun_is_resumable_and_served_from_cache(self):
+        for i in range(5):
+            make_job(self.client_user, address=f'Estate {i}', location='Area 1')
+        with mock.patch('api.distance.DISTANCE_MATRIX_URL', self.url):
+            call_command('recompute_job_distances', rate=0, stdout=StringIO())
+            first_run = len(StubDistanceMatrix.requests_seen)
+            JobRequest.objects.update(distance_km=None)
+            call_command('recompute_job_distances', rate=0, stdout=StringIO())
+
+        self.assertEqual(first_run, 1)
+        self.assertEqual(len(StubDistanceMatrix.requests_seen), 1)
+        self.assertFalse(JobRequest.objects.filter(distance_km__isnull=True).exists())
+
+
+class JobRequestCursorTests(TestCase):
+    url = '/api/job-requests/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client_user = make_user('client@example.com')
+        self.client.force_authenticate(self.client_user)
+
+    def _walk(self, params):
+        seen, pages = [], 0
+        resp = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(resp.status_code, 200)
+            seen += [job['id'] for job in resp.data['results']]
+            pages += 1
+            if not resp.data['next']:
+                return seen, pages
+            resp = self.client.get(resp.data['next'])
+
+    def test_cursor_walks_every_job_once_newest_first(self):
+        jobs = [make_job(self.client_user) for _ in range(7)]
+        # Force ties on created_at so the id tiebreaker is exercised.
+        JobRequest.objects.filter(pk__in=[j.pk for j in jobs[2:5]]).update(created_at=jobs[2].created_at)
+
+        seen, pages = self._walk({'paginate': 'cursor', 'page_size': 2})
+
+        expected = list(JobRequest.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 4)
+
+    def test_status_filter_and_default_list(self):
+        make_job(self.client_user)
+        make_job(self.client_user, status=JobRequest.STATUS_PAID)
+
+        resp = self.client.get(self.url, {'paginate': 'cursor', 'status': 'Paid'})
+        self.assertEqual(len(resp.data['results']), 1)
+
+        resp = self.client.get(self.url)
+        self.assertEqual(len(resp.data), 2)
+
+    def test_invalid_cursor_is_404(self):
+        resp = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(resp.status_code, 404)
+
+
+class JobRequestQueryCountTests(TestCase):
+    url = '/api/job-requests/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client_user = make_user('client@example.com', phone_number='254700000000')
+        self.craftsman = make_craftsman(1)
+        self.admin = make_user('admin@example.com', is_staff=True, role='admin')
+
+    def _add_jobs(self, count):
+        for _ in range(count):
+            job = make_job(self.client_user, craftsman=self.craftsman)
+            JobProofImage.objects.create(job=job, image='job_proofs/done.jpg')
+
+    def _queries(self, user, params=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, params or {})
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries), resp
+
+    def test_query_count_is_flat_for_every_role(self):
+        roles = {
+            'admin': (self.admin, {}),
+            'client': (self.client_user, {'role': 'client'}),
+            'craftsman': (self.craftsman.user, {'role': 'craftsman'}),
+        }
+        self._add_jobs(2)
+        small = {name: self._queries(user, params)[0] for name, (user, params) in roles.items()}
+        self._add_jobs(20)
+        for name, (user, params) in roles.items():
+            with self.subTest(role=name):
+                count, resp = self._queries(user, params)
+                self.assertEqual(count, small[name])
+                self.assertEqual(len(resp.data), 22)
+                self.assertEqual(resp.data[0]['client']['phone'], '254700000000')
+                self.assertEqual(len(resp.data[0]['proof_images']), 1)
+
+    def test_detail_view_is_fixed_cost(self):
+        self._add_jobs(1)
+        job = JobRequest.objects.get()
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(f'{self.url}{job.pk}/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRET='test-secret')
+class GatewayCallbackTests(TestCase):
+    callback_url = '/api/payments/gateway-callback/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client_user = make_user('client@example.com')
+        self.job = make_job(
+            self.client_user, status=JobRequest.STATUS_APPROVED, intasend_invoice_id='TX1',
+            payment_status='PENDING', payment_status_at=timezone.now(),
+        )
+
+    def _callback(self, payload, secret='test-secret'):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            self.callback_url, body, content_type='application/json',
+            HTTP_X_GATEWAY_SIGNATURE=sign_callback_body(body, secret),
+        )
+
+    def test_complete_callback_marks_job_paid_idempotently(self):
+        for _ in range(2):
+            resp = self._callback({'data': {'id': 'TX1', 'status': 'COMPLETED'}})
+            self.assertEqual(resp.status_code, 200)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobRequest.STATUS_PAID)
+        self.assertEqual(self.job.payment_status, 'COMPLETE')
+
+    def test_failed_callback_resets_job_and_poll_reports_reason(self):
+        self._callback({'data': {'id': 'TX1', 'status': 'FAILED', 'failureReason': 'Insufficient funds'}})
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobRequest.STATUS_QUOTE_APPROVED)
+        self.assertEqual(self.job.intasend_invoice_id, '')
+
+        self.client.force_authenticate(self.client_user)
+        with mock.patch('api.payment_views.check_payment_status_cached') as check:
+            resp = self.client.get(f'/api/job-requests/{self.job.pk}/pay-status/')
+        check.assert_not_called()
+        self.assertEqual(resp.data['payment_status'], 'FAIL')
+        self.assertEqual(resp.data['failure_reason'], 'Insufficient funds')
+
+    def test_late_failure_cannot_undo_payment(self):
+        self._callback({'data': {'id': 'TX1', 'status': 'COMPLETED'}})
+        self._callback({'data': {'id': 'TX1', 'status': 'FAILED'}})
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobRequest.STATUS_PAID)
+
+    def test_bad_signature_is_rejected(self):
+        resp = self._callback({'data': {'id': 'TX1', 'status': 'COMPLETED'}}, secret='wrong')
+        self.assertEqual(resp.status_code, 403)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobRequest.STATUS_APPROVED)
+
+    def test_unknown_transaction_is_acknowledged(self):
+        resp = self._callback({'data': {'id': 'NOPE', 'status': 'COMPLETED'}})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['detail'], 'ignored')
+
+    def test_poll_reads_stored_state_until_it_goes_stale(self):
+        self.client.force_authenticate(self.client_user)
+        url = f'/api/job-requests/{self.job.pk}/pay-status/'
+        with mock.patch('api.payment_views.check_payment_status_cached') as check:
+            check.return_value = {'success': True, 'status': 'COMPLETE', 'raw': {}}
+            resp = self.client.get(url)
+            check.assert_not_called()
+            self.assertEqual(resp.data['payment_status'], 'PENDING')
+
+            JobRequest.objects.filter(pk=self.job.pk).update(
+                payment_status_at=timezone.now() - timedelta(minutes=5),
+            )
+            resp = self.client.get(url)
+            check.assert_called_once_with('TX1')
+            self.assertEqual(resp.data['payment_status'], 'COMPLETE')
+            self.assertEqual(resp.data['job_status'], JobRequest.STATUS_PAID)
+
+    def test_poll_serves_stored_state_while_another_lookup_is_in_flight(self):
+        self.client.force_authenticate(self.client_user)
+        JobRequest.objects.filter(pk=self.job.pk).update(payment_status_at=None)
+        with mock.patch('api.payment_views.check_payment_status_cached',
+                        return_value={'success': False, 'in_flight': True, 'error': 'busy'}):
+            resp = self.client.get(f'/api/job-requests/{self.job.pk}/pay-status/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data['payment_status'], resp.data['success']), ('PENDING', True))
+
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @override_settings(MAIL_BACKEND='api.mail.LocmemBackend')
+    def test_signup_queues_welcome_email_instead_of_sending_it(self):
+        LocmemBackend.sent = []
+        resp = self.client.post('/api/client-signup/', {
+            'full_name': 'New Client', 'email': 'new@example.com', 'password': 'pass12345',
+        })
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(LocmemBackend.sent, [])
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.kind, 'email.welcome')
+        self.assertEqual(message.payload['email'], 'new@example.com')
+
+    @override_settings(MAIL_BACKEND='api.mail.LocmemBackend')
+    def test_google_signup_queues_welcome_email_only_for_new_accounts(self):
+        LocmemBackend.sent = []
+        idinfo = {'email': 'g@example.com', 'name': 'Google User'}
+        with mock.patch('accounts.views.id_token.verify_oauth2_token', return_value=idinfo):
+            for created in (True, False):
+                resp = self.client.post('/api/google-login/', {'token': 't', 'role': 'client'})
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.data['created'], created)
+        self.assertEqual(LocmemBackend.sent, [])
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.kind, message.payload['email'], message.payload['role']),
+                         ('email.welcome', 'g@example.com', 'client'))
+
+    def test_invite_is_delivered_by_drain_outbox(self):
+        craftsman = make_craftsman(1)
+        self.client.force_authenticate(craftsman.user)
+        resp = self.client.post('/api/craftsman/invites/', {
+            'method': 'email', 'contact': 'helper@example.com', 'name': 'Helper',
+        })
+        self.assertEqual(resp.status_code, 201)
+        self.assertTrue(resp.data['notification_queued'])
+
+        with mock.patch('api.team_notifications.send_invite_email', return_value=True) as send:
+            call_command('drain_outbox', '--workers', '1', stdout=StringIO())
+        self.assertEqual(send.call_args.args[0].contact, 'helper@example.com')
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.STATUS_SENT)
+
+    @mock.patch('api.outbox.MAX_ATTEMPTS', 2)
+    def test_failures_back_off_then_dead_letter(self):
+        message = enqueue('email.welcome', email='a@example.com', full_name='A', role='client')
+        with mock.patch('accounts.views.send_welcome_email', return_value=False):
+            self.assertEqual(drain(workers=1), {'sent': 0, 'retry': 1, 'dead': 0})
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 1)
+            self.assertGreater(message.next_attempt_at, timezone.now())
+            self.assertEqual(drain(workers=1)['retry'], 0)  # not due yet
+
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(drain(workers=1)['dead'], 1)
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.STATUS_DEAD)
+        self.assertEqual(message.last_error, 'Handler reported failure')
+
+
+class BulkTeamInviteTests(TestCase):
+    url = '/api/craftsman/invites/bulk/'
+
+    def setUp(self):
+        self.craftsman = make_craftsman(1)
+        TeamInvite.objects.create(craftsman=self.craftsman, method='email', contact='old@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.craftsman.user)
+
+    def test_creates_dedupes_and_reports_per_contact(self):
+        invites = [
+            {'method': 'email', 'contact': 'a@example.com', 'name': 'A'},
+            {'method': 'email', 'contact': 'A@Example.com'},
+            {'method': 'email', 'contact': 'old@example.com'},
+            {'method': 'email', 'contact': 'not-an-email'},
+            {'method': 'sms', 'contact': '254700000001', 'role': 'foreman'},
+            {'method': 'whatsapp', 'contact': '254700000002'},
+            {'method': 'link'},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(self.url, {'invites': invites}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+
+        self.assertEqual(resp.data['summary'], {'created': 4, 'duplicate': 2, 'invalid': 1})
+        self.assertEqual(
+            [r['result'] for r in resp.data['results']],
+            ['created', 'duplicate', 'duplicate', 'invalid', 'created', 'created', 'created'],
+        )
+        self.assertIn('contact', resp.data['results'][3]['errors'])
+        self.assertFalse(resp.data['results'][6]['notification_queued'])
+        self.assertEqual(TeamInvite.objects.filter(craftsman=self.craftsman).count(), 5)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('kind', flat=True)),
+            ['team.invite', 'team.invite', 'team.invite_emails'],
+        )
+
+    @override_settings(MAIL_BACKEND='api.mail.LocmemBackend')
+    def test_drain_sends_email_batch_and_texts_in_parallel(self):
+        LocmemBackend.sent = []
+        self.client.post(self.url, {'invites': [
+            {'method': 'email', 'contact': 'a@example.com'},
+            {'method': 'email', 'contact': 'b@example.com'},
+            {'method': 'sms', 'contact': '254700000001'},
+        ]}, format='json')
+
+        with mock.patch('api.team_notifications._celcom_send', return_value=(True, '')) as sms:
+            counts = drain(workers=1)
+        self.assertEqual(counts['sent'], 2)
+        self.assertEqual(sorted(m['to_email'] for m in LocmemBackend.sent), ['a@example.com', 'b@example.com'])
+        self.assertEqual(sms.call_count, 1)
+
+    def test_rejects_oversized_requests(self):
+        resp = self.client.post(self.url, {'invites': [{'method': 'link'}] * 101}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+
+class InviteDeliveryPipelineTests(TestCase):
+
+    def setUp(self):
+        self.craftsman = make_craftsman(1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.craftsman.user)
+
+    def _invite(self, method='whatsapp', contact='254700000001'):
+        resp = self.client.post('/api/craftsman/invites/', {'method': method, 'contact': contact})
+        self.assertEqual(resp.data['delivery_status'], TeamInvite.DELIVERY_QUEUED)
+        return resp.data['id']
+
+    def test_whatsapp_failure_queues_sms_instead_of_sending_inline(self):
+        invite_id = self._invite()
+        celcom = {
+            CELCOM_WHATSAPP_URL: (False, 'timeout'),
+            CELCOM_SMS_URL:      (True, ''),
+        }
+        with mock.patch('api.team_notifications._celcom_send',
+                        side_effect=lambda url, *a: celcom[url]) as send:
+            drain(workers=1)
+            self.assertEqual([c.args[0] for c in send.call_args_list], [CELCOM_WHATSAPP_URL])
+            invite = TeamInvite.objects.get(pk=invite_id)
+            self.assertEqual(invite.delivery_status, TeamInvite.DELIVERY_FALLBACK_QUEUED)
+
+            drain(workers=1)
+        self.assertEqual(send.call_args.args[0], CELCOM_SMS_URL)
+
+        resp = self.client.get(f'/api/craftsman/invites/{invite_id}/delivery/')
+        self.assertEqual(resp.data['delivery_status'], TeamInvite.DELIVERY_SENT)
+        self.assertEqual(resp.data['delivery_channel'], 'sms')
+        self.assertEqual(
+            [(a['channel'], a['succeeded'], a['detail']) for a in resp.data['attempts']],
+            [('whatsapp', False, 'timeout'), ('sms', True, '')],
+        )
+
+    @mock.patch('api.outbox.MAX_ATTEMPTS', 2)
+    def test_failed_sms_is_retrying_until_the_outbox_gives_up(self):
+        invite_id = self._invite(method='sms')
+        with mock.patch('api.team_notifications._celcom_send', return_value=(False, 'HTTP 500')):
+            self.assertEqual(drain(workers=1)['retry'], 1)
+            self.assertEqual(TeamInvite.objects.get(pk=invite_id).delivery_status, TeamInvite.DELIVERY_RETRYING)
+            self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.STATUS_PENDING)
+
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(drain(workers=1)['dead'], 1)
+        self.assertEqual(TeamInvite.objects.get(pk=invite_id).delivery_status, TeamInvite.DELIVERY_FAILED)
+
+    def test_failed_bulk_email_batch_is_retrying_not_failed(self):
+        invite_id = self._invite(method='email', contact='a@example.com')
+        OutboxMessage.objects.all().delete()
+        enqueue('team.invite_emails', invite_ids=[invite_id])
+        with mock.patch('api.team_notifications.send_mass_mail', return_value=0):
+            self.assertEqual(drain(workers=1)['retry'], 1)
+        self.assertEqual(TeamInvite.objects.get(pk=invite_id).delivery_status, TeamInvite.DELIVERY_RETRYING)
+
+    def test_delivery_status_is_private_to_the_inviting_craftsman(self):
+        invite_id = self._invite()
+        self.client.force_authenticate(make_craftsman(2).user)
+        resp = self.client.get(f'/api/craftsman/invites/{invite_id}/delivery/')
+        self.assertEqual(resp.status_code, 404)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'kaakazini-test-cache'),
+}})
+class CookieAuthUserCacheTests(TestCase):
+    url = '/api/job-requests/'
+
+    def setUp(self):
+        cache.clear()
+        self.craftsman = make_craftsman(1)
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.craftsman.user).access_token)
+
+    def _identity_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if 'FROM "accounts_customuser"' in q['sql'] or 'FROM "api_craftsman"' in q['sql']
+        ]
+
+    def test_user_and_craftsman_come_from_cache_after_first_request(self):
+        self.assertEqual(len(self._identity_queries()), 1)
+        self.assertEqual(self._identity_queries(), [])
+
+    def test_cache_holds_a_projection_without_the_password(self):
+        self._identity_queries()
+        entry = cache.get(user_cache_key(self.craftsman.user_id))
+        self.assertEqual(entry, {
+            'user': {'id': self.craftsman.user_id, 'role': 'craftsman', 'is_active': True,
+                     'is_staff': False, 'is_superuser': False},
+            'craftsman': {'id': self.craftsman.id, 'is_approved': self.craftsman.is_approved},
+        })
+
+    def test_other_fields_load_from_the_database_on_access(self):
+        self._identity_queries()
+        user = CookieJWTAuthentication().get_user(AccessToken.for_user(self.craftsman.user))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(user.craftsman.id, self.craftsman.id)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual((user.craftsman.profession, user.craftsman.location),
+                             (self.craftsman.profession, self.craftsman.location))
+            self.assertEqual(user.email, self.craftsman.user.email)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_me_costs_no_more_queries_on_a_cache_hit(self):
+        def me():
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get('/api/me/')
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.data['email'], self.craftsman.user.email)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(me(), 1)   # cache miss: user + craftsman in one join
+        self.assertEqual(me(), 1)   # hit: the deferred profile fields, loaded together
+
+    def test_craftsman_and_user_changes_invalidate_the_entry(self):
+        self._identity_queries()
+        self.craftsman.profession = 'Electrician'
+        self.craftsman.save()
+        self.assertEqual(len(self._identity_queries()), 1)
+
+        user = self.craftsman.user
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_is_not_used(self):
+        self.assertEqual(len(self._identity_queries()), 1)
+        self.assertEqual(len(self._identity_queries()), 1)
+
+
+class RequestCraftsmanTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.craftsman = make_craftsman(1)
+        self.job = make_job(make_user('client@example.com'), craftsman=self.craftsman,
+                            status=JobRequest.STATUS_ACCEPTED)
+
+    def _craftsman_queries(self, method, url, data=None):
+        # A fresh user each time, as an authenticator would hand the view.
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.craftsman.user_id))
+        with CaptureQueriesContext(connection) as ctx:
+            resp = getattr(self.client, method)(url, data or {}, format='json')
+        self.assertLess(resp.status_code, 400)
+        return sum('FROM "api_craftsman"' in q['sql'] for q in ctx.captured_queries)
+
+    def test_craftsman_is_loaded_at_most_once_per_request(self):
+        requests_ = [
+            ('get', '/api/job-requests/', None),
+            ('get', f'/api/job-requests/{self.job.pk}/', None),
+            ('post', f'/api/job-requests/{self.job.pk}/start/', None),
+            ('get', '/api/craftsman/invites/', None),
+            ('post', '/api/craftsman/invites/', {'method': 'link'}),
+            ('get', '/api/craftsman/members/', None),
+        ]
+        for method, url, data in requests_:
+            with self.subTest(url=url, method=method):
+                self.assertLessEqual(self._craftsman_queries(method, url, data), 1)
+
+    def test_non_craftsman_is_refused_without_extra_lookups(self):
+        self.client.force_authenticate(make_user('other@example.com'))
+        resp = self.client.post(f'/api/job-requests/{self.job.pk}/start/')
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(self.client.get('/api/craftsman/members/').data, [])
+
+
+class SaveServicesTests(TestCase):
+
+    def setUp(self):
+        self.craftsman = make_craftsman(1)
+        self.services = [
+            {'name': 'Plumbing', 'rate': '1500', 'unit': 'fixed'},
+            {'name': 'Borehole drilling', 'rate': '20000', 'unit': 'fixed'},
+            {'name': 'Painting', 'rate': '300', 'unit': 'hour'},
+        ]
+        _save_services(self.craftsman, self.services)
+        self.ids = dict(Service.objects.values_list('service_name', 'id'))
+
+    def _writes(self, services_data):
+        with CaptureQueriesContext(connection) as ctx:
+            _save_services(self.craftsman, services_data)
+        return [
+            q['sql'].split()[0] for q in ctx.captured_queries
+            if '"api_service"' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+
+    def test_unchanged_services_cost_no_writes(self):
+        self.assertEqual(self._writes([dict(s) for s in self.services]), [])
+
+    def test_writes_are_proportional_to_the_change(self):
+        changed = [dict(s) for s in self.services]
+        changed[0]['rate'] = '1800'
+        del changed[2]
+        changed.append({'name': 'Roofing', 'rate': '', 'unit': 'fixed'})
+        self.assertEqual(sorted(self._writes(changed)), ['DELETE', 'INSERT', 'UPDATE'])
+
+        rows = {s.get_display_name(): s for s in self.craftsman.services.all()}
+        self.assertEqual(set(rows), {'Plumbing', 'Borehole drilling', 'Roofing'})
+        self.assertEqual(rows['Plumbing'].id, self.ids['Plumbing'])
+        self.assertEqual(rows['Plumbing'].rate, Decimal('1800.00'))
+        self.assertEqual(rows['Borehole drilling'].custom_name, 'Borehole drilling')
+        self.assertIsNone(rows['Roofing'].rate)
+        self.assertEqual(self.craftsman.primary_service, 'Plumbing')
+
+
+class CraftsmanProfilePatchTests(TestCase):
+    url = '/api/craftsman/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.craftsman = make_craftsman(1, description='Old', slug='craftsman1')
+        self.client.force_authenticate(self.craftsman.user)
+
+    def test_patch_writes_only_changed_columns_and_answers_from_memory(self):
+        services = json.dumps([{'name': 'Plumbing', 'rate': '900', 'unit': 'fixed'}])
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.patch(self.url, {
+                'description': 'New', 'location': 'Nairobi', 'services': services,
+            }, format='multipart')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['description'], 'New')
+        self.assertEqual(resp.data['primary_service'], 'Plumbing')
+        self.assertEqual([s['rate'] for s in resp.data['services']], ['900.00'])
+
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "api_craftsman"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"description"', updates[0])
+        self.assertIn('"primary_service"', updates[0])
+        self.assertNotIn('"location"', updates[0])
+        self.assertNotIn('"rating_avg"', updates[0])
+        self.assertEqual(Craftsman.objects.get().description, 'New')
+
+    def test_patch_diffs_against_the_stored_row_not_the_authenticated_copy(self):
+        # Changed elsewhere since the authenticated user (and its craftsman) was loaded.
+        Craftsman.objects.filter(pk=self.craftsman.pk).update(location='Mombasa', profession='Electrician')
+        resp = self.client.patch(self.url, {'location': 'Nairobi'}, format='multipart')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data['location'], resp.data['profession']), ('Nairobi', 'Electrician'))
+        stored = Craftsman.objects.get()
+        self.assertEqual((stored.location, stored.profession), ('Nairobi', 'Electrician'))
+
+    def test_failed_patch_leaves_profile_untouched(self):
+        services = json.dumps([{'name': 'Plumbing', 'rate': '900'}])
+        with mock.patch('api.views._save_portfolio', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.patch(self.url, {'description': 'New', 'services': services}, format='multipart')
+        self.assertEqual(Craftsman.objects.get().description, 'Old')
+        self.assertFalse(Service.objects.exists())
+
+
+def upload(name, content=b'jpeg-bytes'):
+    return SimpleUploadedFile(name, content, content_type='image/jpeg')
+
+
+class LocalMediaTestMixin:
+    """Default storage on a throwaway local directory instead of Spaces;
+    stored files are removed after every test."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(prefix='kaakazini-media-')
+        cls.storage_settings = override_settings(MEDIA_ROOT=cls.media_root, STORAGES={
+            'default': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': cls.media_root, 'base_url': '/media/'},
+            },
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        cls.storage_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.storage_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().tearDown()
+
+
+class ParallelUploadTests(LocalMediaTestMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.craftsman = make_craftsman(1, slug='craftsman1')
+        self.client.force_authenticate(self.craftsman.user)
+
+    def test_uploads_overlap_and_keep_request_order(self):
+        in_flight, peak = [0], [0]
+        lock = threading.Lock()
+        real_save = default_storage.save
+
+        def slow_save(name, content, max_length=None):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return real_save(name, content, max_length=max_length)
+
+        files = [upload('image.jpg', f'photo {n}'.encode()) for n in range(4)]
+        with mock.patch.object(default_storage, 'save', side_effect=slow_save):
+            resp = self.client.patch('/api/craftsman/', {'portfolio_images': files}, format='multipart')
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreater(peak[0], 1)
+
+        images = list(GalleryImage.objects.filter(craftsman=self.craftsman).order_by('id'))
+        self.assertEqual(len({i.image.name for i in images}), 4)
+        self.assertEqual([i.image.read() for i in images], [f'photo {n}'.encode() for n in range(4)])
+
+    def test_failed_upload_creates_no_rows_and_removes_stored_files(self):
+        job = make_job(make_user('client@example.com'), craftsman=self.craftsman,
+                       status=JobRequest.STATUS_IN_PROGRESS)
+        real_save = default_storage.save
+
+        def flaky_save(name, content, max_length=None):
+            if content.read() == b'bad':
+                raise OSError('Spaces timed out')
+            content.seek(0)
+            return real_save(name, content, max_length=max_length)
+
+        files = [upload('a.jpg'), upload('b.jpg', b'bad'), upload('c.jpg')]
+        with mock.patch.object(default_storage, 'save', side_effect=flaky_save), \
+                mock.patch.object(default_storage, 'delete', wraps=default_storage.delete) as delete:
+            with self.assertRaises(OSError):
+                self.client.post(f'/api/job-requests/{job.pk}/complete/',
+                                 {'proof_images': files}, format='multipart')
+        self.assertEqual(delete.call_count, 2)
+        self.assertFalse(JobProofImage.objects.exists())
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobRequest.STATUS_IN_PROGRESS)
+
+    def test_store_files_requires_one_instance_per_file(self):
+        with self.assertRaises(ValueError):
+            store_files([GalleryImage(craftsman=self.craftsman)], 'image', [upload('a.jpg'), upload('b.jpg')])
+
+
+class StubS3(BaseHTTPRequestHandler):
+    """Local S3-compatible stand-in: path-style PUT / copy / HEAD / DELETE, no auth."""
+    objects = {}
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        source = self.headers.get('x-amz-copy-source')
+        if source:
+            self.objects[self.path.split('?')[0]] = self.objects[unquote('/' + source.lstrip('/'))]
+            body = b'<CopyObjectResult><ETag>"stub"</ETag></CopyObjectResult>'
+        else:
+            self.objects[self.path.split('?')[0]] = (body, self.headers.get('Content-Type', ''))
+            body = b''
+        self.send_response(200)
+        self.send_header('ETag', '"stub"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        stored = self.objects.get(self.path.split('?')[0])
+        if stored is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(stored[0])))
+        self.send_header('Content-Type', stored[1])
+        self.send_header('ETag', '"stub"')
+        self.end_headers()
+
+    def do_DELETE(self):
+        self.objects.pop(self.path.split('?')[0], None)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class DirectUploadTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubS3)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.storage_settings = override_settings(STORAGES={
+            'default': {
+                'BACKEND': 'api.storage_backends.MediaStorage',
+                'OPTIONS': {
+                    'endpoint_url': f'http://127.0.0.1:{cls.server.server_port}',
+                    'access_key': 'test', 'secret_key': 'test', 'bucket_name': 'kaakazini',
+                    'region_name': 'us-east-1', 'addressing_style': 'path',
+                    'signature_version': 's3v4', 'custom_domain': None,
+                },
+            },
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        cls.storage_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.storage_settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubS3.objects = {}
+        self.client = APIClient()
+        self.craftsman = make_craftsman(1, slug='craftsman1')
+        self.client.force_authenticate(self.craftsman.user)
+
+    def _presign(self, **data):
+        data = {'target': 'craftsman.gallery_image', 'filename': 'IMG_0042.JPG',
+                'content_type': 'image/jpeg', 'size': 9, **data}
+        return self.client.post('/api/uploads/presign/', data, format='json')
+
+    def _put(self, upload, body):
+        resp = requests.put(upload['url'], data=body, headers=upload['headers'], timeout=5)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_presign_put_finalize_creates_row_without_bytes_through_django(self):
+        presign = self._presign()
+        self.assertEqual(presign.status_code, 201)
+        upload = presign.data['upload']
+        self.assertEqual(upload['method'], 'PUT')
+        self.assertEqual(upload['headers']['Content-Type'], 'image/jpeg')
+        self.assertEqual(upload['headers']['Content-Length'], '9')
+        query = parse_qs(urlparse(upload['url']).query)
+        self.assertIn('X-Amz-Signature', query)
+        self.assertIn('content-length', query['X-Amz-SignedHeaders'][0].split(';'))
+        self.assertTrue(presign.data['name'].startswith('craftsmen/gallery/'))
+        self.assertTrue(presign.data['name'].endswith('.jpg'))
+
+        self._put(upload, b'jpegbytes')
+        [pending] = StubS3.objects
+        self.assertTrue(pending.startswith('/kaakazini/media/uploads/pending/'))
+
+        for _ in range(2):
+            done = self.client.post('/api/uploads/finalize/', {'token': presign.data['token']}, format='json')
+            self.assertEqual(done.status_code, 200)
+        self.assertEqual(list(StubS3.objects), [f"/kaakazini/media/{presign.data['name']}"])
+        image = GalleryImage.objects.get()
+        self.assertEqual(image.image.name, presign.data['name'])
+        self.assertEqual(done.data['id'], image.id)
+
+    def test_finalize_attaches_file_fields_on_the_owner(self):
+        job = make_job(make_user('client@example.com'), craftsman=self.craftsman)
+        presign = self._presign(target='job.quote_file', object_id=job.pk,
+                                filename='quote.pdf', content_type='application/pdf', size=4)
+        self._put(presign.data['upload'], b'%PDF')
+        done = self.client.post('/api/uploads/finalize/', {'token': presign.data['token']}, format='json')
+        self.assertEqual(done.status_code, 200)
+        job.refresh_from_db()
+        self.assertEqual(job.quote_file.name, presign.data['name'])
+
+    def test_upload_that_does_not_match_the_signature_is_rejected_and_removed(self):
+        presign = self._presign()
+        self._put(presign.data['upload'], b'much more than nine bytes')
+        done = self.client.post('/api/uploads/finalize/', {'token': presign.data['token']}, format='json')
+        self.assertEqual(done.status_code, 400)
+        self.assertEqual(StubS3.objects, {})
+        self.assertFalse(GalleryImage.objects.exists())
+
+    def test_presign_checks_type_size_and_ownership(self):
+        self.assertEqual(self._presign(content_type='application/x-msdownload').status_code, 400)
+        self.assertEqual(self._presign(size=50 * 1024 * 1024).status_code, 400)
+        other_job = make_job(make_user('client@example.com'), craftsman=make_craftsman(2))
+        self.assertEqual(self._presign(target='job.proof_image', object_id=other_job.pk).status_code, 404)
+
+    def test_token_is_bound_to_the_user(self):
+        presign = self._presign()
+        self._put(presign.data['upload'], b'jpegbytes')
+        self.client.force_authenticate(make_craftsman(2).user)
+        done = self.client.post('/api/uploads/finalize/', {'token': presign.data['token']}, format='json')
+        self.assertEqual(done.status_code, 400)
+        self.assertFalse(GalleryImage.objects.exists())
+
+
+class PendingUploadSweepTests(LocalMediaTestMixin, TestCase):
+
+    def test_sweeps_only_pending_uploads_past_the_age_limit(self):
+        old = default_storage.save('uploads/pending/old.jpg', io.BytesIO(b'x'))
+        fresh = default_storage.save('uploads/pending/fresh.jpg', io.BytesIO(b'x'))
+        live = default_storage.save('craftsmen/gallery/live.jpg', io.BytesIO(b'x'))
+        two_days_ago = time.time() - 2 * 86400
+        os.utime(default_storage.path(old), (two_days_ago, two_days_ago))
+
+        out = StringIO()
+        call_command('sweep_pending_uploads', stdout=out)
+        self.assertIn('deleted 1', out.getvalue())
+        self.assertEqual([default_storage.exists(n) for n in (old, fresh, live)], [False, True, True])
+
+    def test_refuses_an_age_shorter_than_the_token_lifetime(self):
+        with self.assertRaises(CommandError):
+            call_command('sweep_pending_uploads', '--max-age-hours', '0.1', stdout=StringIO())
+
+
+def jpeg_bytes(width, height, color=(200, 60, 30)):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class ImageVariantTests(LocalMediaTestMixin, TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.craftsman = make_craftsman(1, slug='craftsman1')
+        self.client.force_authenticate(self.craftsman.user)
+
+    def test_uploaded_portfolio_images_get_variants_and_srcset(self):
+        photo = upload('photo.jpg', jpeg_bytes(600, 400))
+        resp = self.client.patch('/api/craftsman/', {'portfolio_images': [photo]}, format='multipart')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list('kind', 'payload')),
+            [('image.variants', {'label': 'api.GalleryImage', 'pk': GalleryImage.objects.get().pk})],
+        )
+        self.assertEqual(drain(workers=1)['sent'], 1)
+
+        image = GalleryImage.objects.get()
+        variants = image.image_variants
+        self.assertEqual(variants['source'], image.image.name)
+        self.assertEqual(variants['width'], 600)
+        self.assertEqual(sorted(variants['webp'], key=int), ['128', '480'])
+        with default_storage.open(variants['webp']['480']) as fh:
+            from PIL import Image
+            resized = Image.open(fh)
+            self.assertEqual((resized.format, resized.size), ('WEBP', (480, 320)))
+
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.craftsman.user_id))
+        gallery = self.client.get('/api/craftsman/').data['gallery_images'][0]
+        self.assertRegex(gallery['image_srcset']['webp'], r'_128w\.webp 128w, .*_480w\.webp 480w$')
+        self.assertIn('480w', gallery['image_srcset']['jpeg'])
+
+    def test_replaced_image_hides_stale_variants_until_regenerated(self):
+        name = default_storage.save('products/old.jpg', io.BytesIO(jpeg_bytes(300, 300)))
+        product = Product.objects.create(craftsman=self.craftsman, price=10, image=name)
+        call_command('generate_image_variants', stdout=StringIO())
+        product.refresh_from_db()
+        old_variant = product.image_variants['webp']['128']
+
+        product.image = default_storage.save('products/new.jpg', io.BytesIO(jpeg_bytes(300, 300)))
+        self.assertEqual(ProductSerializer(product).data['image_srcset'], {})
+        product.save()
+        drain(workers=1)
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+        self.assertFalse(default_storage.exists(old_variant))
+
+    def test_backfill_processes_only_missing_variants_in_parallel(self):
+        for n in range(5):
+            name = default_storage.save(f'craftsmen/gallery/p{n}.jpg', io.BytesIO(jpeg_bytes(200, 150)))
+            GalleryImage.objects.create(craftsman=self.craftsman, image=name)
+        GalleryImage.objects.create(craftsman=self.craftsman, image='craftsmen/gallery/missing.jpg')
+
+        out = StringIO()
+        call_command('generate_image_variants', workers=3, model=['api.GalleryImage'], stdout=out)
+        self.assertIn('5 generated, 1 failed', out.getvalue())
+        self.assertTrue(all(
+            '128' in img.image_variants.get('jpeg', {})
+            for img in GalleryImage.objects.exclude(image='craftsmen/gallery/missing.jpg')
+        ))
+
+        out = StringIO()
+        call_command('generate_image_variants', workers=3, model=['api.GalleryImage'], stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+
+class MailBackendTests(TestCase):
+
+    @override_settings(BREVO_API_KEY='key')
+    def test_brevo_fan_out_goes_out_as_one_batch_request_on_a_shared_session(self):
+        backend = BrevoBackend()
+        messages = [
+            {'to_email': f'user{n}@example.com', 'to_name': f'User {n}',
+             'subject': f'Hello {n}', 'html': f'<p>{n}</p>'}
+            for n in range(3)
+        ]
+        ok = mock.Mock(status_code=201)
+        with mock.patch.object(backend.session, 'post', return_value=ok) as post:
+            self.assertEqual(backend.send_messages(messages), 3)
+            self.assertEqual(backend.send_messages(messages[:1]), 1)
+
+        batch, single = (c.kwargs['json'] for c in post.call_args_list)
+        self.assertEqual([v['to'][0]['email'] for v in batch['messageVersions']],
+                         ['user0@example.com', 'user1@example.com', 'user2@example.com'])
+        self.assertEqual(batch['messageVersions'][2]['subject'], 'Hello 2')
+        self.assertNotIn('messageVersions', single)
+
+    @override_settings(BREVO_API_KEY='')
+    def test_brevo_without_api_key_reports_failure(self):
+        self.assertFalse(BrevoBackend().send_messages([
+            {'to_email': 'a@example.com', 'subject': 's', 'html': 'h'},
+        ]))
+
+    @override_settings(MAIL_BACKEND='api.mail.LocmemBackend')
+    def test_notifications_render_shared_layout_into_configured_backend(self):
+        LocmemBackend.sent = []
+        craftsman = make_craftsman(1)
+        invite = TeamInvite.objects.create(
+            craftsman=craftsman, method='email', contact='helper@example.com', name='Helper',
+        )
+        self.assertTrue(deliver_invite_notification(invite.id))
+        [message] = LocmemBackend.sent
+        self.assertEqual(message['to_email'], 'helper@example.com')
+        self.assertIn(str(invite.token), message['html'])
+        self.assertIn("Kenya's verified craftsman marketplace", message['html'])
+
+
+class EmailTemplateTests(TestCase):
+    invite = {'name': '<b>Juma</b>', 'craftsman_name': 'Wanjiru', 'role': 'Helper',
+              'link': 'https://kaakazini.com/join/abc/'}
+
+    def test_renders_subject_html_and_plain_text(self):
+        subject, html, text = email_templates.render('team_invite', self.invite)
+        self.assertEqual(subject, "You're invited to join Wanjiru's team on KaaKazini")
+        self.assertIn('&lt;b&gt;Juma&lt;/b&gt;', html)
+        self.assertIn('Accept Invite', html)
+        self.assertIn('Hi <b>Juma</b>,', text)
+        self.assertNotIn('<div', text)
+
+    def test_locale_variants_fall_back_to_language_then_default(self):
+        subject, html, _ = email_templates.render('team_invite', self.invite, locale='sw-KE')
+        self.assertTrue(subject.startswith('Umealikwa'))
+        self.assertIn('Kubali Mwaliko', html)
+
+        subject, html, _ = email_templates.render(
+            'password_reset', {'name': 'Juma', 'reset_url': 'https://x/'}, locale='sw',
+        )
+        self.assertEqual(subject, 'Reset your KaaKazini password')
+
+    def test_every_registered_template_compiles(self):
+        expected = sum(len(v) for v in email_templates.EMAIL_TEMPLATES.values())
+        self.assertEqual(email_templates.warm(), expected)
+
+
+class ReconcilePaymentsTests(TestCase):
+
+    def setUp(self):
+        client = make_user('client@example.com')
+        stale = timezone.now() - timedelta(minutes=10)
+        self.jobs = {
+            tx: make_job(
+                client, status=JobRequest.STATUS_APPROVED, intasend_invoice_id=tx,
+                payment_status='PENDING', payment_status_at=stale,
+            )
+            for tx in ('TX-PAID', 'TX-FAIL', 'TX-WAIT', 'TX-DOWN')
+        }
+        self.fresh = make_job(
+            client, status=JobRequest.STATUS_APPROVED, intasend_invoice_id='TX-FRESH',
+            payment_status='PENDING', payment_status_at=timezone.now(),
+        )
+
+    @staticmethod
+    def gateway(tx):
+        return {
+            'TX-PAID': {'success': True, 'status': 'COMPLETE', 'raw': {}},
+            'TX-FAIL': {'success': True, 'status': 'FAIL',
+                        'raw': {'data': {'failureReason': 'Request cancelled by user'}}},
+            'TX-WAIT': {'success': True, 'status': 'PENDING', 'raw': {}},
+            'TX-DOWN': {'success': False, 'error': 'Gateway timed out.'},
+        }[tx]
+
+    def test_settles_stale_transactions_and_reports_backlog(self):
+        out = StringIO()
+        with mock.patch(
+            'services.management.commands.reconcile_payments.check_payment_status_cached',
+            side_effect=self.gateway,
+        ) as check:
+            call_command('reconcile_payments', '--workers', '3', stdout=out)
+
+        self.assertNotIn(mock.call('TX-FRESH'), check.call_args_list)
+        for job in (*self.jobs.values(), self.fresh):
+            job.refresh_from_db()
+        self.assertEqual(self.jobs['TX-PAID'].status, JobRequest.STATUS_PAID)
+        self.assertEqual(self.jobs['TX-FAIL'].status, JobRequest.STATUS_QUOTE_APPROVED)
+        self.assertEqual(self.jobs['TX-FAIL'].payment_failure_reason, 'Request cancelled by user')
+        self.assertEqual(self.jobs['TX-WAIT'].status, JobRequest.STATUS_APPROVED)
+        self.assertEqual(self.jobs['TX-DOWN'].intasend_invoice_id, 'TX-DOWN')
+        self.assertIn('checked 4', out.getvalue())
+        self.assertIn('1 paid, 1 failed, 1 still pending, 1 lookup errors', out.getvalue())
+        self.assertIn('backlog 3', out.getvalue())
+
+    def test_never_checked_transactions_go_first(self):
+        unchecked = make_job(
+            make_user('other@example.com'), status=JobRequest.STATUS_APPROVED,
+            intasend_invoice_id='TX-NEW', payment_status='PENDING', payment_status_at=None,
+        )
+        out = StringIO()
+        with mock.patch(
+            'services.management.commands.reconcile_payments.check_payment_status_cached',
+            return_value={'success': False, 'error': 'Gateway timed out.'},
+        ) as check:
+            call_command('reconcile_payments', '--limit', '1', stdout=out)
+
+        check.assert_called_once_with(unchecked.intasend_invoice_id)
+        self.assertIn('backlog 6, oldest never checked', out.getvalue())
+
+
+class CachedPaymentStatusTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pending_results_are_reused_within_the_ttl(self):
+        pending = {'success': True, 'status': 'PENDING', 'raw': {}}
+        with mock.patch('api.intasend_service.check_payment_status', return_value=pending) as check:
+            for _ in range(5):
+                self.assertEqual(check_payment_status_cached('TX1')['status'], 'PENDING')
+        self.assertEqual(check.call_count, 1)
+
+    def test_terminal_results_are_cached_without_expiry(self):
+        complete = {'success': True, 'status': 'COMPLETE', 'raw': {}}
+        with mock.patch('api.intasend_service.check_payment_status', return_value=complete), \
+                mock.patch('api.intasend_service.cache') as fake_cache:
+            fake_cache.get.return_value = None
+            check_payment_status_cached('TX1')
+        fake_cache.set.assert_called_once_with('intasend:tx-status:TX1', complete, None)
+
+    def test_concurrent_polls_share_one_inflight_call(self):
+        calls = []
+
+        def slow_check(tx):
+            calls.append(tx)
+            time.sleep(0.2)
+            return {'success': True, 'status': 'PENDING', 'raw': {}}
+
+        with mock.patch('api.intasend_service.check_payment_status', side_effect=slow_check):
+            threads = [threading.Thread(target=check_payment_status_cached, args=('TX9',)) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(calls, ['TX9'])
+
+    def test_waits_for_the_worker_holding_the_shared_lock(self):
+        # Another process is polling TX5: it holds the lock and fills the cache.
+        cache.add('intasend:tx-status:TX5:lock', 'other-worker', 20)
+        pending = {'success': True, 'status': 'PENDING', 'raw': {}}
+        publish = threading.Timer(0.2, cache.set, args=('intasend:tx-status:TX5', pending, 5))
+        publish.start()
+        with mock.patch('api.intasend_service.check_payment_status') as check:
+            self.assertEqual(check_payment_status_cached('TX5'), pending)
+        publish.join()
+        check.assert_not_called()
+        self.assertEqual(cache.get('intasend:tx-status:TX5:lock'), 'other-worker')
+
+    def test_takes_over_when_the_shared_lock_expires(self):
+        cache.add('intasend:tx-status:TX6:lock', 'crashed-worker', 1)
+        pending = {'success': True, 'status': 'PENDING', 'raw': {}}
+        with mock.patch('api.intasend_service.check_payment_status', return_value=pending) as check:
+            self.assertEqual(check_payment_status_cached('TX6'), pending)
+        check.assert_called_once_with('TX6')
+        self.assertIsNone(cache.get('intasend:tx-status:TX6:lock'))
+
+    def test_waiters_give_up_and_report_the_lookup_in_flight(self):
+        cache.add('intasend:tx-status:TX7:lock', 'slow-worker', 60)
+        with mock.patch('api.intasend_service.STATUS_WAIT_SECONDS', 0.2), \
+                mock.patch('api.intasend_service.check_payment_status') as check:
+            started = time.monotonic()
+            result = check_payment_status_cached('TX7')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(result['in_flight'])
+        check.assert_not_called()
+
+    def test_lock_outlives_the_slowest_gateway_call(self):
+        client = GatewayClient(connect_timeout=3.05, retries=2, backoff=0.3)
+        self.assertAlmostEqual(client.worst_case_seconds(15), 3 * 18.05 + 0.3 + 0.6)
+        with mock.patch('api.intasend_service.gateway', client):
+            self.assertGreater(_status_lock_seconds(), client.worst_case_seconds(STATUS_READ_TIMEOUT))
+
+
+
+class StubGateway(BaseHTTPRequestHandler):
+    """Keep-alive stand-in for the payment gateway; counts connections and requests."""
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    hits = 0
+    statuses = []
+    delays = []
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        type(self).hits += 1
+        if self.delays:
+            time.sleep(self.delays.pop(0))
+        code = self.statuses.pop(0) if self.statuses else 200
+        body = json.dumps({'data': {'status': 'COMPLETED'}}).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GatewayClientTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGateway)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubGateway.connections = 0
+        StubGateway.hits = 0
+        StubGateway.statuses = []
+        StubGateway.delays = []
+
+    def test_calls_reuse_one_pooled_connection_and_record_latency(self):
+        client = GatewayClient()
+        with mock.patch('api.intasend_service.gateway', client), \
+                mock.patch('api.intasend_service.TRANSACTION_URL', f'{self.base}/transaction'):
+            for _ in range(5):
+                self.assertEqual(check_payment_status('TX1')['status'], 'COMPLETE')
+
+        self.assertEqual(StubGateway.connections, 1)
+        metrics = client.metrics()['transaction']
+        self.assertEqual((metrics['calls'], metrics['errors']), (5, 0))
+
+    def test_idempotent_gets_are_retried_on_503(self):
+        StubGateway.statuses = [503, 503]
+        client = GatewayClient(retries=2, backoff=0)
+        resp = client.get(f'{self.base}/transaction/TX1', 'transaction', read_timeout=2)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_read_timeouts_are_not_retried(self):
+        StubGateway.delays = [0.5, 0.5, 0.5]
+        breaker = CircuitBreaker('test', failure_threshold=5)
+        client = GatewayClient(retries=2, backoff=0, breaker=breaker)
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            client.get(f'{self.base}/transaction/TX1', 'transaction', read_timeout=0.1)
+        self.assertEqual(StubGateway.hits, 1)
+        self.assertEqual(breaker.state()['consecutive_failures'], 1)
+
+    def test_posts_are_never_retried(self):
+        retry = GatewayClient().session.get_adapter('https://gateway').max_retries
+        self.assertNotIn('POST', retry.allowed_methods)
+
+    def test_breaker_opens_after_consecutive_failures_and_fails_fast(self):
+        StubGateway.statuses = [503] * 10
+        client = GatewayClient(retries=0, breaker=CircuitBreaker('test', failure_threshold=3))
+        with mock.patch('api.intasend_service.gateway', client), \
+                mock.patch('api.intasend_service.TRANSACTION_URL', f'{self.base}/transaction'):
+            results = [check_payment_status('TX1') for _ in range(5)]
+
+        self.assertEqual(StubGateway.hits, 3)
+        self.assertTrue(results[-1]['circuit_open'])
+        self.assertEqual(client.breaker.state()['state'], CircuitBreaker.OPEN)
+
+    def test_half_open_probe_closes_circuit_on_success(self):
+        StubGateway.statuses = [503]
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+        client = GatewayClient(retries=0, breaker=breaker)
+        url = f'{self.base}/transaction/TX1'
+        client.get(url, 'transaction', read_timeout=2)
+        self.assertFalse(breaker.allow_request())
+
+        time.sleep(0.06)
+        self.assertEqual(client.get(url, 'transaction', read_timeout=2).status_code, 200)
+        self.assertEqual(breaker.state()['state'], CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state()['state'], CircuitBreaker.OPEN)
+
+    def test_state_is_published_outside_the_breaker_lock(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0)
+        held = []
+        real_publish = breaker._publish
+
+        def publish(generation, snapshot):
+            held.append(breaker._lock.locked())
+            real_publish(generation, snapshot)
+
+        cache.clear()
+        with mock.patch.object(breaker, '_publish', side_effect=publish):
+            breaker.record_failure()
+            breaker.allow_request()
+            breaker.record_success()
+        self.assertEqual(held, [False, False, False])
+        self.assertEqual(breaker.published(), [])
+
+    def test_late_publish_of_an_older_state_is_ignored(self):
+        cache.clear()
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60)
+        breaker._publish(2, {'name': 'test', 'state': CircuitBreaker.CLOSED,
+                             'consecutive_failures': 0, 'retry_in_seconds': 0.0})
+        breaker._publish(1, {'name': 'test', 'state': CircuitBreaker.OPEN,
+                             'consecutive_failures': 1, 'retry_in_seconds': 60.0})
+        self.assertEqual(breaker.published(), [])
+
+
+class GatewayCircuitViewTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client_user = make_user('client@example.com')
+        self.job = make_job(self.client_user, status=JobRequest.STATUS_APPROVED, budget=500)
+        cache.clear()
+        self.breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60)
+        self.breaker.record_failure()
+        patcher = mock.patch('api.intasend_service.gateway', GatewayClient(breaker=self.breaker))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pay_returns_503_without_calling_gateway_while_open(self):
+        self.client.force_authenticate(self.client_user)
+        resp = self.client.post(f'/api/job-requests/{self.job.id}/pay/', {'phone': '0712345678'})
+        self.assertEqual(resp.status_code, 503)
+        self.assertTrue(resp.data['circuit_open'])
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.intasend_invoice_id, '')
+
+    def test_health_endpoint_reports_circuit_state_to_admins(self):
+        admin = make_user('admin@example.com', is_staff=True)
+        self.client.force_authenticate(admin)
+        resp = self.client.get('/api/admin/payments/gateway-health/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['circuit']['state'], CircuitBreaker.OPEN)
+
+    def test_health_endpoint_lists_open_circuits_of_all_workers(self):
+        entries = cache.get('circuit:test')
+        entries['web-2:4242'] = {'name': 'test', 'state': CircuitBreaker.HALF_OPEN, 'worker': 'web-2:4242',
+                                 'consecutive_failures': 5, 'retry_in_seconds': 0.0,
+                                 'expires_at': time.time() + 30}
+        entries['web-3:99'] = {'name': 'test', 'state': CircuitBreaker.OPEN, 'worker': 'web-3:99',
+                               'consecutive_failures': 5, 'retry_in_seconds': 0.0,
+                               'expires_at': time.time() - 1}
+        cache.set('circuit:test', entries)
+
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+        workers = self.client.get('/api/admin/payments/gateway-health/').data['workers']
+        self.assertEqual(sorted((w['worker'].startswith('web-2'), w['state']) for w in workers),
+                         [(False, CircuitBreaker.OPEN), (True, CircuitBreaker.HALF_OPEN)])
+        self.assertTrue(all(0 < w['retry_in_seconds'] <= 60 for w in workers if w['state'] == 'open'))
+
+        self.breaker.record_success()
+        self.assertEqual([w['worker'] for w in self.breaker.published()], ['web-2:4242'])
@@ -0,0 +1,228 @@
+# api/upload_views.py
+"""
+Direct-to-storage uploads: the client PUTs the bytes straight to Spaces and
+the app only signs the request and records the result.
+
+  1. POST /uploads/presign/   {"target", "object_id"?, "filename", "content_type", "size"}
+     → {"upload": {"method", "url", "headers"}, "token", "name", "expires_in"}
+  2. PUT the file to upload.url, sending upload.headers. Content type and
+     length are part of the signature, so only the declared file fits.
+  3. POST /uploads/finalize/  {"token"}
+     → the object's size and content type are checked against what was
+       signed, it is moved from PENDING_PREFIX to "name" and attached to
+       its model (or a row created).
+
+Tokens are signed with django.core.signing and bound to the user; nothing
+is stored server-side between the two calls. Uploads that are never
+finalized stay under PENDING_PREFIX, where `manage.py sweep_pending_uploads`
+(or a bucket lifecycle rule on that prefix) removes them. Upload targets
+are listed in UPLOAD_TARGETS.
+
+URL wiring (urls.py):
+  path("uploads/presign/",  PresignUploadView.as_view()),
+  path("uploads/finalize/", FinalizeUploadView.as_view()),
+"""
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Craftsman, GalleryImage, JobProofImage, JobRequest, ServiceVideo
+from .permissions import request_craftsman
+from .serializers import build_file_url
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+IMAGE_TYPES    = {"image/jpeg", "image/png", "image/webp", "image/heic"}
+DOCUMENT_TYPES = IMAGE_TYPES | {"application/pdf"}
+VIDEO_TYPES    = {"video/mp4", "video/quicktime", "video/webm"}
+
+# target → where the file goes. "owner" is the object the caller must own
+# (their craftsman profile, or a job assigned to them); "fk" names the
+# owner on a row created per upload, or is None when the file field lives
+# on the owner itself.
+UPLOAD_TARGETS = {
+    "craftsman.profile":        {"owner": "craftsman", "model": Craftsman,     "field": "profile",
+                                 "fk": None,        "types": IMAGE_TYPES,    "max_bytes": 10 * MB},
+    "craftsman.proof_document": {"owner": "craftsman", "model": Craftsman,     "field": "proof_document",
+                                 "fk": None,        "types": DOCUMENT_TYPES, "max_bytes": 20 * MB},
+    "craftsman.gallery_image":  {"owner": "craftsman", "model": GalleryImage,  "field": "image",
+                                 "fk": "craftsman", "types": IMAGE_TYPES,    "max_bytes": 10 * MB},
+    "craftsman.service_video":  {"owner": "craftsman", "model": ServiceVideo,  "field": "video",
+                                 "fk": "craftsman", "types": VIDEO_TYPES,    "max_bytes": 500 * MB},
+    "job.proof_image":          {"owner": "job",       "model": JobProofImage, "field": "image",
+                                 "fk": "job",       "types": IMAGE_TYPES,    "max_bytes": 10 * MB},
+    "job.quote_file":           {"owner": "job",       "model": JobRequest,    "field": "quote_file",
+                                 "fk": None,        "types": DOCUMENT_TYPES, "max_bytes": 20 * MB},
+}
+
+PRESIGN_EXPIRES = getattr(settings, "MEDIA_PRESIGN_EXPIRES", 900)
+TOKEN_SALT = "api.upload_views"
+# Where presigned PUTs land until finalize moves them into place.
+PENDING_PREFIX = "uploads/pending/"
+
+
+def _field(spec):
+    return spec["model"]._meta.get_field(spec["field"])
+
+
+def _owner(request, spec, object_id):
+    """The caller's craftsman, or the job they are assigned to; None if not theirs."""
+    craftsman = request_craftsman(request)
+    if craftsman is None:
+        return None
+    if spec["owner"] == "craftsman":
+        return craftsman
+    try:
+        job_id = int(object_id)
+    except (TypeError, ValueError):
+        return None
+    if not craftsman.is_approved:
+        return None
+    return JobRequest.objects.filter(pk=job_id, craftsman=craftsman).first()
+
+
+def _pending_name(filename):
+    ext = os.path.splitext(os.path.basename(filename or ""))[1].lower()[:10]
+    return f"{PENDING_PREFIX}{uuid.uuid4().hex}{ext}"
+
+
+def _final_name(spec, pending):
+    """Where a pending upload ends up; unique because the pending name is."""
+    return _field(spec).generate_filename(None, os.path.basename(pending))
+
+
+def _attach(spec, owner, name):
+    """Point the target field at the uploaded object. Finalizing twice is harmless."""
+    field = spec["field"]
+    if spec["fk"] is None:
+        setattr(owner, field, name)
+        owner.save(update_fields=[field])
+        return owner
+    existing = spec["model"].objects.filter(**{spec["fk"]: owner, field: name}).first()
+    return existing or spec["model"].objects.create(**{spec["fk"]: owner, field: name})
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 1.  PRESIGN  —  POST /uploads/presign/
+# ─────────────────────────────────────────────────────────────────────────────
+
+class PresignUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        target = request.data.get("target")
+        spec = UPLOAD_TARGETS.get(target)
+        if spec is None:
+            return Response(
+                {"detail": f"target must be one of: {', '.join(sorted(UPLOAD_TARGETS))}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        content_type = str(request.data.get("content_type", "")).lower()
+        if content_type not in spec["types"]:
+            return Response(
+                {"detail": f"Unsupported content type '{content_type}' for {target}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            size = 0
+        if not 0 < size <= spec["max_bytes"]:
+            return Response(
+                {"detail": f"size must be between 1 and {spec['max_bytes']} bytes."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        object_id = request.data.get("object_id")
+        if _owner(request, spec, object_id) is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        storage = _field(spec).storage
+        if not hasattr(storage, "presigned_put"):
+            return Response(
+                {"detail": "Direct uploads are not available on this storage backend."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+        pending = _pending_name(request.data.get("filename"))
+        name = _final_name(spec, pending)
+        upload = storage.presigned_put(pending, content_type, size, expires_in=PRESIGN_EXPIRES)
+        token = signing.dumps({
+            "target":       target,
+            "object_id":    object_id,
+            "name":         pending,
+            "size":         size,
+            "content_type": content_type,
+            "user":         request.user.pk,
+        }, salt=TOKEN_SALT)
+        logger.info(f"[Upload] Presigned {target} → {name} ({size} bytes) for user #{request.user.pk}")
+
+        return Response(
+            {"upload": upload, "token": token, "name": name, "expires_in": PRESIGN_EXPIRES},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 2.  FINALIZE  —  POST /uploads/finalize/
+# ─────────────────────────────────────────────────────────────────────────────
+
+class FinalizeUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            claim = signing.loads(
+                request.data.get("token", ""), salt=TOKEN_SALT, max_age=PRESIGN_EXPIRES * 2,
+            )
+        except signing.BadSignature:
+            return Response({"detail": "Invalid or expired upload token."}, status=status.HTTP_400_BAD_REQUEST)
+        if claim["user"] != request.user.pk:
+            return Response({"detail": "Invalid or expired upload token."}, status=status.HTTP_400_BAD_REQUEST)
+
+        spec = UPLOAD_TARGETS[claim["target"]]
+        owner = _owner(request, spec, claim["object_id"])
+        if owner is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        storage, pending = _field(spec).storage, claim["name"]
+        name = _final_name(spec, pending)
+        stored = storage.stat(pending)
+        if stored is None:
+            # Finalized before: the object has already been moved into place.
+            stored = storage.stat(name)
+            if stored is None:
+                return Response({"detail": "Nothing was uploaded for this token."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            problem = None
+            if stored["size"] != claim["size"]:
+                problem = f"Uploaded {stored['size']} bytes, expected {claim['size']}."
+            elif stored["content_type"].lower() != claim["content_type"]:
+                problem = f"Uploaded content type '{stored['content_type']}', expected '{claim['content_type']}'."
+            if problem:
+                storage.delete(pending)
+                logger.warning(f"[Upload] Rejected {claim['target']} {pending}: {problem}")
+                return Response({"detail": problem}, status=status.HTTP_400_BAD_REQUEST)
+            storage.move(pending, name)
+
+        with transaction.atomic():
+            instance = _attach(spec, owner, name)
+        logger.info(f"[Upload] Attached {name} to {claim['target']} #{instance.pk}")
+
+        return Response({
+            "target": claim["target"],
+            "id":     instance.pk,
+            "name":   name,
+            "url":    build_file_url(getattr(instance, spec["field"])),
+            "size":   stored["size"],
+        }, status=status.HTTP_200_OK)
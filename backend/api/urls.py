@@ -51,6 +51,8 @@ from .views import (
 
     # Team
     TeamInviteListCreateView,
+    TeamInviteBulkCreateView,
+    TeamInviteDeliveryView,
     TeamInviteDeleteView,
     TeamInviteAcceptView,
     TeamMemberListView,
@@ -65,8 +67,13 @@ from .payment_views import (
     ClientPayJobView,           # POST /job-requests/{pk}/pay/
     PollPaymentStatusView,
     ConfirmPaymentReceivedView, # POST /job-requests/{pk}/confirm-payment/
+    GatewayCallbackView,        # POST /payments/gateway-callback/
+    GatewayHealthView,          # GET  /admin/payments/gateway-health/
 )
 
+# Direct-to-Spaces uploads (presigned PUT + finalize)
+from .upload_views import PresignUploadView, FinalizeUploadView
+
 
 urlpatterns = [
 
@@ -121,6 +128,16 @@ urlpatterns = [
 
     path('job-requests/<int:pk>/pay-status/', PollPaymentStatusView.as_view(), name='job-request-pay-status'),
 
+    # ✅ Gateway pushes transaction status here (HMAC-signed)
+    path('payments/gateway-callback/',                  GatewayCallbackView.as_view(),       name='payment-gateway-callback'),
+
+    # ✅ Admin: circuit-breaker state + gateway latency counters
+    path('admin/payments/gateway-health/',              GatewayHealthView.as_view(),         name='admin-payment-gateway-health'),
+
+
+    # ─── Direct uploads ───────────────────────────────────────────────────────
+    path('uploads/presign/',                            PresignUploadView.as_view(),         name='upload-presign'),
+    path('uploads/finalize/',                           FinalizeUploadView.as_view(),        name='upload-finalize'),
 
     # ─── Reviews ──────────────────────────────────────────────────────────────
     path('reviews/',                                    ReviewListCreateView.as_view(),      name='review-list-create'),
@@ -132,7 +149,9 @@ urlpatterns = [
 
     # ─── Team: Invites ────────────────────────────────────────────────────────
     path('craftsman/invites/',                          TeamInviteListCreateView.as_view(),  name='team-invite-list-create'),
+    path('craftsman/invites/bulk/',                     TeamInviteBulkCreateView.as_view(),  name='team-invite-bulk-create'),
     path('craftsman/invites/<int:pk>/',                 TeamInviteDeleteView.as_view(),      name='team-invite-delete'),
+    path('craftsman/invites/<int:pk>/delivery/',        TeamInviteDeliveryView.as_view(),    name='team-invite-delivery'),
     path('craftsman/invites/accept/<uuid:token>/',      TeamInviteAcceptView.as_view(),      name='team-invite-accept'),
 
     # ─── Team: Members ────────────────────────────────────────────────────────
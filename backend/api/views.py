@@ -1,7 +1,10 @@
 import logging
 import json
+from decimal import Decimal, InvalidOperation
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
 from django.db.models import Q
 
@@ -17,13 +20,17 @@ from .models import (
     JobRequest, ContactMessage, Review, TeamInvite, CraftsmanMember,
 )
 from .serializers import (
-    CraftsmanSerializer, ProductSerializer, ServiceSerializer,
+    CraftsmanSerializer, CraftsmanCardSerializer, ProductSerializer, ServiceSerializer,
     JobRequestSerializer, ContactMessageSerializer, ReviewSerializer,
-    TeamInviteSerializer, CraftsmanMemberSerializer,
+    TeamInviteSerializer, TeamInviteBulkItemSerializer, TeamInviteDeliverySerializer,
+    CraftsmanMemberSerializer,
 )
-from .permissions import IsOwner
-from api.utils import send_craftsman_approval_email
-from .team_notifications import dispatch_invite_notification
+from .permissions import IsOwner, request_craftsman
+from .pagination import CraftsmanDirectoryPagination, JobRequestPagination
+from .mail import send_template
+from .image_variants import schedule_variants
+from .media_uploads import discard_files, store_files
+from .outbox import enqueue, enqueue_many
 from .craftsman_wallet_hook import ensure_craftsman_wallet  # ← new import
 
 logger = logging.getLogger(__name__)
@@ -33,9 +40,14 @@ logger = logging.getLogger(__name__)
 # Generic helpers
 # ─────────────────────────────────────────────
 
+# Relations JobRequestSerializer reads per row.
+def with_job_relations(queryset):
+    return queryset.select_related('craftsman__user', 'client').prefetch_related('proof_images')
+
+
 def get_job_or_404(pk):
     try:
-        return JobRequest.objects.get(pk=pk)
+        return JobRequest.objects.select_related('craftsman__user', 'client').get(pk=pk)
     except JobRequest.DoesNotExist:
         return None
 
@@ -47,12 +59,42 @@ def get_craftsman_or_404(pk):
         return None
 
 
-def is_approved_craftsman(user):
-    return (
-        hasattr(user, "craftsman")
-        and user.craftsman is not None
-        and getattr(user.craftsman, "is_approved", False)
-    )
+# Every relation CraftsmanSerializer walks per row. Loading them up front keeps
+# a list response at a fixed number of queries regardless of page size.
+CRAFTSMAN_PROFILE_PREFETCH = ('gallery_images', 'reviews', 'services', 'service_videos')
+
+
+def with_profile_relations(queryset):
+    return queryset.select_related('user').prefetch_related(*CRAFTSMAN_PROFILE_PREFETCH)
+
+
+def with_card_fields(queryset):
+    return queryset.select_related('user')
+
+
+# ?ordering= values accepted by the craftsman lists. The rating order is served
+# by craftsman_rating_idx on the denormalised aggregates.
+CRAFTSMAN_LIST_ORDERINGS = {
+    'newest': ('-id',),
+    'rating': ('-rating_avg', '-review_count', '-id'),
+    'reviews': ('-review_count', '-rating_avg', '-id'),
+}
+
+
+def apply_rating_params(queryset, params):
+    min_rating = params.get('min_rating')
+    if min_rating:
+        try:
+            queryset = queryset.filter(rating_avg__gte=Decimal(min_rating))
+        except (InvalidOperation, ValueError):
+            pass
+    ordering = CRAFTSMAN_LIST_ORDERINGS.get(params.get('ordering'), CRAFTSMAN_LIST_ORDERINGS['newest'])
+    return queryset.order_by(*ordering)
+
+
+def is_approved_craftsman(request):
+    craftsman = request_craftsman(request)
+    return craftsman is not None and craftsman.is_approved
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -105,43 +147,93 @@ def _save_skills(craftsman, request_data):
     logger.info(f"[Profile] skills → '{craftsman.skills}'")
 
 
+def _parse_service_rate(raw_rate):
+    if raw_rate in (None, '', 'null', 'None'):
+        return None
+    try:
+        rate = Decimal(str(raw_rate)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    return rate if rate.is_finite() else None
+
+
+SERVICE_DIFF_FIELDS = ['service_name', 'custom_name', 'rate', 'unit']
+
+
 def _save_services(craftsman, services_data):
+    """
+    Make the craftsman's services match services_data. Existing rows are
+    matched by name and keep their ids; only the difference is written —
+    one bulk_update, one bulk_create and one DELETE, in one transaction.
+    """
     if services_data is None:
         return
     if not isinstance(services_data, list):
         logger.warning(f"[Profile] services is not a list ({type(services_data)}), skipping")
         return
 
-    craftsman.services.all().delete()
     known_choices = {
         choice[0] for choice in Service._meta.get_field('service_name').flatchoices
     }
 
+    wanted = []
     for i, svc in enumerate(services_data):
         if not isinstance(svc, dict):
             continue
         name = str(svc.get('name', '')).strip()
         if not name:
             continue
-        raw_rate = svc.get('rate')
-        try:
-            rate = float(raw_rate) if raw_rate not in (None, '', 'null', 'None') else None
-        except (ValueError, TypeError):
-            rate = None
+        rate = _parse_service_rate(svc.get('rate'))
         unit = str(svc.get('unit', 'fixed')).strip() or 'fixed'
-
-        if name in known_choices:
-            Service.objects.create(craftsman=craftsman, service_name=name, custom_name=None, rate=rate, unit=unit)
-        else:
-            Service.objects.create(craftsman=craftsman, service_name=None, custom_name=name, rate=rate, unit=unit)
+        known = name in known_choices
+        wanted.append((name, {
+            'service_name': name if known else None,
+            'custom_name':  None if known else name,
+            'rate':         rate,
+            'unit':         unit,
+        }))
 
         if i == 0:
-            craftsman.primary_service = name if name in known_choices else None
+            craftsman.primary_service = name if known else None
+
+    existing = {}
+    for service in craftsman.services.all():
+        existing.setdefault(service.get_display_name(), []).append(service)
+
+    to_create, to_update = [], []
+    for name, values in wanted:
+        matches = existing.get(name)
+        if not matches:
+            to_create.append(Service(craftsman=craftsman, **values))
+            continue
+        service = matches.pop(0)
+        if any(getattr(service, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(service, field, value)
+            to_update.append(service)
+    to_delete = [service.pk for matches in existing.values() for service in matches]
+
+    with transaction.atomic(savepoint=False):
+        if to_delete:
+            Service.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            Service.objects.bulk_update(to_update, SERVICE_DIFF_FIELDS)
+        if to_create:
+            Service.objects.bulk_create(to_create)
+
+    logger.info(
+        f"[Profile] services for craftsman {craftsman.id}: {len(to_create)} added, "
+        f"{len(to_update)} updated, {len(to_delete)} removed"
+    )
 
-    logger.info(f"[Profile] {len(services_data)} services saved for craftsman {craftsman.id}")
 
+def _upload_portfolio(craftsman, request):
+    """Store the new portfolio images (in parallel) before any row is written."""
+    files = request.FILES.getlist('portfolio_images')
+    return store_files([GalleryImage(craftsman=craftsman) for _ in files], 'image', files)
 
-def _save_portfolio(craftsman, request):
+
+def _save_portfolio(craftsman, request, new_images):
     remove_ids = _parse_json_field(request.data, 'portfolio_remove_ids')
     if remove_ids and isinstance(remove_ids, list):
         int_ids = []
@@ -156,10 +248,9 @@ def _save_portfolio(craftsman, request):
             ).delete()
             logger.info(f"[Profile] Deleted {deleted_count} portfolio images")
 
-    new_images = request.FILES.getlist('portfolio_images')
-    for img_file in new_images:
-        GalleryImage.objects.create(craftsman=craftsman, image=img_file)
     if new_images:
+        GalleryImage.objects.bulk_create(new_images)
+        schedule_variants(*new_images)
         logger.info(f"[Profile] Added {len(new_images)} portfolio images for craftsman {craftsman.id}")
 
 
@@ -184,59 +275,114 @@ class CraftsmanDetailView(generics.RetrieveUpdateAPIView):
     lookup_field = "slug"
 
     def get_object(self):
-        craftsman, _ = Craftsman.objects.get_or_create(user=self.request.user)
+        craftsman = request_craftsman(self.request)
+        if craftsman is None:
+            craftsman, _ = Craftsman.objects.get_or_create(user=self.request.user)
         return craftsman
 
     def patch(self, request, *args, **kwargs):
-        craftsman = self.get_object()
+        """
+        One transaction: the craftsman row is re-read under a row lock (the
+        authenticated copy may come from the user cache), only the columns
+        that changed are written, services are diffed (see _save_services)
+        and the portfolio edited in place. The response is serialized from
+        the saved row; only its related lists are loaded, once.
+        """
+        owner = self.get_object()
         data  = request.data
         files = request.FILES
+        changed = set()
 
-        # ── 1. Scalar fields ──────────────────────────────────────────
-        for field in CRAFTSMAN_SCALAR_FIELDS:
-            if field in data:
-                val = data[field]
-                setattr(craftsman, field, val if val != '' else None)
-
-        # ── 2. Profile photo ──────────────────────────────────────────
-        if 'profile' in files:
-            craftsman.profile = files['profile']
-
-        # ── 3. Proof document ─────────────────────────────────────────
-        if 'proof_document' in files:
-            craftsman.proof_document = files['proof_document']
-
-        # ── 4. Skills ─────────────────────────────────────────────────
-        _save_skills(craftsman, data)
+        services_data = _parse_json_field(data, 'services')
+        new_images = _upload_portfolio(owner, request)
+        try:
+            with transaction.atomic():
+                craftsman = (
+                    Craftsman.objects.select_for_update(of=('self',))
+                    .select_related('user').get(pk=owner.pk)
+                )
+
+                # ── 1. Scalar fields ──────────────────────────────────
+                for field in CRAFTSMAN_SCALAR_FIELDS:
+                    if field in data:
+                        val = data[field] if data[field] != '' else None
+                        if getattr(craftsman, field) != val:
+                            setattr(craftsman, field, val)
+                            changed.add(field)
+
+                # ── 2. Profile photo / proof document ─────────────────
+                for field in ('profile', 'proof_document'):
+                    if field in files:
+                        setattr(craftsman, field, files[field])
+                        changed.add(field)
+
+                # ── 3. Skills ─────────────────────────────────────────
+                skills = craftsman.skills
+                _save_skills(craftsman, data)
+                if craftsman.skills != skills:
+                    changed.add('skills')
+
+                # ── 4. Services (may pick a new primary_service) ──────
+                primary_service = craftsman.primary_service
+                _save_services(craftsman, services_data)
+                if craftsman.primary_service != primary_service:
+                    changed.add('primary_service')
+
+                # ── 5. Changed columns only ───────────────────────────
+                if not craftsman.slug:
+                    changed.add('slug')
+                if changed:
+                    craftsman.save(update_fields=sorted(changed))
+
+                # ── 6. Portfolio ──────────────────────────────────────
+                _save_portfolio(craftsman, request, new_images)
+        except Exception:
+            discard_files(new_images, 'image')
+            raise
+
+        # ── 7. Respond from the saved instance ────────────────────────
+        prefetch_related_objects([craftsman], *CRAFTSMAN_PROFILE_PREFETCH)
+        serializer = self.get_serializer(craftsman)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-        # ── 5. Save scalar changes ────────────────────────────────────
-        craftsman.save()
 
-        # ── 6. Services ───────────────────────────────────────────────
-        services_data = _parse_json_field(data, 'services')
-        _save_services(craftsman, services_data)
-        if services_data is not None:
-            Craftsman.objects.filter(pk=craftsman.pk).update(
-                primary_service=craftsman.primary_service
-            )
+class CraftsmanListModeMixin:
+    """
+    ?view=card switches a craftsman list to CraftsmanCardSerializer; anything
+    else keeps the full profile representation.
+    """
+    def is_card_view(self):
+        return self.request.query_params.get('view') == 'card'
 
-        # ── 7. Portfolio ──────────────────────────────────────────────
-        _save_portfolio(craftsman, request)
+    def get_serializer_class(self):
+        if self.is_card_view():
+            return CraftsmanCardSerializer
+        return super().get_serializer_class()
 
-        # ── 8. Return refreshed profile ───────────────────────────────
-        craftsman.refresh_from_db()
-        serializer = self.get_serializer(craftsman)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    def shape_queryset(self, queryset):
+        if self.is_card_view():
+            return with_card_fields(queryset)
+        return with_profile_relations(queryset)
 
 
-class PublicCraftsmanListView(generics.ListAPIView):
-    queryset = Craftsman.objects.filter(is_approved=True)
+class PublicCraftsmanListView(CraftsmanListModeMixin, generics.ListAPIView):
+    """
+    Approved craftsmen. Returns the full list by default; pass ?page=N or
+    ?paginate=cursor for a paginated response (see api/pagination.py),
+    ?view=card for compact listing rows, and ?ordering=rating / ?min_rating=4
+    to sort or filter by rating.
+    """
     serializer_class = CraftsmanSerializer
     permission_classes = [AllowAny]
+    pagination_class = CraftsmanDirectoryPagination
+
+    def get_queryset(self):
+        queryset = self.shape_queryset(Craftsman.objects.filter(is_approved=True))
+        return apply_rating_params(queryset, self.request.query_params)
 
 
 class PublicCraftsmanDetailView(generics.RetrieveAPIView):
-    queryset = Craftsman.objects.filter(is_approved=True)
+    queryset = with_profile_relations(Craftsman.objects.filter(is_approved=True))
     serializer_class = CraftsmanSerializer
     permission_classes = [AllowAny]
     lookup_field = "slug"
@@ -246,19 +392,20 @@ class PublicCraftsmanDetailView(generics.RetrieveAPIView):
 # Admin: Craftsman Views
 # ─────────────────────────────────────────────
 
-class AdminCraftsmanListView(generics.ListAPIView):
+class AdminCraftsmanListView(CraftsmanListModeMixin, generics.ListAPIView):
     serializer_class = CraftsmanSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = CraftsmanDirectoryPagination
 
     def get_queryset(self):
-        queryset = Craftsman.objects.all()
+        queryset = self.shape_queryset(Craftsman.objects.all())
         is_approved = self.request.query_params.get("is_approved")
         search      = self.request.query_params.get("search")
         if is_approved is not None:
             queryset = queryset.filter(is_approved=is_approved.lower() == "true")
         if search:
             queryset = queryset.filter(user__full_name__icontains=search)
-        return queryset
+        return apply_rating_params(queryset, self.request.query_params)
 
 
 class AdminCraftsmanApproveView(APIView):
@@ -269,18 +416,18 @@ class AdminCraftsmanApproveView(APIView):
         if not craftsman:
             return Response({"error": "Craftsman not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        craftsman.status      = "approved"
-        craftsman.is_approved = True
-        craftsman.save()
+        with transaction.atomic():
+            craftsman.status      = "approved"
+            craftsman.is_approved = True
+            craftsman.save()
+            enqueue(
+                "email.craftsman_approved",
+                email=craftsman.user.email, full_name=craftsman.user.full_name,
+            )
 
         # ── Create gateway wallet so payments route directly to this craftsman ──
         ensure_craftsman_wallet(craftsman)
 
-        try:
-            send_craftsman_approval_email(craftsman.user.email, craftsman.user.full_name)
-        except Exception as e:
-            logger.error(f"Failed to send approval email: {e}")
-
         return Response({"status": "approved"}, status=status.HTTP_200_OK)
 
 
@@ -351,9 +498,8 @@ class ServiceCreateView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        try:
-            craftsman = Craftsman.objects.get(user=self.request.user)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(self.request)
+        if craftsman is None:
             raise serializers.ValidationError("Craftsman profile not found.")
         serializer.save(craftsman=craftsman)
 
@@ -363,11 +509,10 @@ class ServiceUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        try:
-            craftsman = Craftsman.objects.get(user=self.request.user)
-            return Service.objects.filter(craftsman=craftsman)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(self.request)
+        if craftsman is None:
             return Service.objects.none()
+        return Service.objects.filter(craftsman=craftsman)
 
 
 # ─────────────────────────────────────────────
@@ -379,10 +524,13 @@ class ProductListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, IsOwner]
 
     def get_queryset(self):
-        return Product.objects.filter(craftsman=self.request.user.craftsman)
+        return Product.objects.filter(craftsman=request_craftsman(self.request))
 
     def perform_create(self, serializer):
-        serializer.save(craftsman=self.request.user.craftsman)
+        craftsman = request_craftsman(self.request)
+        if craftsman is None:
+            raise serializers.ValidationError("Craftsman profile not found.")
+        serializer.save(craftsman=craftsman)
 
 
 class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -390,7 +538,7 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated, IsOwner]
 
     def get_queryset(self):
-        return Product.objects.filter(craftsman=self.request.user.craftsman)
+        return Product.objects.filter(craftsman=request_craftsman(self.request))
 
 
 # ─────────────────────────────────────────────
@@ -436,23 +584,37 @@ class AdminProductRejectView(APIView):
 # ─────────────────────────────────────────────
 
 class JobRequestListCreateView(generics.ListCreateAPIView):
+    """
+    Full list by default. ?paginate=cursor / ?cursor=... walks the list by
+    (created_at, id) so deep pages cost the same as the first; ?status=
+    narrows it using the status index.
+    """
     serializer_class = JobRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = JobRequestPagination
 
     def get_queryset(self):
+        queryset = self._scoped_queryset()
+        status_filter = self.request.query_params.get("status")
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return with_job_relations(queryset).order_by("-created_at", "-id")
+
+    def _scoped_queryset(self):
         user = self.request.user
         if user.is_staff or user.is_superuser:
-            return JobRequest.objects.all().order_by("-created_at")
+            return JobRequest.objects.all()
         role = self.request.query_params.get("role")
         if role == "client":
-            return JobRequest.objects.filter(client=user).order_by("-created_at")
+            return JobRequest.objects.filter(client=user)
+        craftsman = request_craftsman(self.request)
         if role == "craftsman":
-            if hasattr(user, "craftsman") and user.craftsman is not None:
-                return JobRequest.objects.filter(craftsman=user.craftsman).order_by("-created_at")
+            if craftsman is not None:
+                return JobRequest.objects.filter(craftsman=craftsman)
             return JobRequest.objects.none()
-        if is_approved_craftsman(user):
-            return JobRequest.objects.filter(craftsman=user.craftsman).order_by("-created_at")
-        return JobRequest.objects.filter(client=user).order_by("-created_at")
+        if craftsman is not None and craftsman.is_approved:
+            return JobRequest.objects.filter(craftsman=craftsman)
+        return JobRequest.objects.filter(client=user)
 
     def perform_create(self, serializer):
         serializer.save(client=self.request.user)
@@ -465,12 +627,14 @@ class JobRequestDetailView(generics.RetrieveUpdateAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff or user.is_superuser:
-            return JobRequest.objects.all()
-        if is_approved_craftsman(user):
-            return JobRequest.objects.filter(
-                Q(craftsman=user.craftsman) | Q(client=user)
+            queryset = JobRequest.objects.all()
+        elif is_approved_craftsman(self.request):
+            queryset = JobRequest.objects.filter(
+                Q(craftsman=request_craftsman(self.request)) | Q(client=user)
             )
-        return JobRequest.objects.filter(client=user)
+        else:
+            queryset = JobRequest.objects.filter(client=user)
+        return with_job_relations(queryset)
 
 
 class AssignCraftsmanView(APIView):
@@ -499,9 +663,9 @@ class CraftsmanAcceptJobView(APIView):
         job = get_job_or_404(pk)
         if not job:
             return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
-        if not is_approved_craftsman(request.user):
+        if not is_approved_craftsman(request):
             return Response({"error": "Not a craftsman"}, status=status.HTTP_403_FORBIDDEN)
-        if job.craftsman != request.user.craftsman:
+        if job.craftsman_id != request_craftsman(request).id:
             return Response({"error": "Job not assigned to you"}, status=status.HTTP_403_FORBIDDEN)
         job.status = JobRequest.STATUS_ACCEPTED
         job.save()
@@ -515,7 +679,7 @@ class StartJobView(APIView):
         job = get_job_or_404(pk)
         if not job:
             return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
-        if not is_approved_craftsman(request.user) or job.craftsman != request.user.craftsman:
+        if not is_approved_craftsman(request) or job.craftsman_id != request_craftsman(request).id:
             return Response({"error": "This is not your job"}, status=status.HTTP_403_FORBIDDEN)
         job.status     = JobRequest.STATUS_IN_PROGRESS
         job.start_time = timezone.now()
@@ -531,13 +695,19 @@ class CompleteJobView(APIView):
         job = get_job_or_404(pk)
         if not job:
             return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
-        if not is_approved_craftsman(request.user) or job.craftsman != request.user.craftsman:
+        if not is_approved_craftsman(request) or job.craftsman_id != request_craftsman(request).id:
             return Response({"error": "This is not your job"}, status=status.HTTP_403_FORBIDDEN)
-        for image in request.FILES.getlist("proof_images"):
-            JobProofImage.objects.create(job=job, image=image)
-        job.end_time = timezone.now()
-        job.status   = JobRequest.STATUS_COMPLETED
-        job.save()
+        files  = request.FILES.getlist("proof_images")
+        proofs = store_files([JobProofImage(job=job) for _ in files], "image", files)
+        try:
+            with transaction.atomic():
+                JobProofImage.objects.bulk_create(proofs)
+                job.end_time = timezone.now()
+                job.status   = JobRequest.STATUS_COMPLETED
+                job.save()
+        except Exception:
+            discard_files(proofs, "image")
+            raise
         return Response(
             JobRequestSerializer(job, context={"request": request}).data,
             status=status.HTTP_200_OK,
@@ -594,7 +764,7 @@ class SubmitQuoteView(APIView):
         job = get_job_or_404(pk)
         if not job:
             return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
-        if not is_approved_craftsman(request.user) or job.craftsman != request.user.craftsman:
+        if not is_approved_craftsman(request) or job.craftsman_id != request_craftsman(request).id:
             return Response({"error": "Not authorized to submit quote."}, status=status.HTTP_403_FORBIDDEN)
         if 'quote_file' in request.FILES:
             job.quote_file = request.FILES['quote_file']
@@ -620,7 +790,7 @@ class SendQuoteView(APIView):
         job = get_job_or_404(pk)
         if not job:
             return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
-        if not is_approved_craftsman(request.user) or job.craftsman != request.user.craftsman:
+        if not is_approved_craftsman(request) or job.craftsman_id != request_craftsman(request).id:
             return Response({"error": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
         send_method = request.data.get("send_method", "download")
         base_url    = getattr(settings, "FRONTEND_URL", "https://kaakazini.com")
@@ -682,6 +852,12 @@ class ReviewListCreateView(generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_create(self, serializer):
+        # The post_save signal refreshes the craftsman's rating aggregates;
+        # the review only sticks if that succeeds too.
+        with transaction.atomic():
+            serializer.save()
+
 
 class PublicReviewListView(generics.ListAPIView):
     queryset = Review.objects.all().order_by("-id")
@@ -714,21 +890,15 @@ class ContactMessageCreateView(generics.CreateAPIView):
 class TeamInviteListCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def _get_craftsman(self, user):
-        try:
-            return Craftsman.objects.get(user=user)
-        except Craftsman.DoesNotExist:
-            return None
-
     def get(self, request):
-        craftsman = self._get_craftsman(request.user)
+        craftsman = request_craftsman(request)
         if not craftsman:
             return Response([], status=status.HTTP_200_OK)
         invites = TeamInvite.objects.filter(craftsman=craftsman).exclude(status='revoked')
         return Response(TeamInviteSerializer(invites, many=True).data)
 
     def post(self, request):
-        craftsman = self._get_craftsman(request.user)
+        craftsman = request_craftsman(request)
         if not craftsman:
             return Response({"detail": "Craftsman profile not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -746,28 +916,130 @@ class TeamInviteListCreateView(APIView):
         ).exists():
             return Response({"detail": "An active invite already exists for this contact."}, status=status.HTTP_400_BAD_REQUEST)
 
-        invite = TeamInvite.objects.create(
-            craftsman=craftsman, method=method,
-            contact=contact or None, name=name or None,
-            role=role, status="pending_invite",
-        )
-        notification_sent = dispatch_invite_notification(invite)
-        if not notification_sent and method != "link":
-            logger.warning(f"[TeamInvite] Notification failed for invite #{invite.id} via {method} to {contact}")
+        notification_queued = method != "link"
+        with transaction.atomic():
+            invite = TeamInvite.objects.create(
+                craftsman=craftsman, method=method,
+                contact=contact or None, name=name or None,
+                role=role, status="pending_invite",
+                delivery_status=TeamInvite.DELIVERY_QUEUED if notification_queued else "",
+            )
+            if notification_queued:
+                enqueue("team.invite", invite_id=invite.id)
 
         return Response(
-            {**TeamInviteSerializer(invite).data, "notification_sent": notification_sent},
+            {**TeamInviteSerializer(invite).data, "notification_queued": notification_queued},
             status=status.HTTP_201_CREATED,
         )
 
 
+class TeamInviteBulkCreateView(APIView):
+    """
+    POST /craftsman/invites/bulk/
+      {"invites": [{"method", "contact", "name", "role"}, ...], "locale": "sw"}
+
+    Validates every entry, drops duplicates (within the request and against
+    active invites, one query), creates the rest with a single INSERT and
+    queues their notifications: all email invites as one batch send, each
+    SMS / WhatsApp invite as its own outbox message so drain_outbox sends
+    them in parallel. Results come back per contact, in request order.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_INVITES = 100
+
+    def post(self, request):
+        craftsman = request_craftsman(request)
+        if craftsman is None:
+            return Response({"detail": "Craftsman profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        entries = request.data.get("invites")
+        if not isinstance(entries, list) or not entries:
+            return Response({"detail": "'invites' must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > self.MAX_INVITES:
+            return Response(
+                {"detail": f"At most {self.MAX_INVITES} invites per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [None] * len(entries)
+        valid = []
+        for index, entry in enumerate(entries):
+            serializer = TeamInviteBulkItemSerializer(data=entry if isinstance(entry, dict) else {})
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"index": index, "result": "invalid", "errors": serializer.errors}
+
+        active = set(
+            TeamInvite.objects.filter(
+                craftsman=craftsman,
+                contact__in=[data["contact"] for _, data in valid if data["contact"]],
+                status__in=["pending_invite", "pending_approval"],
+            ).values_list("contact", flat=True)
+        )
+        to_create = []
+        for index, data in valid:
+            contact = data["contact"]
+            if contact and contact in active:
+                results[index] = {"index": index, "contact": contact, "result": "duplicate"}
+                continue
+            if contact:
+                active.add(contact)
+            to_create.append((index, TeamInvite(
+                craftsman=craftsman, method=data["method"],
+                contact=contact or None, name=data["name"] or None,
+                role=data["role"], status="pending_invite",
+                delivery_status=TeamInvite.DELIVERY_QUEUED if data["method"] != "link" else "",
+            )))
+
+        with transaction.atomic():
+            invites = TeamInvite.objects.bulk_create([invite for _, invite in to_create])
+            email_ids = [i.id for i in invites if i.method == "email"]
+            if email_ids:
+                enqueue("team.invite_emails", invite_ids=email_ids, locale=request.data.get("locale"))
+            enqueue_many("team.invite", [
+                {"invite_id": i.id} for i in invites if i.method in ("sms", "whatsapp")
+            ])
+
+        for (index, _), invite in zip(to_create, invites):
+            results[index] = {
+                "index":               index,
+                "contact":             invite.contact,
+                "result":              "created",
+                "invite":              TeamInviteSerializer(invite).data,
+                "notification_queued": invite.method != "link",
+            }
+
+        summary = {
+            key: sum(1 for r in results if r["result"] == key)
+            for key in ("created", "duplicate", "invalid")
+        }
+        return Response(
+            {"summary": summary, "results": results},
+            status=status.HTTP_201_CREATED if invites else status.HTTP_200_OK,
+        )
+
+
+class TeamInviteDeliveryView(APIView):
+    """GET /craftsman/invites/{pk}/delivery/ — delivery status and every attempt so far."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            invite = TeamInvite.objects.prefetch_related('delivery_attempts').get(
+                pk=pk, craftsman__user=request.user,
+            )
+        except TeamInvite.DoesNotExist:
+            return Response({"detail": "Invite not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TeamInviteDeliverySerializer(invite).data)
+
+
 class TeamInviteDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, pk):
-        try:
-            craftsman = Craftsman.objects.get(user=request.user)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(request)
+        if craftsman is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         try:
             invite = TeamInvite.objects.get(pk=pk, craftsman=craftsman)
@@ -786,9 +1058,8 @@ class TeamMemberListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        try:
-            craftsman = Craftsman.objects.get(user=request.user)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(request)
+        if craftsman is None:
             return Response([], status=status.HTTP_200_OK)
         members = CraftsmanMember.objects.filter(craftsman=craftsman, status="accepted")
         return Response(CraftsmanMemberSerializer(members, many=True).data)
@@ -798,9 +1069,8 @@ class TeamMemberPendingApprovalView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        try:
-            craftsman = Craftsman.objects.get(user=request.user)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(request)
+        if craftsman is None:
             return Response([], status=status.HTTP_200_OK)
         pending = CraftsmanMember.objects.filter(craftsman=craftsman, status="pending_approval")
         return Response(CraftsmanMemberSerializer(pending, many=True).data)
@@ -810,9 +1080,8 @@ class TeamMemberApproveView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            craftsman = Craftsman.objects.get(user=request.user)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(request)
+        if craftsman is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         try:
             member = CraftsmanMember.objects.get(pk=pk, craftsman=craftsman)
@@ -820,12 +1089,13 @@ class TeamMemberApproveView(APIView):
             return Response({"detail": "Member not found."}, status=status.HTTP_404_NOT_FOUND)
         if member.status != "pending_approval":
             return Response({"detail": f"Member is already '{member.status}'."}, status=status.HTTP_400_BAD_REQUEST)
-        member.status = "accepted"
-        member.save()
-        if member.invite:
-            member.invite.status = "accepted"
-            member.invite.save()
-        _notify_member_approved(member)
+        with transaction.atomic():
+            member.status = "accepted"
+            member.save()
+            if member.invite:
+                member.invite.status = "accepted"
+                member.invite.save()
+            enqueue("team.member_approved", member_id=member.id)
         return Response(CraftsmanMemberSerializer(member).data, status=status.HTTP_200_OK)
 
 
@@ -833,9 +1103,8 @@ class TeamMemberRejectView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            craftsman = Craftsman.objects.get(user=request.user)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(request)
+        if craftsman is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         try:
             member = CraftsmanMember.objects.get(pk=pk, craftsman=craftsman)
@@ -853,9 +1122,8 @@ class TeamMemberDeleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, pk):
-        try:
-            craftsman = Craftsman.objects.get(user=request.user)
-        except Craftsman.DoesNotExist:
+        craftsman = request_craftsman(request)
+        if craftsman is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         try:
             member = CraftsmanMember.objects.get(pk=pk, craftsman=craftsman)
@@ -909,57 +1177,24 @@ class TeamInviteAcceptView(APIView):
 # ─────────────────────────────────────────────
 
 def _notify_member_approved(member):
-    import requests as _req
-    from django.conf import settings as _s
-
-    api_key = getattr(_s, "BREVO_API_KEY", "")
-    if not api_key or not member.email:
-        return
+    if not member.email:
+        return True
+
+    sent = send_template(
+        "member_approved", member.email, to_name=member.full_name or "",
+        name=member.full_name or "there",
+        craftsman_name=member.craftsman.full_name or member.craftsman.user.full_name or "Your team owner",
+        role=member.role.capitalize(),
+        dashboard_url=f"{getattr(settings, 'FRONTEND_URL', 'https://kaakazini.com')}/dashboard",
+    )
+    if sent:
+        logger.info(f"[Mail] Approval email sent to {member.email} (member #{member.id})")
+    return sent
 
-    craftsman_name = member.craftsman.full_name or member.craftsman.user.full_name or "Your team owner"
-    role           = member.role.capitalize()
-    dashboard_url  = f"{getattr(_s, 'FRONTEND_URL', 'https://kaakazini.com')}/dashboard"
-    sender_email   = getattr(_s, "BREVO_SENDER_EMAIL", "noreply@kaakazini.com")
-    sender_name    = getattr(_s, "BREVO_SENDER_NAME",  "KaaKazini")
-
-    html_content = f"""
-    <div style="font-family:Arial,sans-serif;max-width:560px;margin:auto;">
-      <div style="background:#0d0d0d;padding:24px 32px;border-radius:12px 12px 0 0;">
-        <h2 style="color:#FFD700;margin:0;">&#10003; You've been approved!</h2>
-      </div>
-      <div style="background:#f9fafb;padding:28px 32px;border:1px solid #e5e7eb;">
-        <p style="font-size:1rem;color:#111827;">Hi <strong>{member.full_name or 'there'}</strong>,</p>
-        <p style="color:#374151;">
-          <strong>{craftsman_name}</strong> has approved your request to join their
-          team on <strong>KaaKazini</strong> as a <strong>{role}</strong>.
-        </p>
-        <p style="color:#374151;">You can now log in and access the team dashboard.</p>
-        <div style="text-align:center;margin:32px 0;">
-          <a href="{dashboard_url}" style="background:#FFD700;color:#0d0d0d;padding:14px 32px;
-            border-radius:10px;text-decoration:none;font-weight:700;font-size:1rem;display:inline-block;">
-            Go to Dashboard &rarr;
-          </a>
-        </div>
-      </div>
-      <div style="background:#f3f4f6;padding:14px 32px;border-radius:0 0 12px 12px;
-        font-size:.75rem;color:#9ca3af;text-align:center;">
-        KaaKazini &mdash; Kenya's verified craftsman marketplace
-      </div>
-    </div>
-    """
 
-    try:
-        _req.post(
-            "https://api.brevo.com/v3/smtp/email",
-            json={
-                "sender": {"name": sender_name, "email": sender_email},
-                "to":     [{"email": member.email, "name": member.full_name or ""}],
-                "subject": f"You've been approved to join {craftsman_name}'s team",
-                "htmlContent": html_content,
-            },
-            headers={"api-key": api_key, "Content-Type": "application/json"},
-            timeout=10,
-        ).raise_for_status()
-        logger.info(f"[Brevo] Approval email sent to {member.email} (member #{member.id})")
-    except Exception as exc:
-        logger.error(f"[Brevo] Failed to send approval email to {member.email}: {exc}")
\ No newline at end of file
+def send_member_approved_email(member_id):
+    """Outbox handler for "team.member_approved" — see api/outbox.py."""
+    member = CraftsmanMember.objects.select_related('craftsman__user').filter(pk=member_id).first()
+    if member is None or member.status != "accepted":
+        return True
+    return _notify_member_approved(member)
\ No newline at end of file
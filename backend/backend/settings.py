@@ -102,6 +102,29 @@ DATABASES = {
     }
 }
 
+# ============================
+# CACHE
+# ============================
+# Shared by every gunicorn worker when REDIS_URL is set. Without it each
+# process gets its own LocMemCache and the auth user cache switches itself
+# off (see accounts/authentication.py).
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND":    "django.core.cache.backends.redis.RedisCache",
+            "LOCATION":   REDIS_URL,
+            "KEY_PREFIX": f"kaakazini-{ENVIRONMENT}",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # ============================
 # AUTHENTICATION
 # ============================
@@ -123,6 +146,11 @@ REST_FRAMEWORK = {
 # ============================
 # SIMPLE JWT
 # ============================
+# CookieJWTAuthentication caches who the user is (id, role, flags, craftsman
+# id / approval) per user id when the cache is shared (accounts/authentication.py);
+# 0 disables it.
+AUTH_USER_CACHE_SECONDS = config('AUTH_USER_CACHE_SECONDS', default=60, cast=int)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME":    timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME":   timedelta(days=1),
@@ -196,6 +224,12 @@ STORAGES = {
 
 MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/media/"
 
+# Parallel PUTs per request when several images are uploaded at once.
+MEDIA_UPLOAD_WORKERS = config('MEDIA_UPLOAD_WORKERS', default=6, cast=int)
+
+# Lifetime of presigned direct-upload URLs (api/upload_views.py).
+MEDIA_PRESIGN_EXPIRES = config('MEDIA_PRESIGN_EXPIRES', default=900, cast=int)
+
 # ============================
 # STATIC
 # ============================
@@ -228,3 +262,62 @@ GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default='')
 FRONTEND_URL = config("FRONTEND_URL", default="http://localhost:3000")
 
 INTASEND_WALLET_ID = config('INTASEND_WALLET_ID', default=2, cast=int)
+
+# ============================
+# BACKGROUND TASKS
+# ============================
+# In-process executor for work kept off the request path (api/background.py).
+BACKGROUND_TASK_WORKERS = config('BACKGROUND_TASK_WORKERS', default=4, cast=int)
+BACKGROUND_TASKS_ASYNC  = config('BACKGROUND_TASKS_ASYNC', default=True, cast=bool)
+
+GOOGLE_DISTANCE_TIMEOUT = config('GOOGLE_DISTANCE_TIMEOUT', default=5, cast=int)
+DISTANCE_CACHE_TTL_DAYS = config('DISTANCE_CACHE_TTL_DAYS', default=30, cast=int)
+
+# ============================
+# PAYMENTS
+# ============================
+# Shared secret the jay4t gateway signs status callbacks with (HMAC-SHA256).
+PAYMENT_WEBHOOK_SECRET          = config('PAYMENT_WEBHOOK_SECRET', default='')
+# How long a PENDING transaction is trusted before a poll asks the gateway.
+PAYMENT_STATUS_REFRESH_SECONDS  = config('PAYMENT_STATUS_REFRESH_SECONDS', default=15, cast=int)
+# Short-lived cache in front of gateway status lookups (terminal states are kept).
+PAYMENT_STATUS_CACHE_SECONDS    = config('PAYMENT_STATUS_CACHE_SECONDS', default=5, cast=int)
+# How long a poll waits on another worker's in-flight status lookup before
+# answering with the stored state. (The lookup's own lock lasts as long as
+# the gateway client's worst case; see api/intasend_service.py.)
+PAYMENT_STATUS_WAIT_SECONDS     = config('PAYMENT_STATUS_WAIT_SECONDS', default=3, cast=float)
+# Pooled keep-alive client for the jay4t gateway (api/intasend_service.py).
+PAYMENT_GATEWAY_POOL_SIZE       = config('PAYMENT_GATEWAY_POOL_SIZE', default=10, cast=int)
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = config('PAYMENT_GATEWAY_CONNECT_TIMEOUT', default=3.05, cast=float)
+PAYMENT_GATEWAY_RETRIES         = config('PAYMENT_GATEWAY_RETRIES', default=2, cast=int)
+# Consecutive gateway failures before the circuit opens, and how long it
+# stays open before a single probe request is allowed through.
+PAYMENT_GATEWAY_FAILURE_THRESHOLD = config('PAYMENT_GATEWAY_FAILURE_THRESHOLD', default=5, cast=int)
+PAYMENT_GATEWAY_RESET_SECONDS     = config('PAYMENT_GATEWAY_RESET_SECONDS', default=30, cast=int)
+
+# ============================
+# NOTIFICATION OUTBOX
+# ============================
+# Delivered by `manage.py drain_outbox --loop` (api/outbox.py), run as the
+# systemd service in deploy/kaakazini-outbox.service.
+OUTBOX_MAX_ATTEMPTS        = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_BACKOFF_SECONDS     = config('OUTBOX_BACKOFF_SECONDS', default=30, cast=int)
+OUTBOX_BACKOFF_CAP_SECONDS = config('OUTBOX_BACKOFF_CAP_SECONDS', default=3600, cast=int)
+# How long a claimed message stays hidden from other workers.
+OUTBOX_LEASE_SECONDS       = config('OUTBOX_LEASE_SECONDS', default=300, cast=int)
+
+# ============================
+# EMAIL
+# ============================
+# api.mail.BrevoBackend (default), api.mail.FileBackend or api.mail.LocmemBackend —
+# the last two never touch the network (local dev, load tests).
+MAIL_BACKEND   = config('MAIL_BACKEND', default='api.mail.BrevoBackend')
+MAIL_FILE_PATH = config('MAIL_FILE_PATH', default=str(BASE_DIR / 'sent_mail.jsonl'))
+MAIL_TIMEOUT   = config('MAIL_TIMEOUT', default=10, cast=int)
+MAIL_POOL_SIZE = config('MAIL_POOL_SIZE', default=10, cast=int)
+# Celcom Africa SMS / WhatsApp (api/team_notifications.py)
+CELCOM_API_KEY   = config('CELCOM_API_KEY', default='')
+CELCOM_SENDER_ID = config('CELCOM_SENDER_ID', default='KaaKazini')
+CELCOM_TIMEOUT   = config('CELCOM_TIMEOUT', default=10, cast=int)
+# Locale used when a mail has no explicit one (api/email_templates.py); '' → English.
+EMAIL_DEFAULT_LOCALE = config('EMAIL_DEFAULT_LOCALE', default='')
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine
+
+from api import email_templates
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark: render cost per message for a batch of team invites, "
+        "through the compiled template registry vs. the same templates without "
+        "the cached loader (parsed on every send). This measures what the cache "
+        "saves, not a comparison with the f-string markup the templates replaced."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=1000, help="Invites in the batch")
+        parser.add_argument("--locale", default="", help="Locale to render, e.g. sw")
+
+    def handle(self, *args, **options):
+        count, locale = options["count"], options["locale"] or None
+        contexts = [
+            {
+                "name":           f"Helper {n}",
+                "craftsman_name": "Wanjiru Plumbing",
+                "role":           "Helper",
+                "link":           f"https://kaakazini.com/join/{n:032x}/",
+            }
+            for n in range(count)
+        ]
+
+        email_templates.warm()
+        started = time.perf_counter()
+        for context in contexts:
+            email_templates.render("team_invite", context, locale=locale)
+        cached = time.perf_counter() - started
+
+        # The same templates, re-read and re-parsed on every send.
+        uncached_engine = Engine(
+            dirs=[str(email_templates.TEMPLATE_DIR)],
+            loaders=["django.template.loaders.filesystem.Loader"],
+            debug=False,
+        )
+        suffix = f".{locale}" if locale else ""
+        started = time.perf_counter()
+        for context in contexts:
+            ctx = Context(context)
+            uncached_engine.get_template(f"team_invite{suffix}.html").render(ctx)
+            uncached_engine.get_template(f"team_invite{suffix}.txt").render(ctx)
+        uncached = time.perf_counter() - started
+
+        for label, elapsed in (("compiled registry", cached), ("parse per send", uncached)):
+            self.stdout.write(
+                f"{label:<18} {count} invites in {elapsed * 1000:8.1f} ms — "
+                f"{elapsed / count * 1e6:7.1f} µs/message"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Cached loader saves {uncached / cached:.1f}× per message."))
@@ -0,0 +1,80 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import CustomUser
+from api.models import Craftsman, GalleryImage, Service
+from api.views import CraftsmanDetailView
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark: queries and latency of a typical craftsman profile PATCH "
+        "(description, skills and one changed service rate). Runs against a "
+        "throwaway craftsman inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="PATCH requests to time")
+        parser.add_argument("--services", type=int, default=6, help="Services on the profile")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["iterations"], options["services"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, iterations, service_count):
+        user = CustomUser.objects.create_user(
+            email="benchmark-profile@example.com", password=None,
+            full_name="Benchmark Profile", role="craftsman",
+        )
+        craftsman = Craftsman.objects.create(user=user, profession="Plumber", location="Nairobi")
+        GalleryImage.objects.bulk_create(
+            [GalleryImage(craftsman=craftsman, image=f"craftsmen/gallery/bench{n}.jpg") for n in range(4)]
+        )
+        services = [
+            {"name": f"Service {n}", "rate": str(1000 + n), "unit": "fixed"}
+            for n in range(service_count)
+        ]
+
+        factory = APIRequestFactory()
+        view = CraftsmanDetailView.as_view()
+        queries, elapsed = [], []
+        for n in range(iterations):
+            services[0]["rate"] = str(1000 + n % 2)
+            request = factory.patch("/api/craftsman/", {
+                "description": f"Fixing pipes since 2010 ({n % 2})",
+                "skills":      json.dumps(["pipes", "drains"]),
+                "services":    json.dumps(services),
+            }, format="multipart")
+            # A fresh user per request, as the authenticator would supply.
+            force_authenticate(request, user=CustomUser.objects.get(pk=user.pk))
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = view(request)
+                elapsed.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                self.stderr.write(f"PATCH failed with {response.status_code}: {response.data}")
+                return
+            # The benchmark's own rollback savepoints are not part of the request.
+            queries.append(sum(1 for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]))
+
+        elapsed.sort()
+        self.stdout.write(
+            f"profile PATCH × {iterations} ({Service.objects.filter(craftsman=craftsman).count()} services) — "
+            f"{sum(queries) / len(queries):.1f} queries/request, "
+            f"mean {sum(elapsed) / len(elapsed) * 1000:.2f} ms, "
+            f"p50 {elapsed[len(elapsed) // 2] * 1000:.2f} ms, "
+            f"p95 {elapsed[int(len(elapsed) * 0.95)] * 1000:.2f} ms"
+        )
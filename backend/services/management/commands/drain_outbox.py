@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import OutboxMessage
+from api.outbox import drain
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued email / SMS / WhatsApp notifications from the outbox. "
+        "Failed deliveries are retried with exponential backoff and "
+        "dead-lettered after OUTBOX_MAX_ATTEMPTS. Several instances can run "
+        "side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Concurrent deliveries")
+        parser.add_argument("--batch-size", type=int, default=50,
+                            help="Messages claimed per round")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running, polling for new messages")
+        parser.add_argument("--interval", type=float, default=2.0,
+                            help="Seconds to wait when the outbox is empty (with --loop)")
+
+    def handle(self, *args, **options):
+        totals = {"sent": 0, "retry": 0, "dead": 0}
+        started = time.monotonic()
+        try:
+            while True:
+                counts = drain(batch_size=options["batch_size"], workers=options["workers"])
+                for key, value in counts.items():
+                    totals[key] += value
+                if any(counts.values()):
+                    self.stdout.write(
+                        f"[Outbox] {counts['sent']} sent, {counts['retry']} to retry, "
+                        f"{counts['dead']} dead-lettered"
+                    )
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.monotonic() - started
+        pending = OutboxMessage.objects.filter(status=OutboxMessage.STATUS_PENDING).count()
+        dead = OutboxMessage.objects.filter(status=OutboxMessage.STATUS_DEAD).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox drained in {elapsed:.1f}s — {totals['sent']} sent, {totals['retry']} retries "
+            f"scheduled, {totals['dead']} dead-lettered | {pending} pending, {dead} dead in total."
+        ))
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from api.image_variants import VARIANT_FIELDS, save_variants, try_build_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill resized WebP/JPEG variants for existing images (profile photos, "
+        "portfolio, service and product images). Only rows whose variants are "
+        "missing or stale are processed unless --force is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Images downloaded, resized and uploaded concurrently")
+        parser.add_argument("--model", action="append", choices=sorted(VARIANT_FIELDS),
+                            help="Limit to this model (repeatable)")
+        parser.add_argument("--limit", type=int, default=0,
+                            help="Maximum rows per model (0 = all)")
+        parser.add_argument("--force", action="store_true",
+                            help="Regenerate variants even when they are up to date")
+
+    def pending(self, label, force, limit):
+        model = apps.get_model(label)
+        file_field, variants_field = VARIANT_FIELDS[label]
+        rows = (
+            model.objects
+            .exclude(**{f"{file_field}__isnull": True}).exclude(**{file_field: ""})
+            .values_list("pk", file_field, variants_field)
+            .order_by("pk")
+        )
+        pending = [
+            (label, pk, name, variants or {})
+            for pk, name, variants in rows.iterator()
+            if force or (variants or {}).get("source") != name
+        ]
+        return pending[:limit] if limit else pending
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        rows = []
+        for label in options["model"] or sorted(VARIANT_FIELDS):
+            pending = self.pending(label, options["force"], options["limit"])
+            self.stdout.write(f"{label}: {len(pending)} images to process")
+            rows += pending
+        if not rows:
+            self.stdout.write(self.style.SUCCESS("All image variants are up to date."))
+            return
+
+        started = time.monotonic()
+        counts = {"generated": 0, "failed": 0, "skipped": 0}
+        # Worker threads only touch storage and Pillow; every database write
+        # happens here on the command's own connection.
+        with ThreadPoolExecutor(max_workers=options["workers"], thread_name_prefix="kaakazini-variants") as pool:
+            built = pool.map(lambda row: try_build_variants(*row[:3]), rows)
+            for (label, pk, name, old), variants in zip(rows, built):
+                saved = save_variants(label, pk, name, old, variants)
+                if saved is None:
+                    counts["skipped"] += 1
+                elif saved.get("error"):
+                    counts["failed"] += 1
+                else:
+                    counts["generated"] += 1
+
+        elapsed = time.monotonic() - started
+        rate = len(rows) / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"[Variants] {counts['generated']} generated, {counts['failed']} failed, "
+            f"{counts['skipped']} skipped (image replaced meanwhile) in {elapsed:.1f}s "
+            f"({rate:.1f} images/s, {options['workers']} workers)"
+        ))
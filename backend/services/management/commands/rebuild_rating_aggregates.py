@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute review_count / rating_sum / rating_avg for every craftsman from their reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = rebuild_rating_aggregates(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rating aggregates rebuilt — {changed} craftsmen updated."))
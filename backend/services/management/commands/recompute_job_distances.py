@@ -0,0 +1,91 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from api.distance import (
+    fetch_distance_matrix, fresh_cached_distances, normalise_place,
+    plan_matrix_batches, store_distance,
+)
+from api.models import JobRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill / recompute JobRequest.distance_km using batched multi-origin "
+        "Distance Matrix requests. Safe to stop and re-run: by default only jobs "
+        "without a distance are picked up, and --after-id resumes a full recompute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Recompute every job, not just those missing distance_km")
+        parser.add_argument("--after-id", type=int, default=0,
+                            help="Resume from the job after this id")
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Jobs loaded from the database per round")
+        parser.add_argument("--rate", type=float, default=5.0,
+                            help="Maximum Distance Matrix requests per second")
+
+    def handle(self, *args, **options):
+        jobs = JobRequest.objects.exclude(address="").exclude(location="").order_by("id")
+        if not options["all"]:
+            jobs = jobs.filter(distance_km__isnull=True)
+
+        min_interval = 1.0 / options["rate"] if options["rate"] > 0 else 0
+        session = requests.Session()
+        self._last_request = 0.0
+        self._requests = 0
+
+        last_id = options["after_id"]
+        updated = skipped = 0
+        while True:
+            chunk = list(
+                jobs.filter(id__gt=last_id).only("id", "address", "location")[:options["chunk_size"]]
+            )
+            if not chunk:
+                break
+
+            pairs = {
+                job.id: (normalise_place(job.address), normalise_place(job.location))
+                for job in chunk
+            }
+            distances = fresh_cached_distances(pairs.values())
+            missing = set(pairs.values()) - set(distances)
+
+            for origins, destinations in plan_matrix_batches(missing):
+                self._throttle(min_interval)
+                results = fetch_distance_matrix(origins, destinations, session=session)
+                for (origin, destination), km in results.items():
+                    if (origin, destination) in missing:
+                        store_distance(origin, destination, km)
+                        distances[(origin, destination)] = km
+
+            resolved = []
+            for job in chunk:
+                km = distances.get(pairs[job.id])
+                if km is None:
+                    skipped += 1
+                    continue
+                job.distance_km = km
+                resolved.append(job)
+            JobRequest.objects.bulk_update(resolved, ["distance_km"])
+            updated += len(resolved)
+
+            last_id = chunk[-1].id
+            self.stdout.write(
+                f"… up to job #{last_id}: {updated} updated, {skipped} unresolved, "
+                f"{self._requests} API requests (resume with --after-id {last_id})"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Distances recomputed — {updated} jobs updated, {skipped} unresolved, "
+            f"{self._requests} API requests."
+        ))
+
+    def _throttle(self, min_interval):
+        wait = self._last_request + min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+        self._requests += 1
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+from api.intasend_service import TERMINAL_STATUSES, check_payment_status_cached
+from api.models import JobRequest
+from api.payment_state import apply_gateway_result
+
+
+class Command(BaseCommand):
+    help = (
+        "Settle in-flight M-Pesa payments nobody is polling for: every Approved "
+        "job with a pending gateway transaction is checked against the gateway "
+        "and moved to Paid / Quote Approved exactly as the pay-status poll would."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8,
+                            help="Concurrent gateway status lookups")
+        parser.add_argument("--min-age", type=int, default=60,
+                            help="Skip transactions checked less than this many seconds ago")
+        parser.add_argument("--limit", type=int, default=1000,
+                            help="Maximum transactions checked per pass")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running, one pass every --interval seconds")
+        parser.add_argument("--interval", type=int, default=30,
+                            help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            self.reconcile(options)
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
+
+    def in_flight(self):
+        return (
+            JobRequest.objects
+            .filter(status=JobRequest.STATUS_APPROVED)
+            .exclude(intasend_invoice_id="")
+            .exclude(payment_status__in=TERMINAL_STATUSES)
+        )
+
+    def reconcile(self, options):
+        cutoff = timezone.now() - timedelta(seconds=options["min_age"])
+        jobs = list(
+            self.in_flight()
+            .exclude(payment_status_at__gt=cutoff)
+            .only("id", "status", "intasend_invoice_id", "payment_status", "payment_status_at")
+            # Never-checked jobs (no payment_status_at) first; PostgreSQL
+            # would otherwise sort them after every checked one.
+            .order_by(F("payment_status_at").asc(nulls_first=True), "id")[:options["limit"]]
+        )
+
+        started = time.monotonic()
+        counts = {"COMPLETE": 0, "FAIL": 0, "PENDING": 0, "errors": 0}
+        if jobs:
+            # Worker threads only talk to the gateway; every database write
+            # happens here on the command's own connection.
+            with ThreadPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+                futures = {
+                    pool.submit(check_payment_status_cached, job.intasend_invoice_id): job
+                    for job in jobs
+                }
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as exc:
+                        result = {"success": False, "error": str(exc)}
+                    if not result.get("success"):
+                        counts["errors"] += 1
+                        continue
+                    apply_gateway_result(job, job.intasend_invoice_id, result)
+                    counts[result["status"]] += 1
+
+        elapsed = time.monotonic() - started
+        rate = len(jobs) / elapsed if elapsed > 0 else 0.0
+        backlog = self.in_flight()
+        backlog_count = backlog.count()
+        oldest = (
+            backlog.order_by(F("payment_status_at").asc(nulls_first=True))
+            .values_list("payment_status_at", flat=True).first()
+        )
+        if not backlog_count:
+            oldest_age = "—"
+        elif oldest is None:
+            oldest_age = "never checked"
+        else:
+            oldest_age = f"{(timezone.now() - oldest).total_seconds():.0f}s"
+
+        self.stdout.write(
+            f"[Reconcile] checked {len(jobs)} in {elapsed:.2f}s ({rate:.1f} tx/s) — "
+            f"{counts['COMPLETE']} paid, {counts['FAIL']} failed, "
+            f"{counts['PENDING']} still pending, {counts['errors']} lookup errors | "
+            f"backlog {backlog_count}, oldest {oldest_age}"
+        )
+        return counts
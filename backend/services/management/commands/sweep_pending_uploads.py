@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.upload_views import PENDING_PREFIX, PRESIGN_EXPIRES
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete direct uploads that were never finalized (objects under "
+        f"media/{PENDING_PREFIX} older than --max-age-hours). A bucket lifecycle "
+        "rule expiring that prefix after a day does the same job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age-hours", type=float, default=24,
+                            help="Only delete uploads at least this old")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="List what would be deleted without deleting it")
+
+    def handle(self, *args, **options):
+        max_age = timedelta(hours=options["max_age_hours"])
+        # A token stays valid for 2 × PRESIGN_EXPIRES; never sweep an upload
+        # that could still be finalized.
+        if max_age.total_seconds() < PRESIGN_EXPIRES * 2:
+            raise CommandError(f"--max-age-hours must cover the token lifetime ({PRESIGN_EXPIRES * 2}s)")
+        cutoff = timezone.now() - max_age
+
+        try:
+            _, names = default_storage.listdir(PENDING_PREFIX)
+        except FileNotFoundError:
+            names = []
+
+        deleted = kept = 0
+        for filename in names:
+            name = f"{PENDING_PREFIX}{filename}"
+            if default_storage.get_modified_time(name) > cutoff:
+                kept += 1
+                continue
+            if not options["dry_run"]:
+                default_storage.delete(name)
+            deleted += 1
+
+        verb = "would delete" if options["dry_run"] else "deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"[Upload] Pending uploads: {verb} {deleted} older than {max_age}, kept {kept}."
+        ))